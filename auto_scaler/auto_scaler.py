@@ -7,12 +7,21 @@ import logging
 import math
 import os
 import sys
-from collections import defaultdict
+import threading
+import time
+from collections import deque
 
 import requests
 from dotenv import load_dotenv
 from kubernetes import client, config
 
+from auto_scaler.forecast import Forecaster
+from auto_scaler.instrumentation import DECISIONS, DESIRED_REPLICAS, INPUT_AGE, REPLICAS, timed
+from auto_scaler.pod_stats import PodStatsStore
+from auto_scaler.policies import build_policy, load_policy_config
+from catalog import MANAGED_LABELS, load_catalog
+from telemetry import CPU_THRESHOLD, MEM_THRESHOLD
+
 load_dotenv()
 
 class AutoScaler:
@@ -21,27 +30,53 @@ class AutoScaler:
     delete (CRUD) the deployment for any application type on an edge node
     """
 
-    # Docker images for application types
-    MOBILENET_IMAGE = "byz96/serverless-mobilenet:v5.2"
-    SQUEEZENET_IMAGE = "byz96/serverless-squeezenet:v5.2"
-    SHUFFLENET_IMAGE = "byz96/serverless-shufflenet:v5.2" 
-    BINARYALERT_IMAGE = "byz96/serverless-binaryalert:v5.2"
-
-    NODE_IP_MAP = {
-        "edge1": os.environ["EDGE-1"],
-        "edge2": os.environ["EDGE-2"],
-        "edge3": os.environ["EDGE-3"]
-    }
-    TARGET_CPU = {
-        "shufflenet": 125,
-        "mobilenet": 250,
-        "squeezenet": 125,
-        "binaryalert": 45
-    }
+    # Images, ports, NodePorts, names and target CPU of the node/app pairs
+    CATALOG = load_catalog()
     MASTER_IP = os.environ["MASTER"]
     MIN_SCALE = 1
     MAX_SCALE = 30
     TIME_LIMIT = 5
+    # Number of samples per pod kept for the CPU and memory percentiles
+    POD_STATS_WINDOW = 10
+    REQUEST_TIMEOUT = 3
+
+    # "multi_step" moves directly towards the desired replicas within the rate policies,
+    # "single_step" changes the scale by one replica per tick
+    SCALE_MODE = os.environ.get("SCALE_MODE", "multi_step")
+    # Rate policies of at most "value" pods or percent of the scale per "period" seconds;
+    # the most permissive policy applies
+    SCALE_UP_POLICIES = [
+        {"type": "pods", "value": 4, "period": 15},
+        {"type": "percent", "value": 100, "period": 15}
+    ]
+    SCALE_DOWN_POLICIES = [
+        {"type": "percent", "value": 50, "period": 60}
+    ]
+    # Seconds of recommendations considered before scaling up or down
+    SCALE_UP_STABILIZATION = 0
+    SCALE_DOWN_STABILIZATION = 120
+
+    # Pre-scale to the replicas needed for the load forecast FORECAST_HORIZON ticks ahead
+    PREDICTIVE_SCALING = os.environ.get("PREDICTIVE_SCALING", "0") == "1"
+    FORECAST_HISTORY = 40
+    FORECAST_HORIZON = 3
+    # Per-application scaling policies, read from policies.json when not set
+    POLICY_CONFIG = None
+
+    # Warm standby keeps the deployment and service of every pair created, scales idle pairs down
+    # to WARM_STANDBY_REPLICAS ready replicas (0 by default) and scales them up from zero only when
+    # the proxy asks for it with an activation event
+    WARM_STANDBY = os.environ.get("WARM_STANDBY", "0") == "1"
+    WARM_STANDBY_REPLICAS = int(os.environ.get("WARM_STANDBY_REPLICAS", 0))
+    # Seconds without any request after which a pair is idle
+    IDLE_TIMEOUT = float(os.environ.get("WARM_STANDBY_IDLE_TIMEOUT", 300))
+
+    # Label of the deployments created by the auto scaler, used to discover them with one list call
+    MANAGED_LABELS = MANAGED_LABELS
+    # Connections of the Kubernetes API client shared by all auto scalers of the process
+    KUBE_POOL_SIZE = int(os.environ.get("KUBE_POOL_SIZE", 16))
+    _api_clients = None
+    _api_clients_lock = threading.Lock()
 
     logging.basicConfig(
         level=logging.INFO,
@@ -52,135 +87,464 @@ class AutoScaler:
         ]
     )
 
-    def __init__(self, node, app):
-        """ Initialize the deployment object of the given application on the given edge node """
-        config.load_kube_config()
-        self.api = client.CustomObjectsApi()
-        self.core_v1 = client.CoreV1Api()
-        self.apps_v1 = client.AppsV1Api()
+    def __init__(self, node, app, telemetry=None, api_clients=None, known_scales=None):
+        """
+        Initialize the deployment object of the given application on the given edge node.
+        Node resources are read from the telemetry receiver if one is given, otherwise
+        they are requested from the resource monitor of the node. The Kubernetes clients
+        can be given as a (CustomObjectsApi, CoreV1Api, AppsV1Api) tuple, otherwise the
+        clients shared by the process are used. The scale is taken from known_scales
+        (see discover_scales) and only read from the cluster if the deployment is not in it.
+        """
+        if api_clients is None:
+            api_clients = self.shared_api_clients()
+        self.api, self.core_v1, self.apps_v1 = api_clients
 
         self.min_scale = self.MIN_SCALE
         self.max_scale = self.MAX_SCALE
         self.time_limit = self.TIME_LIMIT
+        self.request_timeout = self.REQUEST_TIMEOUT
+        self.scale_mode = self.SCALE_MODE
+        self.scale_up_policies = self.SCALE_UP_POLICIES
+        self.scale_down_policies = self.SCALE_DOWN_POLICIES
+        self.scale_up_stabilization = self.SCALE_UP_STABILIZATION
+        self.scale_down_stabilization = self.SCALE_DOWN_STABILIZATION
+        self.clock = time.monotonic
+        self.recommendations = deque()
+        self.scale_events = deque()
+
+        self.forecaster = None
+        if self.PREDICTIVE_SCALING:
+            self.forecaster = Forecaster(history=self.FORECAST_HISTORY, horizon=self.FORECAST_HORIZON)
+        self.last_req_counts = {}
+        self.last_sample_time = None
+        self.rate_capacity = None
+
+        self.warm_standby = self.WARM_STANDBY
+        self.standby_replicas = min(self.WARM_STANDBY_REPLICAS, self.MAX_SCALE)
+        self.idle_timeout = self.IDLE_TIMEOUT
+        self.activation_requested = False
+        self.last_requests_total = None
+        self.last_activity = self.clock()
+
+        self.spec = self.CATALOG.spec(node, app)
+        self.node_cpu_thres = CPU_THRESHOLD
+        self.node_mem_thres = MEM_THRESHOLD
+        policy_config = self.POLICY_CONFIG or load_policy_config()
+        self.policy = build_policy(app, policy_config, self.spec.target_cpu, self.spec.slo_p90_ms)
+        self.desired_cpu_avg = self.spec.target_cpu
+        self.slo_p90_ms = self.spec.slo_p90_ms
+        self.pod_stats = PodStatsStore(
+            fields=("cpu", "mem"), max_pods=2 * self.MAX_SCALE, window=self.POD_STATS_WINDOW
+        )
 
-        self.node_cpu_thres = 90.00
-        self.node_mem_thres = 30.00
-        self.desired_cpu_avg = self.TARGET_CPU[app]
-        self.pod_cpu_map = defaultdict(lambda : [])
-        self.pod_mem_map = defaultdict(lambda : [])
-
-        self.ip = self.NODE_IP_MAP[node]
+        self.ip = self.spec.node_ip
+        self.telemetry = telemetry
         self.master_ip = self.MASTER_IP
 
         self.node = node
         self.app_type = app
-        self.app = "-".join((app, node))
-
-        if app == "mobilenet":
-            self.image = self.MOBILENET_IMAGE
-            self.port = 8080
-            self.nodeport = 30100 + int(node[-1])
-            self.name = "-".join(("mobilenet-deployment", node))
-            self.service = "-".join(("mobilenet-lb", node))
-        elif app == "squeezenet":
-            self.image = self.SQUEEZENET_IMAGE
-            self.port = 8080
-            self.nodeport = 30200 + int(node[-1])
-            self.name = "-".join(("squeezenet-deployment", node))
-            self.service = "-".join(("squeezenet-lb", node))
-        elif app == "shufflenet":
-            self.image = self.SHUFFLENET_IMAGE
-            self.port = 8080
-            self.nodeport = 30300 + int(node[-1])
-            self.name = "-".join(("shufflenet-deployment", node))
-            self.service = "-".join(("shufflenet-lb", node))
-        elif app == "binaryalert":
-            self.image = self.BINARYALERT_IMAGE
-            self.port = 8080
-            self.nodeport = 30400 + int(node[-1])
-            self.name = "-".join(("binaryalert-deployment", node))
-            self.service = "-".join(("binaryalert-lb", node))
-
-        self.scale = self.__set_scale()
-
-    def watch_and_scale(self):
-        """
-        Watch the pods and scale up or down according to available resources
-        """
-        cpu_util, available_mem = self.__get_node_resource()
-        if self.scale == 0 and cpu_util < self.node_cpu_thres and available_mem > self.node_mem_thres:
-            self.__init_container()
+        self.app = self.spec.app
+        self.image = self.spec.image
+        self.port = self.spec.port
+        self.nodeport = self.spec.node_port
+        self.name = self.spec.name
+        self.service = self.spec.service
+        self.cpu_request = self.spec.cpu_request
+
+        if known_scales is not None and self.name in known_scales:
+            self.scale = known_scales[self.name]
+            self.deployed = True
+        else:
+            scale = self.__set_scale()
+            self.deployed = scale is not None
+            self.scale = scale or 0
+            # Deployments created before they were labelled are labelled to be discovered next time
+            if known_scales is not None and self.deployed:
+                self.__label_deployment()
+        if self.warm_standby and not self.deployed:
+            self.create_deployment_and_service(self.standby_replicas)
+        REPLICAS.labels(self.node, self.app_type).set(self.scale)
+
+    @classmethod
+    def shared_api_clients(cls):
+        """
+        Return the Kubernetes clients of the process, built on a single connection-pooled ApiClient
+
+        Returns:
+        --------
+        api_clients: (CustomObjectsApi, CoreV1Api, AppsV1Api) tuple
+        """
+        with AutoScaler._api_clients_lock:
+            if AutoScaler._api_clients is None:
+                configuration = client.Configuration()
+                config.load_kube_config(client_configuration=configuration)
+                configuration.connection_pool_maxsize = cls.KUBE_POOL_SIZE
+                api_client = client.ApiClient(configuration)
+                AutoScaler._api_clients = (
+                    client.CustomObjectsApi(api_client), client.CoreV1Api(api_client), client.AppsV1Api(api_client)
+                )
+            return AutoScaler._api_clients
+
+    @classmethod
+    def discover_scales(cls, apps_v1):
+        """
+        List the deployments created by the auto scaler with a single request
+
+        Returns:
+        --------
+        scales: dict mapping deployment names to their replica number, or None if the request failed
+        """
+        label_selector = ",".join(f"{key}={value}" for key, value in cls.MANAGED_LABELS.items())
+        try:
+            deployments = apps_v1.list_namespaced_deployment(
+                namespace="autoscaler", label_selector=label_selector, _request_timeout=cls.REQUEST_TIMEOUT
+            )
+        except Exception as exc:
+            logging.error("Error while listing the managed deployments - %s", exc)
+            return None
+
+        scales = {
+            deployment.metadata.name: int(deployment.spec.replicas or 0) for deployment in deployments.items
+        }
+        logging.info("Discovered %d managed deployments.", len(scales))
+        return scales
+
+    @classmethod
+    def get_batch_metrics(cls, auto_scalers):
+        """
+        Collect the metrics of all given auto scalers' node/app pairs with a single request
+        to the monitoring service running in the master node
+
+        Returns:
+        --------
+        metrics: dict mapping app labels (e.g. "mobilenet-edge1") to their pod instances,
+        or None if the request failed
+        """
+        try:
+            pairs = [{"node": scaler.node, "app": scaler.app_type} for scaler in auto_scalers]
+            req = json.dumps({"pairs": pairs})
+            with timed("batch_metrics"):
+                response = requests.post(
+                    f"http://{cls.MASTER_IP}:8180/metrics/batch", data=req, timeout=cls.REQUEST_TIMEOUT
+                )
+            metrics = json.loads(response.text)
+        except Exception as exc:
+            logging.error("Error while reading batch metrics - %s", exc)
+            return None
+
+        for label, pair in metrics["pairs"].items():
+            spec = cls.CATALOG.by_label(label)
+            if spec is not None:
+                INPUT_AGE.labels(spec.node, spec.app_type, "pod_metrics").set(pair.get("snapshot_age", 0.0))
+        return {label: pair["pod_instances"] for label, pair in metrics["pairs"].items()}
+
+    @classmethod
+    def ensure_image_prepull(cls, apps_v1):
+        """
+        Create the DaemonSet pulling the images of all apps on the edge nodes, or update it
+        with the images of the catalog if it exists
+        """
+        body = cls.CATALOG.prepull()
+        name = body["metadata"]["name"]
+        try:
+            apps_v1.create_namespaced_daemon_set(
+                namespace="autoscaler", body=body, _request_timeout=cls.REQUEST_TIMEOUT
+            )
+            logging.info("Image pre-pull daemon set %s has been successfully created.", name)
+        except client.ApiException as exc:
+            if exc.status != 409:
+                logging.error("Error while creating image pre-pull daemon set %s - %s", name, exc)
+                return
+            apps_v1.replace_namespaced_daemon_set(
+                name=name, namespace="autoscaler", body=body, _request_timeout=cls.REQUEST_TIMEOUT
+            )
+            logging.info("Image pre-pull daemon set %s has been successfully updated.", name)
+
+    def request_activation(self):
+        """
+        Scale the pair up from zero at its next evaluation, as requests are waiting for it in the proxy
+        """
+        self.activation_requested = True
+
+    def watch_and_scale(self, pod_metrics=None):
+        """
+        Watch the pods and scale up or down according to available resources.
+        The pod metrics are requested from the monitoring service unless they are given
+        from a batch response.
+        """
+        resource = self.get_node_resource()
+        # Without fresh node resources only scaling down is allowed
+        has_capacity = resource is not None \
+            and resource["cpu_util"] < self.node_cpu_thres \
+            and resource["available_mem"] > self.node_mem_thres
+
+        demand = self.evaluate(pod_metrics)
+        if demand is None or (demand["target"] > self.scale and not has_capacity):
             return
+        self.apply(demand["target"], demand["reason"])
+
+    def evaluate(self, pod_metrics=None):
+        """
+        Decide the scale of the deployment from the pod metrics without changing it.
+
+        Returns:
+        --------
+        demand: dict holding the "target" scale, its "priority" (above 1 when latency or CPU
+        exceed their targets), the expected "cpu_cost" (millicores) and "mem_cost" (MiB) of
+        one more replica, the average over the pods of their p90 usage within the last
+        POD_STATS_WINDOW evaluations, and the "reason" of the decision, or None if there are no metrics
+        """
+        if self.scale == 0:
+            # In warm standby a pair stays at zero until requests arrive for it
+            if self.warm_standby and not self.activation_requested:
+                return None
+            return {
+                "target": 1, "priority": 1.0, "cpu_cost": self.cpu_request, "mem_cost": 0.0,
+                "reason": "activation" if self.activation_requested else "init"
+            }
 
-        pod_metrics = self.__get_metrics()
         if pod_metrics is None:
-            return
+            pod_metrics = self.__get_metrics()
+        if pod_metrics is None:
+            return None
         
         pod_num = len(pod_metrics)
         if pod_num == 0:
-            return
-
-        res_time = 0
-        p10_res_time = 0
-        #p50_res_time = 0
-        p90_res_time = 0
-        pod_cpu_total = 0
-
-        for _, app_metric in pod_metrics.items():
-            res_time += app_metric["res_time"]
-            p10_res_time += app_metric["p10_res_time"]
-            #p50_res_time += app_metric["p50_res_time"]
-            p90_res_time += app_metric["p90_res_time"]
-            pod_cpu_total += app_metric["cpu"]
+            return None
+
+        snapshot = {"pod_num": pod_num}
+        for field in ("res_time", "p10_res_time", "p50_res_time", "p90_res_time", "cpu", "mem"):
+            snapshot[field] = sum(metric.get(field, 0.0) for metric in pod_metrics.values()) / pod_num
+        pod_cpu_total = snapshot["cpu"] * pod_num
+        # Pods that no longer appear in the metrics are evicted from the store
+        self.pod_stats.update(pod_metrics, self.clock())
+
+        recommendation, reason = self.policy.recommend(snapshot, self.scale)
+        if recommendation > self.scale:
+            step_target = self.scale + 1
+        elif recommendation < self.scale:
+            step_target = self.scale - 1
+        else:
+            step_target = self.scale
 
-        res_time_avg = res_time / pod_num
-        p10_res_time_avg = p10_res_time / pod_num
-        #p50_res_time_avg = p50_res_time / pod_num
-        p90_res_time_avg = p90_res_time / pod_num
-        pod_cpu_avg = pod_cpu_total / pod_num
+        if self.forecaster is not None:
+            predicted = self.forecast_replicas(pod_metrics, pod_cpu_total)
+            if predicted > recommendation:
+                recommendation = predicted
+                step_target = max(step_target, self.scale + 1)
+                reason = "forecast"
 
-        desired_replicas = math.ceil(pod_num * ( pod_cpu_avg / self.desired_cpu_avg ))
+        if self.scale_mode == "multi_step":
+            target = self.stabilize(recommendation)
+        else:
+            target = step_target
+        target = max(self.min_scale, min(self.max_scale, target))
+        if self.warm_standby and self.is_idle(pod_metrics) and self.scale > self.standby_replicas:
+            target, reason = self.standby_replicas, "idle"
+        DESIRED_REPLICAS.labels(self.node, self.app_type).set(target)
+
+        if self.slo_p90_ms:
+            latency_ratio = snapshot["p90_res_time"] * 1000 / self.slo_p90_ms
+        elif snapshot["p90_res_time"] > 0:
+            latency_ratio = snapshot["res_time"] / snapshot["p90_res_time"]
+        else:
+            latency_ratio = 0.0
+        return {
+            "target": target,
+            "priority": max(latency_ratio, snapshot["cpu"] / self.desired_cpu_avg),
+            "cpu_cost": self.p90_usage("cpu", snapshot["cpu"]),
+            "mem_cost": self.p90_usage("mem", snapshot["mem"]),
+            "reason": reason
+        }
+
+    def p90_usage(self, field, default):
+        """
+        Return the average over the pods of the p90 of their usage of the field within the
+        window of the pod statistics, or the default if no pod has a sample of it
+        """
+        percentiles = [values[0] for values in self.pod_stats.percentiles(field, (90,)).values()]
+        percentiles = [value for value in percentiles if not math.isnan(value)]
+        return sum(percentiles) / len(percentiles) if percentiles else default
 
-        if (res_time_avg > p90_res_time_avg or desired_replicas > self.scale) \
-            and cpu_util < self.node_cpu_thres and available_mem > self.node_mem_thres:
-            self.__init_container()
-        elif res_time_avg < p10_res_time_avg or desired_replicas < self.scale:
-            self.__terminate_container()
+    def is_idle(self, pod_metrics):
+        """
+        Check whether the request counters of the pods have not changed for idle_timeout seconds
+        """
+        now = self.clock()
+        requests_total = sum(metric.get("req_count", 0.0) for metric in pod_metrics.values())
+        if requests_total != self.last_requests_total:
+            self.last_requests_total = requests_total
+            self.last_activity = now
+        return now - self.last_activity >= self.idle_timeout
+
+    def forecast_replicas(self, pod_metrics, pod_cpu_total):
+        """
+        Record the request rate and CPU usage of the deployment and return the number of replicas
+        needed for the load forecast a few ticks ahead, or 0 while there is no history yet
+        """
+        now = self.clock()
+        req_counts = {pod: metric["req_count"] for pod, metric in pod_metrics.items()}
+        previous_time = self.last_sample_time
+        previous_counts = self.last_req_counts
+        self.last_req_counts = req_counts
+        self.last_sample_time = now
+        if previous_time is None or now <= previous_time:
+            return 0
+
+        # Counter increases of the pods seen in both samples, restarted counters count from zero
+        requests_done = 0.0
+        for pod, count in req_counts.items():
+            if pod in previous_counts:
+                requests_done += count - previous_counts[pod] if count >= previous_counts[pod] else count
+        rate = requests_done / (now - previous_time)
+
+        if rate > 0 and pod_cpu_total > 0:
+            # Requests per second one replica serves at the target CPU
+            capacity = rate / pod_cpu_total * self.desired_cpu_avg
+            self.rate_capacity = capacity if self.rate_capacity is None \
+                else 0.8 * self.rate_capacity + 0.2 * capacity
+
+        self.forecaster.update([rate, pod_cpu_total])
+        forecast_rate, forecast_cpu = self.forecaster.predict()
+        replicas = math.ceil(forecast_cpu / self.desired_cpu_avg)
+        if self.rate_capacity:
+            replicas = max(replicas, math.ceil(forecast_rate / self.rate_capacity))
+        logging.debug(
+            "Forecast of %s: %.2f req/s, %.1f millicores, %d replicas, errors %s",
+            self.name, forecast_rate, forecast_cpu, replicas, self.forecaster.errors()
+        )
+        return replicas
 
+    def stabilize(self, recommendation):
+        """
+        Bound a recommended scale by the stabilization windows and the rate policies.
+        Scaling up follows the lowest and scaling down the highest recommendation
+        of its window, so that short dips do not make the scale flap.
+        """
+        now = self.clock()
+        self.recommendations.append((now, recommendation))
+        horizon = max(self.scale_up_stabilization, self.scale_down_stabilization)
+        while now - self.recommendations[0][0] > horizon:
+            self.recommendations.popleft()
+
+        up_recommendation = min(
+            value for timestamp, value in self.recommendations
+            if now - timestamp <= self.scale_up_stabilization
+        )
+        down_recommendation = max(
+            value for timestamp, value in self.recommendations
+            if now - timestamp <= self.scale_down_stabilization
+        )
+        target = self.scale
+        if target < up_recommendation:
+            target = up_recommendation
+        if target > down_recommendation:
+            target = down_recommendation
+
+        if target > self.scale:
+            target = min(target, max(self.__rate_limit(policy, now, 1) for policy in self.scale_up_policies))
+        elif target < self.scale:
+            target = max(target, min(self.__rate_limit(policy, now, -1) for policy in self.scale_down_policies))
+        return target
+
+    def __rate_limit(self, policy, now, direction):
+        """
+        Return the furthest scale that the policy allows in the given direction
+        """
+        changed = sum(
+            change for timestamp, change in self.scale_events
+            if now - timestamp < policy["period"] and change * direction > 0
+        )
+        period_start = self.scale - changed
+        if policy["type"] == "pods":
+            return period_start + direction * policy["value"]
+        if direction > 0:
+            return math.ceil(period_start * (1 + policy["value"] / 100))
+        return math.floor(period_start * (1 - policy["value"] / 100))
+
+    def apply(self, target, reason=None):
+        """
+        Scale the deployment towards the target scale for the given reason of the decision
+        """
+        previous = self.scale
+        if self.scale_mode != "multi_step":
+            if target > self.scale:
+                self.__init_container()
+            elif target < self.scale:
+                self.__terminate_container()
+        elif target > self.scale and not self.deployed:
+            self.create_deployment_and_service(target)
+        elif target != self.scale:
+            self.update_deployment(target)
+
+        if previous == 0 and self.scale > 0:
+            self.activation_requested = False
+            self.last_activity = self.clock()
+        if self.scale != previous:
+            direction = "up" if self.scale > previous else "down"
+            DECISIONS.labels(self.node, self.app_type, direction, reason or "unknown").inc()
+            REPLICAS.labels(self.node, self.app_type).set(self.scale)
+            now = self.clock()
+            self.scale_events.append((now, self.scale - previous))
+            longest = max(
+                policy["period"] for policy in self.scale_up_policies + self.scale_down_policies
+            )
+            while now - self.scale_events[0][0] > longest:
+                self.scale_events.popleft()
 
     def __get_metrics(self):
         """Collect metrics from the monitoring service running in the master node"""
         try:
             req = json.dumps({"node": self.node, "app": self.app_type})
-            response = requests.post(f"http://{self.master_ip}:8180/metrics", data=req)
+            with timed("metrics", self.node, self.app_type):
+                response = requests.post(
+                    f"http://{self.master_ip}:8180/metrics", data=req, timeout=self.request_timeout
+                )
             metrics = json.loads(response.text)
         except Exception as exc:
             logging.error("Error while reading metrics of %s - %s", self.node, self.app_type)
             return        
 
+        INPUT_AGE.labels(self.node, self.app_type, "pod_metrics").set(metrics.get("snapshot_age", 0.0))
         return metrics["pod_instances"]
 
-    def __get_node_resource(self):
-        """Monitor resource usage from the service running in each edge node"""
-        response = requests.get(f"http://{self.ip}:8380/load")
-        resource = json.loads(response.text)
-        cpu_util = resource["cpu_util"]
-        available_mem = resource["available_mem"]
+    def get_node_resource(self):
+        """
+        Monitor resource usage from the service running in each edge node.
+        Returns None if the pushed resource data of the node is stale.
+        """
+        if self.telemetry is not None:
+            resource, age = self.telemetry.latest(self.node)
+            if resource is not None:
+                INPUT_AGE.labels(self.node, "all", "node_resource").set(age)
+            if resource is None or age > self.telemetry.stale_after:
+                logging.warning("Resource data of %s is stale", self.node)
+                return None
+            return resource
+
+        try:
+            with timed("node_resource", self.node):
+                response = requests.get(f"http://{self.ip}:8380/load", timeout=self.request_timeout)
+            resource = json.loads(response.text)
+        except Exception as exc:
+            logging.error("Error while reading resource usage of %s - %s", self.node, exc)
+            return None
 
-        return cpu_util, available_mem
+        return resource
 
     def __init_container(self):
         """Initialize new container"""
         if self.scale == self.max_scale:
             logging.info("Max number of pods have already been created")
-        elif self.scale == 0:
+        elif not self.deployed:
             self.create_deployment_and_service()
         else:
             self.update_deployment(self.scale + 1)
 
     def __terminate_container(self):
         """Terminate one container"""
-        if self.scale == self.min_scale:
+        if self.scale == 0 or (self.scale == self.min_scale and not self.warm_standby):
             logging.info("Min number of pods are running")
         else:
             self.update_deployment(self.scale - 1)
@@ -189,80 +553,15 @@ class AutoScaler:
     ################## CRUD Operations for the given deployment object ##################
     def create_deployment_object(self, replica):
         """
-        Configure the deployment specifications.
-        """
-
-        # Configureate Pod template container
-        container = client.V1Container(
-            name=self.app,
-            image=self.image,
-            image_pull_policy="IfNotPresent",
-            ports=[client.V1ContainerPort(name="http", container_port=self.port)],
-            resources=client.V1ResourceRequirements(
-                requests={
-                    "cpu": "200m"
-                    #"memory": "512Mi"
-                }
-            ),
-        )
-        # Create and configure a spec section
-        template = client.V1PodTemplateSpec(
-            metadata=client.V1ObjectMeta(
-                labels={
-                    "app": self.app
-                }
-            ),
-            spec=client.V1PodSpec(
-                containers=[container],
-                node_name=self.node
-            ),
-        )
-        # Create the specification of deployment
-        spec = client.V1DeploymentSpec(
-            replicas=replica,
-            template=template,
-            selector={
-                "matchLabels":
-                {
-                    "app": self.app
-                }
-            }
-        )
-        # Instantiate the deployment object
-        deployment = client.V1Deployment(
-            api_version="apps/v1",
-            kind="Deployment",
-            metadata=client.V1ObjectMeta(
-                name=self.name
-            ),
-            spec=spec,
-        )
-        return deployment
+        Configure the deployment specifications from the catalog template.
+        """
+        return self.CATALOG.deployment(self.spec, replica)
 
     def create_service_object(self):
         """
-        Create the service with the given specifications.
-        """
-
-        service = client.V1Service(
-            api_version="v1",
-            kind="Service",
-            metadata=client.V1ObjectMeta(
-                name=self.service
-            ),
-            spec=client.V1ServiceSpec(
-                selector={
-                    "app": self.app
-                },
-                type="LoadBalancer",
-                ports=[client.V1ServicePort(
-                    port=self.port,
-                    target_port=self.port,
-                    node_port=self.nodeport
-                )]
-            )
-        )
-        return service
+        Create the service with the given specifications from the catalog template.
+        """
+        return self.CATALOG.service(self.spec)
 
     def create_deployment_and_service(self, replica=1):
         """
@@ -280,10 +579,12 @@ class AutoScaler:
             raise exc
         # Create deployment
         try:
-            self.apps_v1.create_namespaced_deployment(
-                body=deployment, namespace="autoscaler"
-            )
+            with timed("create", self.node, self.app_type):
+                self.apps_v1.create_namespaced_deployment(
+                    body=deployment, namespace="autoscaler", _request_timeout=self.request_timeout
+                )
             self.scale = replica
+            self.deployed = True
             logging.info(
                 "Namespaced deployment %s has been successfully created.", self.name
             )
@@ -302,7 +603,9 @@ class AutoScaler:
                 "Service object %s already exists", self.service)
         # Create service
         try:
-            self.core_v1.create_namespaced_service(namespace="autoscaler", body=service)
+            self.core_v1.create_namespaced_service(
+                namespace="autoscaler", body=service, _request_timeout=self.request_timeout
+            )
             logging.info(
                 "Namespaced service %s has been successfully created.", self.name
             )
@@ -334,7 +637,7 @@ class AutoScaler:
             logging.error("Error while reading deployment %s", self.name)
             raise exc
 
-        pods = {}
+        samples = {}
         for pod in resource["items"]:
             name = pod['metadata']['name']
             if len(pod['containers']) == 0:
@@ -349,19 +652,27 @@ class AutoScaler:
             else:
                 cpu_val = 0.0
 
-            #p90_cpu = sorted(map(float, self.pod_cpu_map[name]))[int(math.ceil(n*0.9)) - 1]
+            if mem.endswith("Ki"):
+                mem_val = float(mem[:-2]) / 1024
+            elif mem.endswith("Mi"):
+                mem_val = float(mem[:-2])
+            elif mem.endswith("Gi"):
+                mem_val = float(mem[:-2]) * 1024
+            else:
+                mem_val = float(mem) / (1024 * 1024)
 
-            n = len(self.pod_cpu_map[name])
-            if n == 10: 
-                self.pod_cpu_map[name].pop(0)
-            self.pod_cpu_map[name].append(cpu_val)
+            samples[name] = {"cpu": cpu_val, "mem": mem_val}
 
-            p10_cpu = sum(map(float, self.pod_cpu_map[name])) * 0.1
-            p50_cpu = sum(map(float, self.pod_cpu_map[name])) * 0.5
-            p90_cpu = sum(map(float, self.pod_cpu_map[name])) * 0.9
+        # The percentiles cover the samples evaluate() recorded within the window
+        cpu_percentiles = self.pod_stats.percentiles("cpu", (10, 50, 90))
 
+        pods = {}
+        for name, sample in samples.items():
+            p10_cpu, p50_cpu, p90_cpu = cpu_percentiles[name].tolist() if name in cpu_percentiles \
+                else (sample["cpu"],) * 3
             pods[name] = {
-                'cpu': cpu_val , 'p10_cpu': p10_cpu, 'p50_cpu': p50_cpu, 'p90_cpu': p90_cpu
+                'cpu': sample["cpu"], 'mem': sample["mem"],
+                'p10_cpu': p10_cpu, 'p50_cpu': p50_cpu, 'p90_cpu': p90_cpu
             }
         return pods
 
@@ -384,9 +695,11 @@ class AutoScaler:
         
         # patch the deployment
         try:
-            self.apps_v1.patch_namespaced_deployment_scale(
-                name=self.name, namespace="autoscaler", body={'spec': {'replicas': replica}}
-            )
+            with timed("patch_scale", self.node, self.app_type):
+                self.apps_v1.patch_namespaced_deployment_scale(
+                    name=self.name, namespace="autoscaler", body={'spec': {'replicas': replica}},
+                    _request_timeout=self.request_timeout
+                )
             logging.info("Deployment object %s has been successfully scaled %s.", self.name, up_down)
         except Exception as exc:
             logging.error("Error while scaling deployment %s", self.name)
@@ -398,7 +711,7 @@ class AutoScaler:
         """
         Delete the deployment.
         """
-        if self.scale == 0:
+        if not self.deployed:
             logging.info("Deployment object %s does not exist.", self.name)
             return
 
@@ -411,8 +724,10 @@ class AutoScaler:
                     propagation_policy="Background",
                     grace_period_seconds=3
                 ),
+                _request_timeout=self.request_timeout
             )
-            self.scale -= 1
+            self.scale = 0
+            self.deployed = False
             logging.info("Deployment object %s has been successfully deleted.", self.name)
         except Exception as exc:
             logging.error("Error while deleting deployment %s", self.name)
@@ -425,6 +740,7 @@ class AutoScaler:
                     propagation_policy="Background",
                     grace_period_seconds=3
                 ),
+                _request_timeout=self.request_timeout
             )
             logging.info("Service object %s has been successfully deleted.", self.service)
         except Exception as exc:
@@ -433,19 +749,33 @@ class AutoScaler:
 
     ######################## END ########################
 
+    def __label_deployment(self):
+        """
+        Add the labels of the managed deployments to the existing deployment.
+        """
+        try:
+            self.apps_v1.patch_namespaced_deployment(
+                name=self.name, namespace="autoscaler", body={"metadata": {"labels": self.MANAGED_LABELS}},
+                _request_timeout=self.request_timeout
+            )
+            logging.info("Deployment %s has been labelled as managed.", self.name)
+        except Exception as exc:
+            logging.warning("Error while labelling deployment %s - %s", self.name, exc)
+
     def __set_scale(self):
         """
-        Get the replica number of deployment if it exists.
+        Get the replica number of deployment if it exists, otherwise None.
         """
         try:
             resource = self.apps_v1.read_namespaced_deployment_scale(
                 name=self.name,
-                namespace="autoscaler"
+                namespace="autoscaler",
+                _request_timeout=self.request_timeout
             )
             logging.info("Replica number of deployment %s has been successfully read.", self.name)
         except client.ApiException as exc:
             if exc.status == 404:
-                return 0
+                return None
             logging.error("Error while reading replica number of deployment %s", self.name)
             raise exc
         return int(resource.spec.replicas)
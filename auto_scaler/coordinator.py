@@ -0,0 +1,123 @@
+"""
+This module coordinates the auto scalers of the applications on one edge node
+so that they share a single resource budget of the node
+"""
+import logging
+
+
+class NodeCoordinator:
+    """
+    Collects the demands of all apps on a node, reads the node resources once and
+    allocates the remaining CPU and memory budget to the apps jointly
+    """
+
+    def __init__(self, node, auto_scalers):
+        self.node = node
+        self.auto_scalers = auto_scalers
+        self.name = f"coordinator-{node}"
+
+    def watch_and_scale(self, batch_metrics=None, app_types=None):
+        """
+        Evaluate every app on the node, or only the given app types, allocate the budget
+        and apply the resulting scales
+        """
+        batch_metrics = batch_metrics or {}
+        demands = {}
+        for auto_scaler in self.auto_scalers:
+            if app_types is not None and auto_scaler.app_type not in app_types:
+                continue
+            demand = auto_scaler.evaluate(batch_metrics.get(auto_scaler.app))
+            if demand is not None:
+                demands[auto_scaler] = demand
+
+        resource = self.auto_scalers[0].get_node_resource() if self.auto_scalers else None
+        targets = self.allocate(resource, demands)
+
+        for auto_scaler, target in targets.items():
+            if target == auto_scaler.scale:
+                continue
+            logging.info(
+                "Scaling %s from %s to %s (%s)",
+                auto_scaler.name, auto_scaler.scale, target, demands[auto_scaler]["reason"]
+            )
+            try:
+                auto_scaler.apply(target, demands[auto_scaler]["reason"])
+            except Exception as exc:
+                logging.error("Error while scaling %s - %s", auto_scaler.name, exc)
+        return targets
+
+    def allocate(self, resource, demands):
+        """
+        Grant the scale-downs, then hand out the replicas asked for by scale-ups in the order of
+        their priority per unit of cost while they fit into the CPU and memory headroom of the node.
+
+        Returns:
+        --------
+        targets: dict mapping auto scalers to their granted scale
+        """
+        targets = {auto_scaler: auto_scaler.scale for auto_scaler in demands}
+        if resource is None:
+            logging.warning("No resource data of %s, only scaling down", self.node)
+
+        cpu_budget, mem_budget = self.budget(resource)
+        scale_ups = []
+        for auto_scaler, demand in demands.items():
+            if demand["target"] < auto_scaler.scale:
+                targets[auto_scaler] = demand["target"]
+                released = auto_scaler.scale - demand["target"]
+                cpu_budget += released * self.cpu_share(resource, demand["cpu_cost"])
+                mem_budget += released * self.mem_share(resource, demand["mem_cost"])
+            elif demand["target"] > auto_scaler.scale:
+                scale_ups.append((auto_scaler, demand))
+
+        # A node over its thresholds gets no new replicas, as with a single auto scaler
+        if resource is None or cpu_budget <= 0 or mem_budget <= 0:
+            return targets
+
+        # Hand out one replica at a time so that every app gets a chance before a second one
+        units = []
+        for auto_scaler, demand in scale_ups:
+            cpu_cost = self.cpu_share(resource, demand["cpu_cost"])
+            mem_cost = self.mem_share(resource, demand["mem_cost"])
+            cost = max(cpu_cost / max(cpu_budget, 1e-9), mem_cost / max(mem_budget, 1e-9), 1e-9)
+            for step in range(demand["target"] - auto_scaler.scale):
+                value = demand["priority"] / (step + 1)
+                units.append((value / cost, auto_scaler, cpu_cost, mem_cost))
+
+        for _, auto_scaler, cpu_cost, mem_cost in sorted(units, key=lambda unit: -unit[0]):
+            if cpu_cost > cpu_budget or mem_cost > mem_budget:
+                continue
+            cpu_budget -= cpu_cost
+            mem_budget -= mem_cost
+            targets[auto_scaler] += 1
+
+        return targets
+
+    def budget(self, resource):
+        """
+        Return the CPU and memory headroom of the node in percent under the thresholds
+        """
+        if resource is None or not self.auto_scalers:
+            return 0.0, 0.0
+        thresholds = self.auto_scalers[0]
+        cpu_budget = max(0.0, thresholds.node_cpu_thres - resource["cpu_util"])
+        mem_budget = max(0.0, resource["available_mem"] - thresholds.node_mem_thres)
+        return cpu_budget, mem_budget
+
+    @staticmethod
+    def cpu_share(resource, millicores):
+        """
+        Convert a CPU cost in millicores to percent of the node
+        """
+        if resource is None or not resource.get("cpu_count"):
+            return 0.0
+        return millicores / (resource["cpu_count"] * 1000) * 100.0
+
+    @staticmethod
+    def mem_share(resource, mebibytes):
+        """
+        Convert a memory cost in MiB to percent of the node
+        """
+        if resource is None or not resource.get("mem_total"):
+            return 0.0
+        return mebibytes / resource["mem_total"] * 100.0
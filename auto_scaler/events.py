@@ -0,0 +1,188 @@
+"""
+This module lets the auto scaler react to threshold breaches between the regular ticks.
+Breach events (e.g. the p90 latency of an app over its SLO, raised by the metric collector,
+or congestion seen by a proxy) are pushed over HTTP, and the telemetry receiver raises one when
+a node goes over its CPU or memory threshold or comes back under it. Events are debounced per node/app and
+picked up by the control loop, which evaluates only the affected pairs right away; events of a pair
+evaluated within the debounce period are dropped as well.
+An event with the reason "activation" asks to scale a pair in warm standby up from zero.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+EVENTS_PORT = int(os.environ.get("AUTOSCALER_EVENTS_PORT", 8580))
+# Seconds during which further events of the same node/app are dropped
+DEBOUNCE = float(os.environ.get("AUTOSCALER_EVENT_DEBOUNCE", 5))
+# Reason of the events sent by the proxy when requests wait for a pair scaled to zero
+ACTIVATION = "activation"
+
+
+class EventTrigger:
+    """
+    Pending evaluations requested by events. A key is a (node, app) pair, or (node, None)
+    for all apps of the node.
+    """
+
+    def __init__(self, debounce=DEBOUNCE):
+        self.debounce = debounce
+        self.condition = threading.Condition()
+        self.pending = {}
+        self.accepted = {}
+
+    def push(self, node, app=None, reason="event"):
+        """
+        Request an evaluation unless one was requested for the same key within the debounce period.
+        Activations are never dropped, as requests are waiting for them.
+
+        Returns:
+        --------
+        accepted: whether the event was accepted
+        """
+        key = (node, app)
+        with self.condition:
+            now = time.monotonic()
+            if reason != ACTIVATION and now - self.accepted.get(key, float("-inf")) < self.debounce:
+                return False
+            self.accepted[key] = now
+            self.pending[key] = reason
+            self.condition.notify_all()
+        logging.info("Scaling event for %s/%s: %s", node, app or "all", reason)
+        return True
+
+    def evaluated(self, keys):
+        """
+        Record that the pairs are being evaluated, so their events within the debounce period are
+        dropped. The SLO events the metric collector raises from the metrics an evaluation requested
+        describe what that evaluation already acts on.
+        """
+        with self.condition:
+            now = time.monotonic()
+            for key in keys:
+                self.accepted[key] = now
+
+    def wait(self, timeout):
+        """
+        Wait at most timeout seconds for events
+
+        Returns:
+        --------
+        pending: dict mapping the keys of the events to their reasons, empty on timeout
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.pending, timeout=max(timeout, 0))
+            pending, self.pending = self.pending, {}
+        return pending
+
+
+class AdaptiveInterval:
+    """
+    Control period that shrinks while the load or the scales are changing and grows back while
+    they are steady. The load of a pair changes when it moves by more than load_change of the
+    larger of its previous value and min_load, so the noise of idle pairs does not count.
+    """
+
+    def __init__(self, initial=15, minimum=5, maximum=30, shrink=0.5, grow=1.25, load_change=0.25, min_load=100):
+        self.value = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.shrink = shrink
+        self.grow = grow
+        self.load_change = load_change
+        self.min_load = min_load
+        self.loads = {}
+
+    def update(self, changing, loads=None):
+        """
+        Adapt the period to a tick, given whether it changed any scale and the load of its pairs,
+        a dict mapping pairs to e.g. the CPU usage of their pods
+
+        Returns:
+        --------
+        value: the period until the next tick in seconds
+        """
+        if loads:
+            changing = self.load_changed(loads) or changing
+        if changing:
+            self.value = max(self.minimum, self.value * self.shrink)
+        else:
+            self.value = min(self.maximum, self.value * self.grow)
+        return self.value
+
+    def load_changed(self, loads):
+        """
+        Remember the loads of the pairs and tell whether any of them changed since the last tick
+        """
+        changed = False
+        for pair, load in loads.items():
+            previous = self.loads.get(pair)
+            if previous is not None and abs(load - previous) > self.load_change * max(previous, self.min_load):
+                changed = True
+            self.loads[pair] = load
+        return changed
+
+
+class EventServer:
+    """
+    HTTP endpoint accepting breach events as POST /events with a JSON body like
+    {"node": "edge1", "app": "mobilenet", "reason": "p90 over SLO"}; "app" may be left out
+    for node-wide events
+    """
+
+    def __init__(self, trigger, nodes, app_types, port=EVENTS_PORT):
+        self.trigger = trigger
+        self.nodes = set(nodes)
+        self.app_types = set(app_types)
+        self.port = port
+        self.server = None
+
+    def start(self):
+        """
+        Serve the events in a background thread
+        """
+        events = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path != "/events":
+                    self.send_error(404)
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    status, body = events.handle(json.loads(self.rfile.read(length)))
+                except (ValueError, AttributeError) as exc:
+                    status, body = 400, {"error": f"Malformed event - {exc}"}
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                logging.debug("Event server: " + format, *args)
+
+        self.server = ThreadingHTTPServer(("0.0.0.0", self.port), Handler)
+        thread = threading.Thread(target=self.server.serve_forever, name="event-server", daemon=True)
+        thread.start()
+        logging.info("Event server is listening on port %s.", self.port)
+        return self
+
+    def handle(self, event):
+        """
+        Validate an event and pass it to the trigger
+
+        Returns:
+        --------
+        status: HTTP status of the response
+        body: dict of the response
+        """
+        node = event.get("node")
+        app = event.get("app")
+        if node not in self.nodes or (app is not None and app not in self.app_types):
+            return 404, {"error": f"Unknown pair {app} on {node}"}
+        accepted = self.trigger.push(node, app, event.get("reason", "event"))
+        return 202, {"accepted": accepted}
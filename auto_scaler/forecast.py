@@ -0,0 +1,119 @@
+"""
+This module forecasts the request rate and CPU usage of a deployment a few
+ticks ahead with lightweight models fitted on a short history every tick
+"""
+from collections import deque
+
+import numpy as np
+
+MODELS = ("ewma", "holt", "linear")
+
+
+class Forecaster:
+    """
+    Keeps the recent history of several series (e.g. request rate and CPU usage) and
+    forecasts all of them at once with EWMA, Holt's linear trend and linear regression.
+    Every forecast is scored against the value that arrives horizon samples later, and
+    each series is predicted with the model that has the lowest recent error.
+    """
+
+    def __init__(self, series=2, history=40, horizon=3, alpha=0.5, beta=0.3, error_decay=0.1):
+        self.history = history
+        self.horizon = horizon
+        self.alpha = alpha
+        self.beta = beta
+        self.error_decay = error_decay
+
+        self.values = np.zeros((series, history))
+        self.count = 0
+        self.pending = deque()
+        self.mae = {model: np.zeros(series) for model in MODELS}
+        self.mape = {model: np.zeros(series) for model in MODELS}
+        self.scored = 0
+
+    def window(self):
+        """
+        Return the stored history in chronological order
+        """
+        size = min(self.count, self.history)
+        if self.count <= self.history:
+            return self.values[:, :size]
+        return np.roll(self.values, -(self.count % self.history), axis=1)
+
+    def update(self, sample):
+        """
+        Add the latest value of every series, score the forecasts made for it and
+        forecast horizon samples ahead
+        """
+        sample = np.asarray(sample, dtype=float)
+        while self.pending and self.pending[0][0] <= self.count:
+            due, forecasts = self.pending.popleft()
+            if due == self.count:
+                self.__score(forecasts, sample)
+
+        self.values[:, self.count % self.history] = sample
+        self.count += 1
+        self.pending.append((self.count + self.horizon - 1, self.forecast_all()))
+
+    def forecast_all(self):
+        """
+        Forecast every series horizon samples ahead with every model
+
+        Returns:
+        --------
+        forecasts: dict mapping model names to arrays with one forecast per series
+        """
+        series = self.window()
+        size = series.shape[1]
+        if size < 3:
+            last = series[:, -1] if size else np.zeros(self.values.shape[0])
+            return {model: last.copy() for model in MODELS}
+
+        weights = self.alpha * (1 - self.alpha) ** np.arange(size)[::-1]
+        ewma = series @ (weights / weights.sum())
+
+        level = series[:, 0]
+        trend = series[:, 1] - series[:, 0]
+        for value in series.T[1:]:
+            previous = level
+            level = self.alpha * value + (1 - self.alpha) * (level + trend)
+            trend = self.beta * (level - previous) + (1 - self.beta) * trend
+        holt = level + self.horizon * trend
+
+        slope, intercept = np.polyfit(np.arange(size), series.T, 1)
+        linear = intercept + slope * (size - 1 + self.horizon)
+
+        return {
+            "ewma": np.maximum(ewma, 0),
+            "holt": np.maximum(holt, 0),
+            "linear": np.maximum(linear, 0)
+        }
+
+    def predict(self):
+        """
+        Forecast every series with the model that has had the lowest error on it
+        """
+        forecasts = self.forecast_all()
+        if not self.scored:
+            return forecasts["holt"]
+        errors = np.vstack([self.mae[model] for model in MODELS])
+        best = errors.argmin(axis=0)
+        stacked = np.vstack([forecasts[model] for model in MODELS])
+        return stacked[best, np.arange(stacked.shape[1])]
+
+    def errors(self):
+        """
+        Return the smoothed mean absolute and mean absolute percentage errors per model
+        """
+        return {
+            model: {"mae": self.mae[model].tolist(), "mape": self.mape[model].tolist()}
+            for model in MODELS
+        }
+
+    def __score(self, forecasts, actual):
+        decay = self.error_decay if self.scored else 1.0
+        for model, forecast in forecasts.items():
+            error = np.abs(forecast - actual)
+            self.mae[model] += decay * (error - self.mae[model])
+            self.mape[model] += decay * (error / np.maximum(np.abs(actual), 1e-9) - self.mape[model])
+        self.scored += 1
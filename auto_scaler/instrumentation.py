@@ -0,0 +1,164 @@
+"""
+This module instruments the auto scaler itself: Prometheus metrics of the tick and of
+every stage of it, the slowest calls of the running tick to explain overruns, and a
+sampling profiler of all threads that is toggled at runtime with SIGUSR1
+"""
+import collections
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+METRICS_PORT = int(os.environ.get("AUTOSCALER_METRICS_PORT", 8480))
+PROFILE_INTERVAL = float(os.environ.get("AUTOSCALER_PROFILE_INTERVAL", 0.01))
+PROFILE_PATH = os.environ.get("AUTOSCALER_PROFILE_PATH", "autoscaler.folded")
+# Seconds between the checks of the disabled profiler for SIGUSR1 having enabled it
+PROFILE_IDLE_INTERVAL = 0.5
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 30)
+
+TICK_DURATION = Histogram(
+    "autoscaler_tick_seconds", "Duration of a control tick", buckets=STAGE_BUCKETS
+)
+TICK_OVERRUNS = Counter(
+    "autoscaler_tick_overruns_total", "Ticks that overran the control period"
+)
+CONTROL_INTERVAL = Gauge(
+    "autoscaler_control_interval_seconds", "Current period between the regular ticks"
+)
+EVENT_EVALUATIONS = Counter(
+    "autoscaler_event_evaluations_total", "Evaluations triggered by breach events per node/app", ["node", "app"]
+)
+STAGE_DURATION = Histogram(
+    "autoscaler_stage_seconds",
+    "Duration of the stages of a tick (node_resource, metrics, batch_metrics, patch_scale, create)",
+    ["stage", "node", "app"],
+    buckets=STAGE_BUCKETS
+)
+DECISIONS = Counter(
+    "autoscaler_decisions_total", "Applied scale changes per direction and reason", ["node", "app", "direction", "reason"]
+)
+REPLICAS = Gauge("autoscaler_replicas", "Current replicas per node/app", ["node", "app"])
+DESIRED_REPLICAS = Gauge("autoscaler_desired_replicas", "Desired replicas of the last evaluation per node/app", ["node", "app"])
+INPUT_AGE = Gauge(
+    "autoscaler_input_age_seconds", "Age of the inputs of the last evaluation (node_resource, pod_metrics)", ["node", "app", "input"]
+)
+
+
+class TickTrace:
+    """
+    Durations of the stages timed during the running tick, to tell which call made it overrun
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = []
+
+    def reset(self):
+        with self.lock:
+            self.stages = []
+
+    def record(self, duration, stage, node, app):
+        with self.lock:
+            self.stages.append((duration, stage, node, app))
+
+    def slowest(self, count=5):
+        with self.lock:
+            return sorted(self.stages, reverse=True)[:count]
+
+
+tick_trace = TickTrace()
+
+
+@contextmanager
+def timed(stage, node="all", app="all"):
+    """
+    Time the block as a stage of the tick
+    """
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        duration = time.monotonic() - start
+        STAGE_DURATION.labels(stage, node, app).observe(duration)
+        tick_trace.record(duration, stage, node, app)
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of all threads while enabled and writes them in the folded format
+    of flame graphs when disabled. cProfile would only see the thread that enables it,
+    while the evaluations run in the thread pool.
+
+    toggle() runs in the SIGUSR1 handler and only flips the enabled flag; the profiler thread
+    notices the change, samples and writes the file outside the handler.
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL, path=PROFILE_PATH, idle_interval=PROFILE_IDLE_INTERVAL):
+        self.interval = interval
+        self.idle_interval = idle_interval
+        self.path = path
+        self.stacks = collections.Counter()
+        self.enabled = False
+        self.thread = None
+
+    def toggle(self, *args):
+        self.enabled = not self.enabled
+
+    def start(self):
+        """
+        Start the profiler thread, which samples while the profiler is enabled
+        """
+        self.thread = threading.Thread(target=self.__run, name="sampling-profiler", daemon=True)
+        self.thread.start()
+        return self
+
+    def write(self):
+        """
+        Write the sampled stacks to the profile file and log the hottest ones
+        """
+        with open(self.path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        logging.info("Sampling profiler stopped, %d samples written to %s", sum(self.stacks.values()), self.path)
+        for stack, count in self.stacks.most_common(5):
+            logging.info("Hot stack (%d samples): %s", count, " <- ".join(reversed(stack.split(";")[-3:])))
+
+    def __run(self):
+        while True:
+            if not self.enabled:
+                time.sleep(self.idle_interval)
+                continue
+            self.stacks.clear()
+            logging.info("Sampling profiler started")
+            while self.enabled:
+                self.__sample()
+                time.sleep(self.interval)
+            self.write()
+
+    def __sample(self):
+        own = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+
+
+def start(port=METRICS_PORT):
+    """
+    Serve the metrics and install the SIGUSR1 handler that toggles the profiler
+    """
+    start_http_server(port)
+    profiler = SamplingProfiler().start()
+    signal.signal(signal.SIGUSR1, profiler.toggle)
+    logging.info("Serving the auto scaler metrics on port %d, SIGUSR1 toggles the profiler", port)
+    return profiler
@@ -0,0 +1,107 @@
+"""
+This module keeps the recent samples of every pod of a deployment in preallocated
+NumPy ring buffers and computes their statistics for all pods at once
+"""
+import logging
+import warnings
+
+import numpy as np
+
+
+class PodStatsStore:
+    """
+    Ring buffers of the last window samples of the given fields for up to max_pods pods.
+    Pods missing from an update are evicted, so the memory stays constant under pod churn.
+    """
+
+    def __init__(self, fields=("cpu", "mem"), max_pods=60, window=10):
+        self.fields = {field: index for index, field in enumerate(fields)}
+        self.max_pods = max_pods
+        self.window = window
+
+        self.values = np.full((len(fields), max_pods, window), np.nan)
+        self.timestamps = np.full((max_pods, window), np.nan)
+        self.counts = np.zeros(max_pods, dtype=np.int64)
+        self.slots = {}
+        self.free = list(range(max_pods - 1, -1, -1))
+
+    def __len__(self):
+        return len(self.slots)
+
+    def update(self, samples, timestamp):
+        """
+        Add one sample per pod from a dict mapping pod names to their field values
+        and evict the pods that are not in it
+        """
+        for pod in [pod for pod in self.slots if pod not in samples]:
+            self.evict(pod)
+
+        for pod, sample in samples.items():
+            row = self.slots.get(pod)
+            if row is None:
+                if not self.free:
+                    logging.warning("Pod statistics store is full, skipping pod %s", pod)
+                    continue
+                row = self.slots[pod] = self.free.pop()
+            column = self.counts[row] % self.window
+            for field, index in self.fields.items():
+                self.values[index, row, column] = sample.get(field, np.nan)
+            self.timestamps[row, column] = timestamp
+            self.counts[row] += 1
+
+    def evict(self, pod):
+        """
+        Drop the samples of a pod and free its slot
+        """
+        row = self.slots.pop(pod)
+        self.values[:, row, :] = np.nan
+        self.timestamps[row, :] = np.nan
+        self.counts[row] = 0
+        self.free.append(row)
+
+    def __rows(self):
+        pods = list(self.slots)
+        return pods, np.fromiter((self.slots[pod] for pod in pods), dtype=np.int64, count=len(pods))
+
+    def percentiles(self, field, percentiles=(10, 50, 90)):
+        """
+        Return the dict mapping pods to the given percentiles of the field over the window
+        """
+        pods, rows = self.__rows()
+        if not pods:
+            return {}
+        with warnings.catch_warnings():
+            # Pods without a sample of the field get NaN
+            warnings.simplefilter("ignore", RuntimeWarning)
+            values = np.nanpercentile(self.values[self.fields[field], rows], percentiles, axis=1)
+        return {pod: values[:, i] for i, pod in enumerate(pods)}
+
+    def means(self, field):
+        """
+        Return the dict mapping pods to the mean of the field over the window
+        """
+        pods, rows = self.__rows()
+        if not pods:
+            return {}
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            values = np.nanmean(self.values[self.fields[field], rows], axis=1)
+        return dict(zip(pods, values.tolist()))
+
+    def rates(self, field):
+        """
+        Return the dict mapping pods to the change of the field per second over the window
+        """
+        pods, rows = self.__rows()
+        if not pods:
+            return {}
+        counts = self.counts[rows]
+        newest = (counts - 1) % self.window
+        oldest = np.where(counts > self.window, counts % self.window, 0)
+        values = self.values[self.fields[field], rows]
+        index = np.arange(len(rows))
+        elapsed = self.timestamps[rows, newest] - self.timestamps[rows, oldest]
+        change = values[index, newest] - values[index, oldest]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rates = np.where(elapsed > 0, change / elapsed, 0.0)
+        return dict(zip(pods, rates.tolist()))
@@ -0,0 +1,144 @@
+"""
+This module holds the scaling policies of the auto scaler. A policy takes a
+snapshot of the pod metrics of a deployment and its current scale and returns
+the recommended scale along with the reason of the recommendation.
+
+The policy of each application type and its tuning are selected in policies.json, or in
+the file given by the SCALING_POLICY_CONFIG environment variable. The CPU target and the
+p90 latency SLO of an application are not part of it: they come from the spec of the pair in
+the catalog.
+"""
+import json
+import math
+import os
+
+POLICY_CONFIG = os.environ.get(
+    "SCALING_POLICY_CONFIG", os.path.join(os.path.dirname(__file__), "policies.json")
+)
+
+
+class ScalingPolicy:
+    """
+    Base class of the scaling policies.
+
+    The snapshot holds the number of pods ("pod_num"), the averages over the pods of
+    "res_time", "p10_res_time", "p50_res_time" and "p90_res_time" in seconds, and of
+    "cpu" in millicores and "mem" in MiB.
+    """
+
+    name = None
+
+    def recommend(self, snapshot, scale):
+        """
+        Return the recommended scale and the reason of the recommendation
+        """
+        raise NotImplementedError
+
+
+class LegacyPolicy(ScalingPolicy):
+    """
+    The original rule: scale up when the average response time exceeds the p90 response time
+    or the CPU usage asks for more replicas, scale down when it falls below the p10 response time
+    or the CPU usage asks for fewer replicas
+    """
+
+    name = "legacy"
+
+    def __init__(self, target_cpu, **kwargs):
+        self.target_cpu = target_cpu
+
+    def recommend(self, snapshot, scale):
+        desired = math.ceil(snapshot["pod_num"] * snapshot["cpu"] / self.target_cpu)
+        if snapshot["res_time"] > snapshot["p90_res_time"] or desired > scale:
+            reason = "latency" if snapshot["res_time"] > snapshot["p90_res_time"] else "cpu"
+            return max(desired, scale + 1), reason
+        if snapshot["res_time"] < snapshot["p10_res_time"] or desired < scale:
+            reason = "latency" if snapshot["res_time"] < snapshot["p10_res_time"] else "cpu"
+            return min(desired, scale - 1), reason
+        return scale, "steady"
+
+
+class CpuTargetPolicy(ScalingPolicy):
+    """
+    Keep the average CPU usage of the pods at the target, ignoring deviations within the tolerance
+    """
+
+    name = "cpu"
+
+    def __init__(self, target_cpu, tolerance=0.1, **kwargs):
+        self.target_cpu = target_cpu
+        self.tolerance = tolerance
+
+    def recommend(self, snapshot, scale):
+        ratio = snapshot["cpu"] / self.target_cpu
+        if abs(ratio - 1) <= self.tolerance:
+            return scale, "steady"
+        return math.ceil(snapshot["pod_num"] * ratio), "cpu"
+
+
+class LatencySloPolicy(ScalingPolicy):
+    """
+    Keep the p90 response time under the SLO. The scale grows in proportion to the SLO
+    violation and shrinks by one replica while the p90 stays below low_ratio of the SLO.
+    """
+
+    name = "latency"
+
+    def __init__(self, slo_p90_ms, low_ratio=0.75, **kwargs):
+        self.slo_p90_ms = slo_p90_ms
+        self.low_ratio = low_ratio
+
+    def recommend(self, snapshot, scale):
+        p90_ms = snapshot["p90_res_time"] * 1000
+        if p90_ms > self.slo_p90_ms:
+            return max(scale + 1, math.ceil(scale * p90_ms / self.slo_p90_ms)), "latency"
+        if p90_ms < self.low_ratio * self.slo_p90_ms:
+            return scale - 1, "latency"
+        return scale, "steady"
+
+
+class HybridPolicy(ScalingPolicy):
+    """
+    Scale up when either the CPU target or the latency SLO asks for it,
+    scale down only when both allow it
+    """
+
+    name = "hybrid"
+
+    def __init__(self, target_cpu, slo_p90_ms, tolerance=0.1, low_ratio=0.75, **kwargs):
+        self.cpu = CpuTargetPolicy(target_cpu, tolerance)
+        self.latency = LatencySloPolicy(slo_p90_ms, low_ratio)
+
+    def recommend(self, snapshot, scale):
+        cpu_target, cpu_reason = self.cpu.recommend(snapshot, scale)
+        latency_target, latency_reason = self.latency.recommend(snapshot, scale)
+        if latency_target > cpu_target:
+            return latency_target, latency_reason
+        return cpu_target, cpu_reason
+
+
+POLICIES = {
+    policy.name: policy for policy in (LegacyPolicy, CpuTargetPolicy, LatencySloPolicy, HybridPolicy)
+}
+
+
+def load_policy_config(path=POLICY_CONFIG):
+    """
+    Read the per-application policy configuration
+    """
+    with open(path) as f:
+        return json.load(f)
+
+
+def build_policy(app, config, target_cpu, slo_p90_ms=None):
+    """
+    Create the policy configured for the application type, targeting the CPU usage
+    (millicores) and the p90 response time (ms) of its catalog spec
+    """
+    app_config = dict(config.get(app, {}))
+    app_config["target_cpu"] = target_cpu
+    app_config["slo_p90_ms"] = slo_p90_ms
+    policy = app_config.pop("policy", "legacy")
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown scaling policy {policy} for {app}")
+    return POLICIES[policy](**app_config)
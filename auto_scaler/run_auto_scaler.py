@@ -1,14 +1,173 @@
-from time import sleep
+"""
+This script runs the auto-scalers of all node/app pairs concurrently on a control
+period that adapts to the load, and evaluates the pairs named by breach events
+right away between the regular ticks
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
 from auto_scaler.auto_scaler import AutoScaler
+from auto_scaler.coordinator import NodeCoordinator
+from auto_scaler.events import ACTIVATION, AdaptiveInterval, EventServer, EventTrigger
+from auto_scaler.instrumentation import (CONTROL_INTERVAL, EVENT_EVALUATIONS, TICK_DURATION, TICK_OVERRUNS,
+                                         start as start_instrumentation, tick_trace)
+from telemetry import TelemetryReceiver
+
+edge_servers = list(AutoScaler.CATALOG.nodes)
+application_types = list(AutoScaler.CATALOG.app_types)
+
+TICK_INTERVAL = 15
+# Bounds of the control period, which shrinks while the load or the scales change and grows while they are steady
+MIN_TICK_INTERVAL = 5
+MAX_TICK_INTERVAL = 30
+TICK_TIMEOUT = 12
+MAX_WORKERS = 8
+
+
+def run_tick(executor, coordinators, in_flight, targets=None, trigger=None):
+    """
+    Evaluate the nodes in parallel and wait at most TICK_TIMEOUT seconds for them.
+    A node whose evaluation from a previous tick is still running is skipped.
+    The pod metrics of all pairs are fetched with one batch request; pairs missing from it
+    fall back to their own request. targets maps nodes to the app types to evaluate
+    (None for all of them); without targets every pair is evaluated. The evaluated pairs are
+    recorded on the trigger before their metrics are fetched, so the breach events raised from
+    these metrics do not evaluate them a second time.
+
+    Returns:
+    --------
+    changed: whether the scale of any evaluated pair changed
+    loads: dict mapping the app labels of the batch to the CPU usage of their pods in millicores
+    """
+    if targets is None:
+        selected = {coordinator: None for coordinator in coordinators}
+    else:
+        selected = {
+            coordinator: targets[coordinator.node] for coordinator in coordinators if coordinator.node in targets
+        }
+    auto_scaler_list = [
+        auto_scaler for coordinator, app_types in selected.items() for auto_scaler in coordinator.auto_scalers
+        if app_types is None or auto_scaler.app_type in app_types
+    ]
+    scales = {auto_scaler: auto_scaler.scale for auto_scaler in auto_scaler_list}
+    if trigger is not None:
+        trigger.evaluated((auto_scaler.node, auto_scaler.app_type) for auto_scaler in auto_scaler_list)
+    batch_metrics = AutoScaler.get_batch_metrics(auto_scaler_list) or {}
+    futures = {}
+    for coordinator, app_types in selected.items():
+        previous = in_flight.get(coordinator)
+        if previous is not None and not previous.done():
+            logging.warning("Previous evaluation of %s is still running, skipping", coordinator.name)
+            continue
+        future = executor.submit(coordinator.watch_and_scale, batch_metrics, app_types)
+        in_flight[coordinator] = future
+        futures[future] = coordinator
+
+    done, not_done = wait(futures, timeout=TICK_TIMEOUT)
+    for future in done:
+        exc = future.exception()
+        if exc is not None:
+            logging.error("Error while evaluating %s - %s", futures[future].name, exc)
+    for future in not_done:
+        logging.warning("Evaluation of %s did not finish within %s s", futures[future].name, TICK_TIMEOUT)
+    loads = {
+        label: sum(metric.get("cpu", 0.0) for metric in pod_metrics.values())
+        for label, pod_metrics in batch_metrics.items()
+    }
+    return any(auto_scaler.scale != scale for auto_scaler, scale in scales.items()), loads
+
+
+def event_targets(events):
+    """
+    Group the keys of pending events into the targets of run_tick
+    """
+    targets = {}
+    for node, app in events:
+        if app is None or targets.get(node, set()) is None:
+            targets[node] = None
+        else:
+            targets.setdefault(node, set()).add(app)
+    return targets
+
+
+def handle_events(trigger, executor, coordinators, in_flight, auto_scalers, timeout):
+    """
+    Wait at most timeout seconds for events and evaluate the pairs they name. Activations
+    are requested from the auto scalers of their pairs first.
+
+    Returns:
+    --------
+    changed: whether the scale of any evaluated pair changed, None without events
+    """
+    events = trigger.wait(timeout)
+    if not events:
+        return None
+    for (node, app), reason in events.items():
+        EVENT_EVALUATIONS.labels(node, app or "all").inc()
+        if reason == ACTIVATION and (node, app) in auto_scalers:
+            auto_scalers[(node, app)].request_activation()
+    tick_trace.reset()
+    changed, _ = run_tick(executor, coordinators, in_flight, event_targets(events), trigger)
+    return changed
 
-edge_servers = ["edge1", "edge2", "edge3"]
-application_types = ["mobilenet", "shufflenet", "squeezenet", "binaryalert"]
 
 if __name__ == '__main__':
 
-    auto_scaler_list = [AutoScaler(node, app) for node in edge_servers for app in application_types]
+    start_instrumentation()
+    trigger = EventTrigger()
+    EventServer(trigger, edge_servers, application_types).start()
+    telemetry = TelemetryReceiver(
+        on_event=lambda node, reason: trigger.push(node, None, reason), nodes=edge_servers
+    ).start()
+    # All auto scalers share one Kubernetes client and read their scales from one list call
+    api_clients = AutoScaler.shared_api_clients()
+    known_scales = AutoScaler.discover_scales(api_clients[2])
+    if AutoScaler.WARM_STANDBY:
+        AutoScaler.ensure_image_prepull(api_clients[2])
+    coordinators = [
+        NodeCoordinator(node, [
+            AutoScaler(node, app, telemetry, api_clients, known_scales) for app in application_types
+        ])
+        for node in edge_servers
+    ]
     #[auto_scaler.create_deployment_and_service(1) for auto_scaler in auto_scaler_list]
-    
-    while True:
-        [auto_scaler.watch_and_scale() for auto_scaler in auto_scaler_list] 
-        sleep(15)
+    auto_scalers = {
+        (auto_scaler.node, auto_scaler.app_type): auto_scaler
+        for coordinator in coordinators for auto_scaler in coordinator.auto_scalers
+    }
+    in_flight = {}
+    interval = AdaptiveInterval(TICK_INTERVAL, MIN_TICK_INTERVAL, MAX_TICK_INTERVAL)
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        next_tick = time.monotonic()
+        while True:
+            tick_start = time.monotonic()
+            tick_trace.reset()
+            stale_nodes = telemetry.stale_nodes(edge_servers)
+            if stale_nodes:
+                logging.warning("Resource data of %s is stale, scaling up is paused there", stale_nodes)
+            changed, loads = run_tick(executor, coordinators, in_flight, trigger=trigger)
+            tick_duration = time.monotonic() - tick_start
+            TICK_DURATION.observe(tick_duration)
+            CONTROL_INTERVAL.set(interval.update(changed, loads))
+            logging.info("Tick took %.3f s, next one in %.1f s", tick_duration, interval.value)
+
+            # Keep the cadence measured from tick start and drop the ticks that were overrun
+            next_tick += interval.value
+            now = time.monotonic()
+            if next_tick < now:
+                TICK_OVERRUNS.inc()
+                logging.warning(
+                    "Tick overran the control period of %.1f s, slowest calls: %s", interval.value,
+                    ", ".join(f"{stage} {node}/{app} {duration:.3f} s" for duration, stage, node, app in tick_trace.slowest())
+                )
+                next_tick = now
+
+            # Until the next tick, evaluate the pairs of breach events as they arrive
+            while now < next_tick:
+                changed = handle_events(trigger, executor, coordinators, in_flight, auto_scalers, next_tick - now)
+                if changed:
+                    CONTROL_INTERVAL.set(interval.update(True))
+                    next_tick = min(next_tick, time.monotonic() + interval.value)
+                now = time.monotonic()
@@ -0,0 +1,390 @@
+"""
+This script replays recorded or synthetic load traces through the scaling logic
+of the auto scalers without a cluster. The Kubernetes API, the metric collector and
+the resource monitors are replaced by in-memory fakes driven by a virtual clock,
+so hours of traffic are simulated in seconds.
+
+python -m auto_scaler.simulator --trace burst --duration 3600
+python -m auto_scaler.simulator --trace trace.json
+"""
+import argparse
+import json
+import logging
+import math
+import time
+from collections import Counter, defaultdict, deque
+from types import SimpleNamespace
+
+from kubernetes import client
+
+from auto_scaler.auto_scaler import AutoScaler
+from auto_scaler.coordinator import NodeCoordinator
+from auto_scaler.policies import POLICIES, load_policy_config
+
+edge_servers = list(AutoScaler.CATALOG.nodes)
+application_types = list(AutoScaler.CATALOG.app_types)
+
+# Service time (s), CPU cost per request (millicore-seconds), capacity (req/s) and
+# idle CPU (millicores) of one replica of each application
+APP_PROFILES = {
+    "mobilenet": {"service_time": 0.20, "cpu_per_req": 50.0, "capacity": 8.0, "idle_cpu": 20.0},
+    "shufflenet": {"service_time": 0.10, "cpu_per_req": 12.5, "capacity": 16.0, "idle_cpu": 10.0},
+    "squeezenet": {"service_time": 0.10, "cpu_per_req": 12.5, "capacity": 16.0, "idle_cpu": 10.0},
+    "binaryalert": {"service_time": 0.05, "cpu_per_req": 3.0, "capacity": 30.0, "idle_cpu": 5.0}
+}
+NODE_CPU_COUNT = 8
+NODE_MEM_TOTAL = 16384
+POD_MEM = 300.0
+POD_STARTUP = 20.0
+SLO_FACTOR = 2.0
+# Seconds of response times the pods report their percentiles over
+LATENCY_WINDOW = 60
+
+
+class VirtualClock:
+    """
+    Monotonic clock advanced by the simulator
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeCluster:
+    """
+    In-memory replacement of the Kubernetes APIs used by the auto scaler.
+    Pods of a deployment become ready POD_STARTUP seconds after they are created.
+    """
+
+    def __init__(self, clock, initial_replicas):
+        self.clock = clock
+        self.calls = Counter()
+        self.deployments = {}
+        self.services = set()
+        for name, replicas in initial_replicas.items():
+            self.set_replicas(name, replicas)
+
+    def set_replicas(self, name, replicas):
+        """
+        Start or stop pods so that the deployment has the given number of replicas
+        """
+        pods = self.deployments.setdefault(name, [])
+        while len(pods) < replicas:
+            pods.append({"ready_at": self.clock() + POD_STARTUP, "req_count": 0.0})
+        del pods[replicas:]
+
+    def ready_pods(self, name):
+        """
+        Return the pods of the deployment that have finished starting
+        """
+        return [pod for pod in self.deployments.get(name, []) if pod["ready_at"] <= self.clock()]
+
+    # AppsV1Api
+    def list_namespaced_deployment(self, namespace, **kwargs):
+        self.calls["list_namespaced_deployment"] += 1
+        return SimpleNamespace(items=[
+            SimpleNamespace(metadata=SimpleNamespace(name=name), spec=SimpleNamespace(replicas=len(pods)))
+            for name, pods in self.deployments.items()
+        ])
+
+    def read_namespaced_deployment_scale(self, name, namespace, **kwargs):
+        self.calls["read_namespaced_deployment_scale"] += 1
+        if name not in self.deployments:
+            raise client.ApiException(status=404)
+        return SimpleNamespace(spec=SimpleNamespace(replicas=len(self.deployments[name])))
+
+    def create_namespaced_deployment(self, body, namespace, **kwargs):
+        self.calls["create_namespaced_deployment"] += 1
+        self.set_replicas(body["metadata"]["name"], body["spec"]["replicas"])
+
+    def patch_namespaced_deployment_scale(self, name, namespace, body, **kwargs):
+        self.calls["patch_namespaced_deployment_scale"] += 1
+        self.set_replicas(name, body["spec"]["replicas"])
+
+    def delete_namespaced_deployment(self, name, namespace, **kwargs):
+        self.calls["delete_namespaced_deployment"] += 1
+        self.deployments.pop(name, None)
+
+    # CoreV1Api
+    def create_namespaced_service(self, namespace, body, **kwargs):
+        self.calls["create_namespaced_service"] += 1
+        self.services.add(body["metadata"]["name"])
+
+    def delete_namespaced_service(self, name, namespace, **kwargs):
+        self.calls["delete_namespaced_service"] += 1
+        self.services.discard(name)
+
+
+class FakeTelemetry:
+    """
+    Replacement of the telemetry receiver serving node resources computed by the simulator
+    """
+
+    stale_after = float("inf")
+
+    def __init__(self, simulator):
+        self.simulator = simulator
+        self.reads = 0
+
+    def latest(self, node):
+        self.reads += 1
+        return self.simulator.node_resource(node), 0.0
+
+
+def synthetic_trace(kind, duration, step):
+    """
+    Build a trace of request rates (req/s) per node/app pair
+
+    Returns:
+    --------
+    trace: dict mapping app labels (e.g. "mobilenet-edge1") to one rate per step
+    """
+    samples = int(duration / step)
+    trace = {}
+    for i, (node, app) in enumerate((node, app) for node in edge_servers for app in application_types):
+        capacity = APP_PROFILES[app]["capacity"]
+        rates = []
+        for n in range(samples):
+            t = n * step
+            if kind == "step":
+                rate = capacity * (1 if t < duration / 3 else 8 if t < 2 * duration / 3 else 2)
+            elif kind == "burst":
+                in_burst = (t + 97 * i) % 900 < 180
+                rate = capacity * (10 if in_burst else 1)
+            else:
+                rate = capacity * (5 + 4 * math.sin(2 * math.pi * (t / duration + i / 12)))
+            rates.append(rate * 0.6)
+        trace[AutoScaler.CATALOG.spec(node, app).app] = rates
+    return trace
+
+
+class Simulator:
+    """
+    Drives the node coordinators with a trace and measures the scaling behaviour
+    """
+
+    def __init__(self, trace, step=1.0, tick_interval=15, initial_replicas=1):
+        unknown = [label for label in trace if AutoScaler.CATALOG.by_label(label) is None]
+        if unknown:
+            raise ValueError(f"Trace labels {unknown} are not app labels of the catalog")
+        self.trace = trace
+        self.step = step
+        self.tick_interval = tick_interval
+        self.clock = VirtualClock()
+        self.rates = {label: 0.0 for label in trace}
+        self.latencies = {label: deque() for label in trace}
+
+        self.cluster = FakeCluster(self.clock, {
+            AutoScaler.CATALOG.spec(node, app).name: initial_replicas
+            for node in edge_servers for app in application_types
+        })
+        self.telemetry = FakeTelemetry(self)
+        api_clients = (None, self.cluster, self.cluster)
+        known_scales = AutoScaler.discover_scales(self.cluster)
+        self.coordinators = []
+        for node in edge_servers:
+            auto_scalers = []
+            for app in application_types:
+                auto_scaler = AutoScaler(node, app, self.telemetry, api_clients, known_scales)
+                auto_scaler.clock = self.clock
+                auto_scalers.append(auto_scaler)
+            self.coordinators.append(NodeCoordinator(node, auto_scalers))
+
+        self.slo_violation = defaultdict(float)
+        self.replica_seconds = defaultdict(float)
+        self.deficit_start = {}
+        self.deficit_durations = []
+        self.last_direction = {}
+        self.oscillations = defaultdict(int)
+
+    def pod_state(self, label):
+        """
+        Return the per-pod request rate, latency and CPU of an app in the current step
+        """
+        spec = AutoScaler.CATALOG.by_label(label)
+        profile = APP_PROFILES[spec.app_type]
+        pods = self.cluster.ready_pods(spec.name)
+        if not pods:
+            return pods, 0.0, float("inf"), 0.0
+        rate = self.rates[label] / len(pods)
+        utilization = min(rate / profile["capacity"], 0.95)
+        latency = profile["service_time"] / (1 - utilization)
+        cpu = profile["idle_cpu"] + rate * profile["cpu_per_req"]
+        return pods, rate, latency, cpu
+
+    def pod_metrics(self, label):
+        """
+        Build the pod metrics of an app as the metric collector would return them
+        """
+        pods, _, latency, cpu = self.pod_state(label)
+        history = sorted(value for _, value in self.latencies[label]) or [latency]
+
+        def percentile(q):
+            return history[min(len(history) - 1, int(q * len(history)))]
+
+        return {
+            f"{label}-{index}": {
+                "req_count": pod["req_count"],
+                "res_time": latency,
+                "p10_res_time": percentile(0.1),
+                "p50_res_time": percentile(0.5),
+                "p90_res_time": percentile(0.9),
+                "p50_all_res_times": percentile(0.5),
+                "p90_all_res_times": percentile(0.9),
+                "cpu": cpu,
+                "mem": POD_MEM
+            }
+            for index, pod in enumerate(pods)
+        }
+
+    def node_resource(self, node):
+        """
+        Compute the CPU utilization and available memory of a node from its pods
+        """
+        cpu_total = 0.0
+        mem_total = 0.0
+        for app in application_types:
+            spec = AutoScaler.CATALOG.spec(node, app)
+            pods, _, _, cpu = self.pod_state(spec.app)
+            starting = len(self.cluster.deployments.get(spec.name, [])) - len(pods)
+            cpu_total += cpu * len(pods) + starting * APP_PROFILES[app]["idle_cpu"]
+            mem_total += POD_MEM * (len(pods) + starting)
+        return {
+            "cpu_util": min(100.0, cpu_total / (NODE_CPU_COUNT * 1000) * 100.0),
+            "available_mem": max(0.0, 100.0 - mem_total / NODE_MEM_TOTAL * 100.0),
+            "cpu_count": NODE_CPU_COUNT,
+            "mem_total": NODE_MEM_TOTAL
+        }
+
+    def advance(self, index):
+        """
+        Advance the cluster by one step of the trace and account the metrics of the step
+        """
+        for label, rates in self.trace.items():
+            self.rates[label] = rates[min(index, len(rates) - 1)]
+            spec = AutoScaler.CATALOG.by_label(label)
+            app = spec.app_type
+            pods, rate, latency, _ = self.pod_state(label)
+            for pod in pods:
+                pod["req_count"] += rate * self.step
+
+            if pods:
+                history = self.latencies[label]
+                history.append((self.clock.now, latency))
+                while history[0][0] < self.clock.now - LATENCY_WINDOW:
+                    history.popleft()
+
+            replicas = len(self.cluster.deployments.get(spec.name, []))
+            self.replica_seconds[label] += replicas * self.step
+            if self.rates[label] > 0 and latency > APP_PROFILES[app]["service_time"] * SLO_FACTOR:
+                self.slo_violation[label] += self.step
+
+            required = math.ceil(self.rates[label] / (APP_PROFILES[app]["capacity"] * 0.6))
+            if len(pods) < required:
+                self.deficit_start.setdefault(label, self.clock.now)
+            elif label in self.deficit_start:
+                self.deficit_durations.append(self.clock.now - self.deficit_start.pop(label))
+        self.clock.now += self.step
+
+    def tick(self):
+        """
+        Run one evaluation of all node coordinators
+        """
+        batch_metrics = {label: self.pod_metrics(label) for label in self.trace}
+        for coordinator in self.coordinators:
+            before = {auto_scaler.app: auto_scaler.scale for auto_scaler in coordinator.auto_scalers}
+            coordinator.watch_and_scale(batch_metrics)
+            for auto_scaler in coordinator.auto_scalers:
+                change = auto_scaler.scale - before[auto_scaler.app]
+                if change == 0:
+                    continue
+                direction = 1 if change > 0 else -1
+                if self.last_direction.get(auto_scaler.app, direction) != direction:
+                    self.oscillations[auto_scaler.app] += 1
+                self.last_direction[auto_scaler.app] = direction
+
+    def run(self):
+        """
+        Replay the whole trace and return the report
+        """
+        samples = max(len(rates) for rates in self.trace.values())
+        steps_per_tick = max(1, int(self.tick_interval / self.step))
+        started = time.monotonic()
+        for index in range(samples):
+            if index % steps_per_tick == 0:
+                self.tick()
+            self.advance(index)
+        wall = time.monotonic() - started
+        return self.report(samples * self.step, wall)
+
+    def report(self, simulated, wall):
+        """
+        Summarize the scaling behaviour of the run
+        """
+        durations = self.deficit_durations + [
+            self.clock.now - start for start in self.deficit_start.values()
+        ]
+        return {
+            "simulated_seconds": simulated,
+            "wall_seconds": round(wall, 3),
+            "speedup": round(simulated / wall, 1) if wall > 0 else None,
+            "convergence_time_mean": round(sum(durations) / len(durations), 1) if durations else 0.0,
+            "convergence_time_max": max(durations) if durations else 0.0,
+            "slo_violation_seconds": sum(self.slo_violation.values()),
+            "replica_seconds": sum(self.replica_seconds.values()),
+            "api_calls": dict(self.cluster.calls),
+            "resource_reads": self.telemetry.reads,
+            "oscillations": sum(self.oscillations.values()),
+            "per_pair": {
+                label: {
+                    "slo_violation_seconds": self.slo_violation[label],
+                    "replica_seconds": self.replica_seconds[label]
+                }
+                for label in self.trace
+            }
+        }
+
+
+def load_trace(path):
+    """
+    Load a recorded trace from a JSON file of the form
+    {"step": 1.0, "rates": {"mobilenet-edge1": [req/s per step, ...], ...}}
+    """
+    with open(path) as f:
+        recorded = json.load(f)
+    return recorded["rates"], float(recorded.get("step", 1.0))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Replay load traces through the auto scalers")
+    parser.add_argument("--trace", default="burst",
+                        help="step, burst, diurnal or the path of a recorded JSON trace")
+    parser.add_argument("--duration", type=float, default=3600, help="seconds of synthetic traces")
+    parser.add_argument("--step", type=float, default=1.0, help="seconds per simulation step")
+    parser.add_argument("--tick", type=float, default=15, help="seconds between evaluations")
+    parser.add_argument("--scale-mode", default=AutoScaler.SCALE_MODE,
+                        choices=["multi_step", "single_step"])
+    parser.add_argument("--policy", choices=sorted(POLICIES),
+                        help="scaling policy of all apps instead of the one in policies.json")
+    parser.add_argument("--per-pair", action="store_true", help="include per node/app results")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    AutoScaler.SCALE_MODE = args.scale_mode
+    if args.policy:
+        policy_config = load_policy_config()
+        for app_config in policy_config.values():
+            app_config["policy"] = args.policy
+        AutoScaler.POLICY_CONFIG = policy_config
+    if args.trace in ("step", "burst", "diurnal"):
+        trace, step = synthetic_trace(args.trace, args.duration, args.step), args.step
+    else:
+        trace, step = load_trace(args.trace)
+
+    result = Simulator(trace, step=step, tick_interval=args.tick).run()
+    if not args.per_pair:
+        result.pop("per_pair")
+    print(json.dumps(result, indent=2))
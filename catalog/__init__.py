@@ -0,0 +1,218 @@
+"""
+This package holds the catalog of the edge nodes and application types shared by the
+auto scaler, the metric collectors and the proxy. The catalog is read once from
+catalog.json, or from the file given by the CATALOG_FILE environment variable, and the
+spec of every node/app pair, with its names, ports and ready-made deployment and service
+manifests, is built up front so the services only look them up.
+
+An app may declare the p90 response time SLO of its pods in milliseconds ("slo_p90_ms"), which
+the latency policies of the auto scaler and the SLO events of the metric collector both follow.
+
+The NodePort of an app on a node is its node_port_base plus the index of the node, unless
+the node lists its own "node_ports".
+
+The catalog also builds the DaemonSet that pulls the images of all apps on the edge nodes
+in advance, so that scaling a pair up from zero does not wait for the image pull.
+"""
+import copy
+import json
+import os
+from collections import namedtuple
+
+CATALOG_FILE = os.environ.get(
+    "CATALOG_FILE", os.path.join(os.path.dirname(__file__), "catalog.json")
+)
+# Labels of the deployments and services created by the auto scaler
+MANAGED_LABELS = {"app.kubernetes.io/managed-by": "kubeedge-autoscaler"}
+PREPULL_NAME = "image-prepull"
+# Container that keeps the pre-pull pods alive once their init containers pulled the images
+PAUSE_IMAGE = os.environ.get("PAUSE_IMAGE", "registry.k8s.io/pause:3.9")
+
+PairSpec = namedtuple("PairSpec", [
+    "node", "app_type", "app", "name", "service", "image", "port", "node_port",
+    "node_ip", "target_cpu", "cpu_request", "slo_p90_ms", "deployment_template", "service_template"
+])
+
+
+def deployment_template(spec):
+    """
+    Build the deployment manifest of a node/app pair, pinned to the node
+    """
+    return {
+        "apiVersion": "apps/v1",
+        "kind": "Deployment",
+        "metadata": {"name": spec["name"], "labels": dict(MANAGED_LABELS)},
+        "spec": {
+            "replicas": 1,
+            "selector": {"matchLabels": {"app": spec["app"]}},
+            "template": {
+                "metadata": {"labels": {"app": spec["app"]}},
+                "spec": {
+                    "nodeName": spec["node"],
+                    "containers": [{
+                        "name": spec["app"],
+                        "image": spec["image"],
+                        "imagePullPolicy": "IfNotPresent",
+                        "ports": [{"name": "http", "containerPort": spec["port"]}],
+                        "resources": {"requests": {"cpu": f"{spec['cpu_request']}m"}},
+                        # The NodePort only routes to the pod once it listens, which the proxy waits for
+                        # when the pair scales up from zero
+                        "readinessProbe": {"tcpSocket": {"port": spec["port"]}, "periodSeconds": 1}
+                    }]
+                }
+            }
+        }
+    }
+
+
+def service_template(spec):
+    """
+    Build the service manifest exposing a node/app pair on its NodePort
+    """
+    return {
+        "apiVersion": "v1",
+        "kind": "Service",
+        "metadata": {"name": spec["service"], "labels": dict(MANAGED_LABELS)},
+        "spec": {
+            "selector": {"app": spec["app"]},
+            "type": "LoadBalancer",
+            "ports": [{"port": spec["port"], "targetPort": spec["port"], "nodePort": spec["node_port"]}]
+        }
+    }
+
+
+def prepull_template(nodes, images):
+    """
+    Build the DaemonSet manifest pulling the given images on the given nodes. Every image gets
+    an init container that exits right away; the pods carry no "app" label, so the metric
+    collectors ignore them.
+    """
+    labels = {"app.kubernetes.io/name": PREPULL_NAME}
+    return {
+        "apiVersion": "apps/v1",
+        "kind": "DaemonSet",
+        "metadata": {"name": PREPULL_NAME, "labels": dict(MANAGED_LABELS)},
+        "spec": {
+            "selector": {"matchLabels": labels},
+            "template": {
+                "metadata": {"labels": labels},
+                "spec": {
+                    "affinity": {"nodeAffinity": {"requiredDuringSchedulingIgnoredDuringExecution": {
+                        "nodeSelectorTerms": [{"matchExpressions": [
+                            {"key": "kubernetes.io/hostname", "operator": "In", "values": list(nodes)}
+                        ]}]
+                    }}},
+                    "initContainers": [{
+                        "name": f"prepull-{index}",
+                        "image": image,
+                        "imagePullPolicy": "IfNotPresent",
+                        "command": ["sh", "-c", "true"],
+                        "resources": {"requests": {"cpu": "1m", "memory": "8Mi"}}
+                    } for index, image in enumerate(images)],
+                    "containers": [{
+                        "name": "pause",
+                        "image": PAUSE_IMAGE,
+                        "resources": {"requests": {"cpu": "1m", "memory": "8Mi"}}
+                    }]
+                }
+            }
+        }
+    }
+
+
+class Catalog:
+    """
+    Nodes, application types and the spec of every node/app pair
+    """
+
+    def __init__(self, path=CATALOG_FILE):
+        with open(path) as f:
+            catalog = json.load(f)
+
+        names = catalog["names"]
+        self.nodes = tuple(catalog["nodes"])
+        self.app_types = tuple(catalog["apps"])
+        self.node_ips = {
+            node: node_config.get("ip") or os.environ.get(node_config.get("ip_env", ""))
+            for node, node_config in catalog["nodes"].items()
+        }
+
+        self.specs = {}
+        self.labels = {}
+        for node, node_config in catalog["nodes"].items():
+            for app_type, app_config in catalog["apps"].items():
+                node_port = node_config.get("node_ports", {}).get(app_type)
+                if node_port is None:
+                    node_port = app_config["node_port_base"] + node_config["index"]
+                spec = {
+                    "node": node,
+                    "app_type": app_type,
+                    "app": names["label"].format(app=app_type, node=node),
+                    "name": names["deployment"].format(app=app_type, node=node),
+                    "service": names["service"].format(app=app_type, node=node),
+                    "image": app_config["image"],
+                    "port": app_config["port"],
+                    "node_port": node_port,
+                    "node_ip": self.node_ips[node],
+                    "target_cpu": app_config["target_cpu"],
+                    "cpu_request": app_config["cpu_request"],
+                    "slo_p90_ms": app_config.get("slo_p90_ms")
+                }
+                spec["deployment_template"] = deployment_template(spec)
+                spec["service_template"] = service_template(spec)
+                pair = PairSpec(**spec)
+                self.specs[(node, app_type)] = pair
+                self.labels[pair.app] = pair
+
+    def spec(self, node, app_type):
+        """
+        Return the spec of the node/app pair, raising KeyError for an unknown pair
+        """
+        return self.specs[(node, app_type)]
+
+    def by_label(self, label):
+        """
+        Return the spec of the pair whose pods carry the app label (e.g. "mobilenet-edge1"), or None
+        """
+        return self.labels.get(label)
+
+    def node_ip(self, node):
+        """
+        Return the IP of the node, from the catalog or its ip_env environment variable, or None if unset
+        """
+        return self.node_ips[node]
+
+    @staticmethod
+    def deployment(spec, replicas):
+        """
+        Return a copy of the deployment manifest of the pair with the given replicas
+        """
+        manifest = copy.deepcopy(spec.deployment_template)
+        manifest["spec"]["replicas"] = replicas
+        return manifest
+
+    def prepull(self):
+        """
+        Return the DaemonSet manifest pulling the images of all apps on all nodes
+        """
+        images = sorted({spec.image for spec in self.specs.values()})
+        return prepull_template(self.nodes, images)
+
+    @staticmethod
+    def service(spec):
+        """
+        Return a copy of the service manifest of the pair
+        """
+        return copy.deepcopy(spec.service_template)
+
+
+_catalogs = {}
+
+
+def load_catalog(path=CATALOG_FILE):
+    """
+    Return the catalog read from the file, reading it only once per process
+    """
+    if path not in _catalogs:
+        _catalogs[path] = Catalog(path)
+    return _catalogs[path]
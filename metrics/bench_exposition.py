@@ -0,0 +1,89 @@
+"""
+Micro-benchmark of the exposition parser on a payload shaped like the metrics
+endpoint of the application images (default Python process and GC collectors,
+the application gauges and a latency histogram)
+
+python bench_exposition.py
+"""
+import timeit
+
+from exposition import layouts, parse
+from scraper import APP_METRIC_SELECTORS, parse_app_metrics
+
+PODS_PER_TICK = 30 * 12
+REPEAT = 2000
+
+
+def build_payload():
+    """
+    Build a realistic exposition text
+    """
+    lines = []
+    for generation in range(3):
+        for name in ("objects_collected", "objects_uncollectable", "collections"):
+            lines.append(f"# HELP python_gc_{name}_total Number of {name} during GC")
+            lines.append(f"# TYPE python_gc_{name}_total counter")
+            lines.append(f'python_gc_{name}_total{{generation="{generation}"}} {1234.0 * (generation + 1)}')
+    lines.append("# HELP python_info Python platform information")
+    lines.append("# TYPE python_info gauge")
+    lines.append('python_info{implementation="CPython",major="3",minor="8",patchlevel="10",version="3.8.10"} 1.0')
+    for name, value in (("virtual_memory_bytes", 1.2e9), ("resident_memory_bytes", 3.1e8),
+                        ("start_time_seconds", 1.69e9), ("cpu_seconds_total", 812.4),
+                        ("open_fds", 23.0), ("max_fds", 1048576.0)):
+        lines.append(f"# HELP process_{name} Process {name}")
+        lines.append(f"# TYPE process_{name} gauge")
+        lines.append(f"process_{name} {value}")
+
+    lines.append("# HELP request_count Number of requests")
+    lines.append("# TYPE request_count counter")
+    lines.append("request_count_total 5821.0")
+    lines.append("request_count_created 1.69e9")
+    for selector in APP_METRIC_SELECTORS.values():
+        name = selector["name"]
+        if name == "request_count":
+            continue
+        lines.append(f"# HELP {name} {name}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} 0.{len(name)}")
+
+    lines.append("# HELP response_time_seconds Response time histogram")
+    lines.append("# TYPE response_time_seconds histogram")
+    count = 0
+    for bound in ("0.005", "0.01", "0.025", "0.05", "0.075", "0.1", "0.25", "0.5", "0.75", "1.0", "2.5", "+Inf"):
+        count += 400
+        lines.append(f'response_time_seconds_bucket{{le="{bound}"}} {float(count)}')
+    lines.append(f"response_time_seconds_count {float(count)}")
+    lines.append("response_time_seconds_sum 1921.7")
+    return "\n".join(lines) + "\n"
+
+
+def parse_by_offsets(text):
+    """
+    Baseline that splits every line, as the collectors used to do before reading fixed offsets
+    """
+    return [line.split() for line in text.splitlines()]
+
+
+if __name__ == '__main__':
+    payload = build_payload()
+
+    def cold():
+        layouts.clear()
+        parse(payload, "bench")
+
+    benchmarks = {
+        "split lines (baseline)": lambda: parse_by_offsets(payload),
+        "parse, no layout cache": lambda: parse(payload),
+        "parse, cold layout": cold,
+        "parse, cached layout": lambda: parse(payload, "bench"),
+        "parse_app_metrics, cached layout": lambda: parse_app_metrics(payload, "bench"),
+    }
+    print(f"payload: {len(payload.splitlines())} lines, {len(payload)} bytes")
+    for label, func in benchmarks.items():
+        func()
+        seconds = timeit.timeit(func, number=REPEAT) / REPEAT
+        print(f"{label:36s} {seconds * 1e6:8.1f} us/pod {seconds * PODS_PER_TICK * 1e3:8.2f} ms/tick")
+
+    exposition = parse(payload, "bench")
+    print("request_count =", exposition.get("request_count"))
+    print("p90 from histogram =", exposition.histogram_quantile("response_time_seconds", 0.9))
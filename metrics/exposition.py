@@ -0,0 +1,188 @@
+"""
+This module parses the Prometheus text exposition format in a single pass and
+indexes the samples by metric name and labels.
+
+The series part of every sample line (e.g. 'response_time{quantile="0.9"}') is
+parsed once per image version and cached, so repeated scrapes of pods running the
+same image only split the value from each line and look the series up in a dict.
+"""
+import math
+from collections import defaultdict
+
+MAX_LAYOUTS = 64
+
+# Series text -> (key, metric name, "le" bound or None), learned per image version
+layouts = {}
+# Selector text -> key, shared by all versions
+selectors = {}
+
+
+def unescape(value):
+    """
+    Undo the escaping of a label value
+    """
+    if "\\" not in value:
+        return value
+    return value.replace("\\\\", "\0").replace('\\"', '"').replace("\\n", "\n").replace("\0", "\\")
+
+
+def parse_series(series):
+    """
+    Parse a series such as 'name{a="x",b="y"}' into its canonical key, in which
+    the labels are sorted, along with the metric name and its labels
+
+    Returns:
+    --------
+    key: canonical series key
+    name: metric name
+    labels: dict of label names to their values
+    """
+    series = series.strip()
+    brace = series.find("{")
+    if brace == -1:
+        return series, series, {}
+
+    name = series[:brace].strip()
+    labels = {}
+    i = brace + 1
+    end = len(series)
+    while i < end:
+        eq = series.find("=", i)
+        if eq == -1:
+            break
+        label = series[i:eq].strip(" ,")
+        start = series.index('"', eq) + 1
+        j = start
+        while series[j] != '"':
+            j += 2 if series[j] == "\\" else 1
+        labels[label] = unescape(series[start:j])
+        i = j + 1
+        while i < end and series[i] in ", }":
+            i += 1
+
+    if not labels:
+        return name, name, labels
+    key = name + "{" + ",".join(f'{label}="{labels[label]}"' for label in sorted(labels)) + "}"
+    return key, name, labels
+
+
+def canonical(selector):
+    """
+    Return the canonical key of a selector such as 'response_time{quantile="0.9"}'
+    """
+    key = selectors.get(selector)
+    if key is None:
+        key = parse_series(selector)[0]
+        selectors[selector] = key
+    return key
+
+
+class Exposition:
+    """
+    Samples of a single scraped exposition, indexed by their canonical series key
+    """
+
+    def __init__(self, samples, types, buckets):
+        self.samples = samples
+        self.types = types
+        self.buckets = buckets
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __contains__(self, selector):
+        return self.get(selector) is not None
+
+    def get(self, selector, default=None):
+        """
+        Look up a sample by its selector, e.g. 'request_count' or 'response_time{quantile="0.9"}'.
+        Counters are also found without their "_total" suffix.
+        """
+        key = canonical(selector)
+        value = self.samples.get(key)
+        if value is None and self.types.get(key.split("{", 1)[0]) == "counter":
+            name, brace, labels = key.partition("{")
+            value = self.samples.get(name + "_total" + brace + labels)
+        return default if value is None else value
+
+    def quantile(self, name, quantile, default=None):
+        """
+        Read a quantile of a summary
+        """
+        return self.get(f'{name}{{quantile="{quantile}"}}', default)
+
+    def histogram_quantile(self, name, quantile, default=None):
+        """
+        Estimate a quantile of a histogram by linear interpolation between its buckets,
+        in the same way as PromQL's histogram_quantile
+        """
+        buckets = sorted(self.buckets.get(name, ()))
+        if not buckets or buckets[-1][1] == 0:
+            return default
+        rank = quantile * buckets[-1][1]
+        prev_bound, prev_count = 0.0, 0.0
+        for bound, count in buckets:
+            if count >= rank:
+                if math.isinf(bound):
+                    return prev_bound
+                if count == prev_count:
+                    return bound
+                return prev_bound + (bound - prev_bound) * (rank - prev_count) / (count - prev_count)
+            prev_bound, prev_count = bound, count
+        return prev_bound
+
+
+def parse(text, version=None):
+    """
+    Parse an exposition in a single pass. The series layout learned for the given
+    image version is reused by later calls with the same version.
+
+    Returns:
+    --------
+    exposition: Exposition holding the samples of the text
+    """
+    if version is None:
+        layout = {}
+    else:
+        layout = layouts.get(version)
+        if layout is None:
+            if len(layouts) >= MAX_LAYOUTS:
+                layouts.pop(next(iter(layouts)))
+            layout = layouts[version] = {}
+
+    samples = {}
+    types = {}
+    buckets = defaultdict(list)
+
+    for line in text.splitlines():
+        if not line or line[0] == "#":
+            if line.startswith("# TYPE"):
+                parts = line.split()
+                if len(parts) == 4:
+                    types[parts[2]] = parts[3]
+            continue
+
+        brace = line.rfind("}")
+        if brace == -1:
+            series, _, rest = line.partition(" ")
+        else:
+            series, rest = line[:brace + 1], line[brace + 1:]
+        value = rest.split(None, 1)
+        if not value:
+            continue
+
+        entry = layout.get(series)
+        if entry is None:
+            key, name, labels = parse_series(series)
+            bound = None
+            if name.endswith("_bucket") and "le" in labels:
+                bound = float(labels["le"])
+            entry = layout[series] = (key, name, bound)
+
+        key, name, bound = entry
+        sample = float(value[0])
+        samples[key] = sample
+        if bound is not None:
+            buckets[name[:-7]].append((bound, sample))
+
+    return Exposition(samples, types, buckets)
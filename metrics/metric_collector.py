@@ -2,10 +2,21 @@ import json
 import logging
 import os
 import sys
+import threading
+import time
+from collections import defaultdict
 
 from flask import Flask, Response, request
 from kubernetes import client, config
 
+from catalog import load_catalog
+from pod_index import PodIndex
+from scraper import APP_METRIC_SELECTORS, parse_app_metrics, scrape_pods
+from slo_events import SloEvents
+from snapshot_cache import SnapshotCache
+from telemetry import TelemetryReceiver
+from timeseries_store import HISTORY_INTERVAL, HISTORY_PATH, SeriesSlots, TimeSeriesStore
+
 # Initialize the Flask application
 app = Flask(__name__)
 
@@ -21,61 +32,150 @@ logging.basicConfig(
 config.load_kube_config()
 api = client.CustomObjectsApi()
 core_v1 = client.CoreV1Api()
+pod_index = PodIndex(core_v1).start()
+catalog = load_catalog()
+metrics_cache = SnapshotCache(
+    ttl=float(os.environ.get("METRICS_CACHE_TTL", 1.0)),
+    max_size=int(os.environ.get("METRICS_CACHE_SIZE", 256))
+)
+slo_events = SloEvents()
+
+POD_FIELDS = ("cpu", "mem") + tuple(APP_METRIC_SELECTORS)
+NODE_FIELDS = ("cpu_util", "available_mem", "cpu_util_avg", "cpu_util_peak", "available_mem_min", "load_avg")
+# The resource monitors push their samples to this port besides the one of the auto scaler
+HISTORY_TELEMETRY_PORT = int(os.environ.get("HISTORY_TELEMETRY_PORT", 8382))
+pod_history = TimeSeriesStore(os.path.join(HISTORY_PATH, "pods"), POD_FIELDS)
+node_history = TimeSeriesStore(os.path.join(HISTORY_PATH, "nodes"), NODE_FIELDS)
+# Pod series are keyed by the replica slot of the pod in its app, so new pods reuse the rows of gone ones
+pod_slots = SeriesSlots()
+telemetry = TelemetryReceiver(port=HISTORY_TELEMETRY_PORT, nodes=catalog.nodes).start()
 
-def find_ready_pod_ips(label):
+
+def record_node_resources(interval=HISTORY_INTERVAL):
+    """
+    Append the latest resource samples pushed by the edge nodes to the node history every
+    interval seconds. Nodes that have not pushed a sample lately are left out.
     """
-    Create the dictionary mapping pod names to their IPs
+    next_sample = time.monotonic()
+    while True:
+        samples = {}
+        for node in catalog.nodes:
+            sample, age = telemetry.latest(node)
+            if sample is not None and age <= telemetry.stale_after:
+                samples[node] = sample
+        if samples:
+            node_history.append(samples)
+        next_sample += interval
+        time.sleep(max(0, next_sample - time.monotonic()))
+
+
+threading.Thread(target=record_node_resources, name="node-history", daemon=True).start()
+
+
+def list_all_pod_metrics():
     """
-    pod_ips = {}
+    Create the dictionary mapping app labels to the metrics-server items of their pods
+    from a single namespace-wide pod metrics list
+    """
+    app_pod_metrics = defaultdict(list)
     try:
-        pod_list = core_v1.list_namespaced_pod(namespace="autoscaler", label_selector=label)
-        for pod in pod_list.items:
-            if pod.status.phase != "Running":
-                continue
-            pod_ips[pod.metadata.name] = pod.status.pod_ip
-        logging.info("Pod IPs have been successfully read.")
+        resource = api.list_namespaced_custom_object(
+            group="metrics.k8s.io",
+            version="v1beta1",
+            namespace="autoscaler",
+            plural="pods",
+            label_selector="app"
+        )
+        logging.info("Pod metrics of all apps have been successfully read.")
     except client.ApiException as exc:
         if exc.status == 404:
-            return None
-        logging.error("Error while reading pod IPs")
+            return app_pod_metrics
+        logging.error("Error while reading pod metrics")
         raise exc
-    return pod_ips
+    for pod in resource["items"]:
+        app_pod_metrics[pod["metadata"]["labels"]["app"]].append(pod)
+    return app_pod_metrics
 
-    
-@app.route("/metrics", methods=["POST"])
-def collect_metrics():
+
+def parse_memory(mem):
     """
-    Flas server listening metric requests on port 8180 and collecting pod metrics for demanding app 
-    
-    Returns: 
-    --------  
-    response: Flask Responses
+    Convert a memory quantity of metrics-server (e.g. "52348Ki") to MiB
     """
-    request_json = request.data.decode()
-    msg = json.loads(request_json)
-    node = msg["node"]
-    app_type = msg["app"]
-    name = None
-    port = None
-
-    if app_type == "yolov5":
-        port = 5000
-        name = "-".join(("yolov5-deployment", node))
-    elif app_type == "mobilenet":
-        port = 8080
-        name = "-".join(("mobilenet-deployment", node))
-    elif app_type == "squeezenet":
-        port = 8080
-        name = "-".join(("squeezenet-deployment", node))
-    elif app_type == "shufflenet":
-        port = 8080
-        name = "-".join(("shufflenet-deployment", node))
-    elif app_type == "binaryalert":
-        port = 8080
-        name = "-".join(("binaryalert-deployment", node))
-    
-    label = f"app={app_type}-{node}"
-    pod_ips = find_ready_pod_ips(label)
+    for unit, factor in (("Ki", 1 / 1024), ("Mi", 1), ("Gi", 1024)):
+        if mem.endswith(unit):
+            return float(mem[:-2]) * factor
+    return float(mem) / (1024 * 1024)
+
+
+def find_running_pods(spec, pod_ips, pod_items):
+    """
+    Match the metrics-server items of a node/app pair (its catalog spec) with its running pods
+
+    Returns:
+    --------
+    addresses: dict mapping pod names to the "ip:port" address of their metrics endpoint
+    usage: dict mapping pod names to their CPU usage in millicores and memory usage in MiB
+    """
+    port = spec.port
+    addresses = {}
+    usage = {}
+
+    for pod in pod_items:
+        pod_name = pod['metadata']['name']
+        if pod_name not in pod_ips or len(pod['containers']) == 0:
+            continue
+        cpu = pod['containers'][0]["usage"]["cpu"]
+        mem = pod['containers'][0]["usage"]["memory"]
+
+        if "n" in cpu:
+            cpu_val = float(cpu.split("n")[0]) / 1000000
+        elif "m" in cpu:
+            cpu_val = float(cpu.split("m")[0])
+        else:
+            cpu_val = 0.0
+        addresses[pod_name] = f"{pod_ips[pod_name]}:{port}"
+        usage[pod_name] = {"cpu": cpu_val, "mem": parse_memory(mem)}
+
+    return addresses, usage
+
+
+def build_pod_instances(spec, usage, scraped):
+    """
+    Merge the scraped application metrics of running pods with their resource usage.
+    The exposition layout is cached per image of the pair.
+
+    Returns:
+    --------
+    pod_instances: dict mapping pod names to their metrics
+    missing_pods: names of the running pods whose metrics endpoint did not respond
+    """
+    pod_instances = {}
+    missing_pods = []
+
+    for pod_name, pod_usage in usage.items():
+        pod_info = parse_app_metrics(scraped[pod_name], spec.image) if pod_name in scraped else None
+        if pod_info is None:
+            missing_pods.append(pod_name)
+            continue
+        pod_info.update(pod_usage)
+        pod_instances[pod_name] = pod_info
+
+    return pod_instances, missing_pods
+
+
+def collect_pair_metrics(node, app_type):
+    """
+    Collect the pod metrics of an app on a node
+
+    Returns:
+    --------
+    status: HTTP status of the response
+    metrics: dict holding the number of pods and their metrics
+    """
+    spec = catalog.spec(node, app_type)
+    name = spec.name
+    label = f"app={spec.app}"
+    pod_ips = pod_index.ready_pods(spec.app)
 
     try:
         resource = api.list_namespaced_custom_object(
@@ -89,74 +189,159 @@ def collect_metrics():
     except client.ApiException as exc:
         if exc.status == 404:
             logging.info("Deployment %s has not been found.", name)
-            res = json.dumps({
+            return 404, {
                 "pod_number": 0,
                 "pod_instances": {}
-            })
-            return Response(response=res, status=404)
+            }
         logging.error("Error while reading deployment %s", name)
         raise exc
 
     pod_num = len(resource["items"])
-    pod_instances = {}
+    addresses, usage = find_running_pods(spec, pod_ips, resource["items"])
+    pod_instances, missing_pods = build_pod_instances(spec, usage, scrape_pods(addresses))
+    slo_events.check(spec, pod_instances)
+    keys = pod_slots.keys(spec.app, usage)
+    pod_history.append(
+        {keys[pod_name]: pod_info for pod_name, pod_info in pod_instances.items()},
+        members={keys[pod_name]: pod_name for pod_name in pod_instances}
+    )
+
+    return 200, {
+        "pod_number": pod_num,
+        "pod_instances": pod_instances,
+        "missing_pods": missing_pods
+    }
+
+
+@app.route("/metrics", methods=["POST"])
+def collect_metrics():
+    """
+    Flas server listening metric requests on port 8180 and collecting pod metrics for demanding app.
+    Snapshots are reused for METRICS_CACHE_TTL seconds and concurrent requests for the same
+    node/app share a single collection; "snapshot_age" tells how old the returned snapshot is.
+    
+    Returns: 
+    --------  
+    response: Flask Responses
+    """
+    request_json = request.data.decode()
+    msg = json.loads(request_json)
+    node = msg["node"]
+    app_type = msg["app"]
+    if (node, app_type) not in catalog.specs:
+        return Response(response=json.dumps({"error": f"Unknown pair {app_type} on {node}"}), status=404)
+
+    (status, metrics), age = metrics_cache.get(
+        catalog.spec(node, app_type).app, lambda: collect_pair_metrics(node, app_type)
+    )
+    res = json.dumps(dict(metrics, snapshot_age=age))
+    return Response(response=res, status=status)
 
-    for pod in resource["items"]:
-        pod_name = pod['metadata']['name']
-        if pod_name not in pod_ips:
-            continue
-        pod_ip = pod_ips[pod_name]
-        request_count = 0
-        response_time = 0
-        p10_res_time = 0
-        p50_res_time = 0
-        p90_res_time = 0
-        p50_all_res_times = 0
-        p90_all_res_times = 0
-
-        if len(pod['containers']) == 0:
-            continue
-        cpu = pod['containers'][0]["usage"]["cpu"]
-        
-        if "n" in cpu:
-            cpu_val = float(cpu.split("n")[0]) / 1000000
-        elif "m" in cpu:
-            cpu_val = float(cpu.split("m")[0])
-        else:
-            cpu_val = 0.0
 
-        with os.popen(f"kubectl exec -n autoscaler -it {pod_name} -- curl {pod_ip}:{port}/metrics") as f:
-            metrics = f.readlines()
-            if len(metrics) > 58:
-                request_count = float(metrics[38].split()[-1])
-                response_time = float(metrics[44].split()[-1])
-                p10_res_time = float(metrics[47].split()[-1])
-                p50_res_time = float(metrics[50].split()[-1])
-                p90_res_time = float(metrics[53].split()[-1])
-                #request_density = float(metrics[56].split()[-1])
-                #p10_req_density = float(metrics[59].split()[-1])
-                #p50_req_density = float(metrics[62].split()[-1])
-                #p90_req_density = float(metrics[65].split()[-1])
-                p50_all_res_times = float(metrics[68].split()[-1])
-                p90_all_res_times = float(metrics[71].split()[-1])
-
-        pod_info = {
-            "req_count": request_count,
-            "res_time": response_time, 
-            "p10_res_time": p10_res_time,
-            "p50_res_time": p50_res_time, 
-            "p90_res_time": p90_res_time,
-            "p50_all_res_times": p50_all_res_times, 
-            "p90_all_res_times": p90_all_res_times,
-            "cpu": cpu_val
+@app.route("/metrics/batch", methods=["POST"])
+def collect_batch_metrics():
+    """
+    Flas server listening batch metric requests on port 8180 and collecting pod metrics
+    for all node/app pairs of the catalog, or for the requested "pairs" only, from a single pod
+    list and a single pod metrics list. Pairs with a fresh cached snapshot are served from the
+    cache and not collected again.
+
+    Returns:
+    --------
+    response: Flask Responses
+    """
+    request_json = request.data.decode()
+    msg = json.loads(request_json) if request_json else {}
+
+    if msg.get("pairs"):
+        labels = [
+            catalog.spec(pair["node"], pair["app"]).app for pair in msg["pairs"]
+            if (pair["node"], pair["app"]) in catalog.specs
+        ]
+    else:
+        labels = sorted(catalog.labels)
+
+    pairs = {}
+    for label in labels:
+        cached = metrics_cache.peek(label)
+        if cached is not None and cached[0][0] == 200:
+            pairs[label] = dict(cached[0][1], snapshot_age=cached[1])
+    labels = [label for label in labels if label not in pairs]
+    if not labels:
+        return Response(response=json.dumps({"pairs": pairs}), status=200)
+
+    collected_at = time.monotonic()
+    app_pod_ips = pod_index.all_ready_pods()
+    app_pod_metrics = list_all_pod_metrics()
+
+    # Scrape the pods of all requested pairs in a single fan-out
+    addresses = {}
+    pair_usage = {}
+    for label in labels:
+        pair_addresses, pair_usage[label] = find_running_pods(
+            catalog.by_label(label), app_pod_ips.get(label, {}), app_pod_metrics.get(label, [])
+        )
+        addresses.update(pair_addresses)
+    scraped = scrape_pods(addresses)
+
+    samples = {}
+    members = {}
+    for label in labels:
+        pod_instances, missing_pods = build_pod_instances(catalog.by_label(label), pair_usage[label], scraped)
+        slo_events.check(catalog.by_label(label), pod_instances)
+        keys = pod_slots.keys(label, pair_usage[label])
+        samples.update((keys[pod_name], pod_info) for pod_name, pod_info in pod_instances.items())
+        members.update((keys[pod_name], pod_name) for pod_name in pod_instances)
+        metrics = {
+            "pod_number": len(app_pod_metrics.get(label, [])),
+            "pod_instances": pod_instances,
+            "missing_pods": missing_pods
         }
-        pod_instances[pod_name] = pod_info
+        metrics_cache.put(label, (200, metrics), collected_at)
+        pairs[label] = dict(metrics, snapshot_age=time.monotonic() - collected_at)
+
+    pod_history.append(samples, members=members)
+
+    res = json.dumps({"pairs": pairs})
+    return Response(response=res, status=200)
+
+
+@app.route("/metrics/history", methods=["POST"])
+def query_history():
+    """
+    Flas server listening history requests on port 8180 and reading the stored samples of a
+    series between "start" and "end" (epoch seconds, the last hour by default). Pod series are
+    named "<app label>/<replica slot>" and node series by the node; "kind" selects "pods" or "nodes".
+    As a slot is taken over by the pod replacing a gone one, "members" lists the [timestamp, pod name]
+    changes of the pods holding it. Without a "series" the names of the series with samples in the
+    range are returned.
 
+    Returns:
+    --------
+    response: Flask Responses
+    """
+    request_json = request.data.decode()
+    msg = json.loads(request_json) if request_json else {}
+    history = node_history if msg.get("kind") == "nodes" else pod_history
+    end = float(msg.get("end", time.time()))
+    start = float(msg.get("start", end - 3600))
+
+    if not msg.get("series"):
+        res = json.dumps({"series": history.series(start, end, msg.get("prefix", ""))})
+        return Response(response=res, status=200)
+
+    fields = [field for field in msg.get("fields", history.fields) if field in history.fields]
+    timestamps = []
+    values = {field: [] for field in fields}
+    for window in history.query(msg["series"], start, end, fields):
+        present = window.timestamps > 0
+        timestamps.extend(window.timestamps[present].tolist())
+        for field in fields:
+            values[field].extend(window.values[field][present].tolist())
     res = json.dumps({
-        "pod_number": pod_num,
-        "pod_instances": pod_instances
+        "timestamps": timestamps, "values": values, "members": history.members(msg["series"], start, end)
     })
     return Response(response=res, status=200)
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8180)
-    
\ No newline at end of file
@@ -0,0 +1,173 @@
+"""
+This module keeps an in-memory index of the ready pods of every app in the
+autoscaler namespace. It lists the pods once and then follows a watch stream,
+so the metric collectors can map app labels to pod IPs without calling the API server.
+"""
+import logging
+import threading
+import time
+
+from kubernetes import client, watch
+
+HTTP_GONE = 410
+
+
+def is_ready(pod):
+    """
+    Check whether the pod is running, has an IP and passes its readiness checks
+    """
+    if pod.status is None or pod.status.phase != "Running" or not pod.status.pod_ip:
+        return False
+    for condition in pod.status.conditions or []:
+        if condition.type == "Ready":
+            return condition.status == "True"
+    return False
+
+
+class PodIndex:
+    """
+    Informer-style cache mapping app labels to the names and IPs of their ready pods
+    """
+
+    def __init__(self, core_v1, namespace="autoscaler", label_selector="app",
+                 resync_period=300, watch_timeout=60, retry_delay=1, sync_timeout=5):
+        self.core_v1 = core_v1
+        self.namespace = namespace
+        self.label_selector = label_selector
+        self.resync_period = resync_period
+        self.watch_timeout = watch_timeout
+        self.retry_delay = retry_delay
+        self.sync_timeout = sync_timeout
+
+        self.lock = threading.Lock()
+        self.apps = {}
+        self.pod_apps = {}
+        self.resource_version = None
+        self.last_sync = 0
+        self.synced = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """
+        Start following the pods in a background thread
+        """
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="pod-index", daemon=True)
+            self.thread.start()
+        return self
+
+    def ready_pods(self, app_label):
+        """
+        Return the dictionary mapping the names of the app's ready pods to their IPs
+        """
+        self.synced.wait(self.sync_timeout)
+        with self.lock:
+            return dict(self.apps.get(app_label, {}))
+
+    def all_ready_pods(self):
+        """
+        Return the dictionary mapping app labels to the names and IPs of their ready pods
+        """
+        self.synced.wait(self.sync_timeout)
+        with self.lock:
+            return {app_label: dict(pods) for app_label, pods in self.apps.items()}
+
+    def run(self):
+        """
+        List the pods, then follow the watch stream and list again on expiry or resync
+        """
+        while True:
+            try:
+                if self.resource_version is None or time.monotonic() - self.last_sync > self.resync_period:
+                    self.relist()
+                self.follow()
+            except client.ApiException as exc:
+                if exc.status == HTTP_GONE:
+                    logging.info("Pod watch resource version expired, listing pods again.")
+                else:
+                    logging.error("Error while watching pods - %s", exc)
+                    time.sleep(self.retry_delay)
+                self.resource_version = None
+            except Exception as exc:
+                logging.error("Error while watching pods - %s", exc)
+                time.sleep(self.retry_delay)
+
+    def relist(self):
+        """
+        Rebuild the index from a full pod list
+        """
+        pod_list = self.core_v1.list_namespaced_pod(
+            namespace=self.namespace, label_selector=self.label_selector
+        )
+        apps = {}
+        pod_apps = {}
+        for pod in pod_list.items:
+            if not is_ready(pod):
+                continue
+            app_label = pod.metadata.labels["app"]
+            apps.setdefault(app_label, {})[pod.metadata.name] = pod.status.pod_ip
+            pod_apps[pod.metadata.name] = app_label
+
+        with self.lock:
+            self.apps = apps
+            self.pod_apps = pod_apps
+        self.resource_version = pod_list.metadata.resource_version
+        self.last_sync = time.monotonic()
+        self.synced.set()
+        logging.info("Pod index has been synced with %d ready pods.", len(pod_apps))
+
+    def follow(self):
+        """
+        Apply the pod events of one watch stream to the index
+        """
+        stream = watch.Watch().stream(
+            self.core_v1.list_namespaced_pod,
+            namespace=self.namespace,
+            label_selector=self.label_selector,
+            resource_version=self.resource_version,
+            allow_watch_bookmarks=True,
+            timeout_seconds=self.watch_timeout
+        )
+        for event in stream:
+            self.apply(event)
+
+    def apply(self, event):
+        """
+        Apply a single watch event to the index and remember its resource version.
+        Bookmarks only carry the resource version and their object is left a plain dict.
+        """
+        if event["type"] == "BOOKMARK":
+            self.resource_version = event["raw_object"]["metadata"]["resourceVersion"]
+            return
+        if event["type"] not in ("ADDED", "MODIFIED", "DELETED"):
+            return
+        pod = event["object"]
+        self.resource_version = pod.metadata.resource_version
+        if event["type"] == "DELETED" or not is_ready(pod):
+            self.remove(pod.metadata.name)
+        else:
+            self.add(pod.metadata.labels["app"], pod.metadata.name, pod.status.pod_ip)
+
+    def add(self, app_label, pod_name, pod_ip):
+        """
+        Add a ready pod to the index
+        """
+        with self.lock:
+            previous = self.pod_apps.get(pod_name)
+            if previous is not None and previous != app_label:
+                self.apps[previous].pop(pod_name, None)
+            self.apps.setdefault(app_label, {})[pod_name] = pod_ip
+            self.pod_apps[pod_name] = app_label
+
+    def remove(self, pod_name):
+        """
+        Remove a pod from the index if it is there
+        """
+        with self.lock:
+            app_label = self.pod_apps.pop(pod_name, None)
+            if app_label is None:
+                return
+            pods = self.apps[app_label]
+            pods.pop(pod_name, None)
+            if not pods:
+                del self.apps[app_label]
@@ -1,33 +1,190 @@
 import json
+import logging
 import os
+import socket
+import threading
+import time
+from collections import deque
 
+import psutil
+from dotenv import load_dotenv
 from flask import Flask, Response
 
+from catalog import load_catalog
+
+load_dotenv()
+
 # Initialize the Flask application
 app = Flask(__name__)
-    
+
+SAMPLE_INTERVAL = float(os.environ.get("RESOURCE_SAMPLE_INTERVAL", 0.5))
+SAMPLE_WINDOW = float(os.environ.get("RESOURCE_SAMPLE_WINDOW", 15))
+TELEMETRY_INTERVAL = float(os.environ.get("TELEMETRY_INTERVAL", 1))
+# Ports of the master receiving the pushed samples: the auto scaler and the history of the metric collector
+TELEMETRY_PORTS = (8381, int(os.environ.get("HISTORY_TELEMETRY_PORT", 8382)))
+# Catalog name of this node, which the master only accepts samples of; the hostname by default
+NODE_NAME = os.environ.get("NODE_NAME") or socket.gethostname()
+
+
+class ResourceSampler:
+    """
+    Samples the CPU utilization and available memory of the node in the background
+    and keeps the samples of the last window seconds in a ring buffer
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL, window=SAMPLE_WINDOW):
+        self.interval = interval
+        self.window = window
+        self.samples = deque(maxlen=max(1, int(window / interval)))
+        self.cpu_count = psutil.cpu_count()
+        self.mem_total = None
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def start(self):
+        """
+        Start sampling in a background thread
+        """
+        if self.thread is None:
+            # The first call only sets the reference point of the CPU times
+            psutil.cpu_percent(interval=None)
+            self.sample()
+            self.thread = threading.Thread(target=self.run, name="resource-sampler", daemon=True)
+            self.thread.start()
+        return self
+
+    def run(self):
+        """
+        Take a sample every interval seconds
+        """
+        next_sample = time.monotonic()
+        while True:
+            next_sample += self.interval
+            time.sleep(max(0, next_sample - time.monotonic()))
+            self.sample()
+
+    def sample(self):
+        """
+        Read the CPU utilization since the last sample and the available memory
+        """
+        cpu = psutil.cpu_percent(interval=None)
+        memory = psutil.virtual_memory()
+        mem = memory.available / memory.total * 100.0
+        with self.lock:
+            self.mem_total = memory.total / (1024 * 1024)
+            self.samples.append((time.time(), cpu, mem))
+
+    def snapshot(self):
+        """
+        Return the latest sample along with the averages and peaks over the window
+        """
+        with self.lock:
+            samples = list(self.samples)
+        timestamp, cpu, mem = samples[-1]
+        cpu_values = [sample[1] for sample in samples]
+        mem_values = [sample[2] for sample in samples]
+        return {
+            "timestamp": timestamp,
+            "cpu_util": cpu,
+            "available_mem": mem,
+            "cpu_util_avg": sum(cpu_values) / len(cpu_values),
+            "cpu_util_peak": max(cpu_values),
+            "available_mem_avg": sum(mem_values) / len(mem_values),
+            "available_mem_min": min(mem_values),
+            "load_avg": os.getloadavg()[0],
+            "cpu_count": self.cpu_count,
+            "mem_total": self.mem_total,
+            "window": len(samples) * self.interval
+        }
+
+
+class TelemetryPusher:
+    """
+    Pushes compact resource samples of the node to the given ports of the master as UDP
+    datagrams every interval seconds. The node has to be one of the catalog, otherwise
+    ValueError is raised, as the master would drop its samples.
+    """
+
+    def __init__(self, sampler, master_ip, ports=TELEMETRY_PORTS, interval=TELEMETRY_INTERVAL,
+                 node=NODE_NAME, nodes=None):
+        nodes = load_catalog().nodes if nodes is None else nodes
+        if node not in nodes:
+            raise ValueError(
+                f"Node {node} is not in the catalog ({', '.join(nodes)}), set NODE_NAME to its catalog name"
+            )
+        self.sampler = sampler
+        self.addresses = [(master_ip, port) for port in ports]
+        self.interval = interval
+        self.node = node
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.thread = None
+
+    def start(self):
+        """
+        Start pushing in a background thread
+        """
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="telemetry-pusher", daemon=True)
+            self.thread.start()
+        return self
+
+    def run(self):
+        """
+        Push a sample every interval seconds
+        """
+        next_push = time.monotonic()
+        while True:
+            try:
+                self.push()
+            except OSError as exc:
+                logging.warning("Error while pushing resource telemetry - %s", exc)
+            next_push += self.interval
+            time.sleep(max(0, next_push - time.monotonic()))
+
+    def push(self):
+        """
+        Send the latest snapshot with short keys to keep the datagram small
+        """
+        snapshot = self.sampler.snapshot()
+        datagram = json.dumps({
+            "n": self.node,
+            "t": round(snapshot["timestamp"], 3),
+            "c": round(snapshot["cpu_util"], 2),
+            "m": round(snapshot["available_mem"], 2),
+            "ca": round(snapshot["cpu_util_avg"], 2),
+            "cp": round(snapshot["cpu_util_peak"], 2),
+            "ma": round(snapshot["available_mem_avg"], 2),
+            "mm": round(snapshot["available_mem_min"], 2),
+            "l": round(snapshot["load_avg"], 2),
+            "k": snapshot["cpu_count"],
+            "mt": round(snapshot["mem_total"])
+        }, separators=(",", ":"))
+        for address in self.addresses:
+            self.sock.sendto(datagram.encode(), address)
+
+
+sampler = ResourceSampler().start()
+if os.environ.get("MASTER"):
+    try:
+        pusher = TelemetryPusher(sampler, os.environ["MASTER"]).start()
+    except ValueError as exc:
+        logging.error("Not pushing the resource telemetry - %s", exc)
+
+
 @app.route("/load", methods=["GET"])
 def monitor_resource_utils():
     """
-    Flas server listening on port 8380 for the resource utilization of edge node
-    
-    Returns: 
-    --------  
+    Flas server listening on port 8380 for the resource utilization of edge node.
+    "cpu_util" is the CPU utilization in percent, "available_mem" the available memory
+    in percent; both are served from the samples kept in memory. "cpu_count" and
+    "mem_total" (MiB) give the capacity of the node.
+
+    Returns:
+    --------
     response: Flask Responses
     """
-    #with os.popen("top -b -n 1 | grep Cpu | awk '{print 100-$8}'") as f:
-    with os.popen("uptime | sed 's/.*load average: //' | awk -F\\, '{print $1}'") as f:
-        cpu = float(f.read())
-
-    with os.popen("free | grep Mem | awk '{print $7/$2 * 100.0}'") as f:
-        mem = float(f.read())
-
-    res = json.dumps({
-        "cpu_util": cpu,
-        "available_mem": mem 
-    })
+    res = json.dumps(sampler.snapshot())
     return Response(response=res, status=200)
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8380)
-    
\ No newline at end of file
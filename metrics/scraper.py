@@ -0,0 +1,108 @@
+"""
+This module scrapes the metrics endpoints of application pods directly over
+a pooled keep-alive HTTP client, fanning out to all pods concurrently
+"""
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from exposition import parse
+
+# Selectors of the fields of the pod metrics, read from app_metrics.json or the file given by
+# APP_METRICS_FILE. Every field has the metric "name" looked up in the exposition; "images"
+# overrides the selectors of the "default" per image.
+APP_METRICS_FILE = os.environ.get(
+    "APP_METRICS_FILE", os.path.join(os.path.dirname(__file__), "app_metrics.json")
+)
+
+
+def load_app_metric_selectors(path=APP_METRICS_FILE):
+    """
+    Read the selectors of the application metrics
+
+    Returns:
+    --------
+    default: dict mapping fields to their {"name"} selector
+    images: dict mapping images to their selectors overriding the default ones
+    """
+    with open(path) as f:
+        selectors = json.load(f)
+    return selectors["default"], selectors.get("images", {})
+
+
+APP_METRIC_SELECTORS, IMAGE_METRIC_SELECTORS = load_app_metric_selectors()
+
+SCRAPE_TIMEOUT = 2
+MAX_WORKERS = 32
+# Every pod IP is a separate host, so keep a connection pool for each of them
+MAX_POOLS = 512
+
+session = requests.Session()
+session.mount("http://", HTTPAdapter(pool_connections=MAX_POOLS, pool_maxsize=4))
+executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+
+
+def scrape_pod(address, timeout=SCRAPE_TIMEOUT):
+    """
+    Read the metrics endpoint of a single pod at the given "ip:port" address
+
+    Returns:
+    --------
+    metrics: exposition text of the pod, or None if the pod did not respond in time
+    """
+    try:
+        response = session.get(f"http://{address}/metrics", timeout=timeout)
+        response.raise_for_status()
+    except requests.RequestException as exc:
+        logging.warning("Error while scraping metrics of pod %s - %s", address, exc)
+        return None
+    return response.text
+
+
+def scrape_pods(addresses, timeout=SCRAPE_TIMEOUT):
+    """
+    Read the metrics endpoints of the given pods in parallel from a dict mapping
+    pod names to their "ip:port" addresses
+
+    Returns:
+    --------
+    metrics: dict mapping pod names to their exposition text; pods that did not
+    respond are left out
+    """
+    futures = {
+        pod_name: executor.submit(scrape_pod, address, timeout)
+        for pod_name, address in addresses.items()
+    }
+    scraped = {}
+    for pod_name, future in futures.items():
+        text = future.result()
+        if text is not None:
+            scraped[pod_name] = text
+    return scraped
+
+
+def parse_app_metrics(text, version=None):
+    """
+    Read the application-level metrics from the exposition text of a pod by metric name.
+    The version (e.g. the image of the pod) selects the selectors and the cached exposition layout.
+    A configured metric the pod does not expose is logged as an error and the pod counts as missing.
+
+    Returns:
+    --------
+    metrics: dict of application metrics, or None if any of them is missing
+    """
+    exposition = parse(text, version)
+    selectors = dict(APP_METRIC_SELECTORS, **IMAGE_METRIC_SELECTORS.get(version, {}))
+    metrics = {field: exposition.get(selector["name"]) for field, selector in selectors.items()}
+    missing = sorted(selectors[field]["name"] for field, value in metrics.items() if value is None)
+    if missing:
+        logging.error(
+            "Metrics %s are missing from the exposition of %s, check the names in %s",
+            ", ".join(missing), version, APP_METRICS_FILE
+        )
+        return None
+    return metrics
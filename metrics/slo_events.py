@@ -0,0 +1,68 @@
+"""
+This module raises the "p90 over SLO" breach events of the auto scaler from the collected pod
+metrics. When the average p90 response time of the pods of a node/app pair exceeds the SLO of
+its app in the catalog, an event is posted to the events endpoint of the
+auto scaler, which then evaluates the pair right away instead of at its next tick.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+from catalog import load_catalog
+from scraper import session
+
+EVENTS_PORT = int(os.environ.get("AUTOSCALER_EVENTS_PORT", 8580))
+EVENTS_URL = f"http://{os.environ.get('MASTER', '127.0.0.1')}:{EVENTS_PORT}/events"
+# Seconds between two events of the same node/app
+EVENT_INTERVAL = float(os.environ.get("SLO_EVENT_INTERVAL", 5))
+EVENT_TIMEOUT = 1
+
+
+class SloEvents:
+    """
+    Compares the collected p90 response times with the SLOs and posts the breaches in the background
+    """
+
+    def __init__(self, slos=None, url=EVENTS_URL, interval=EVENT_INTERVAL, http=session):
+        if slos is None:
+            slos = {spec.app_type: spec.slo_p90_ms for spec in load_catalog().specs.values() if spec.slo_p90_ms}
+        self.slos = slos
+        self.url = url
+        self.interval = interval
+        self.http = http
+        self.lock = threading.Lock()
+        self.sent = {}
+
+    def check(self, spec, pod_instances):
+        """
+        Post an event if the pods of the pair (its catalog spec) are over the SLO of the app,
+        unless one was posted for the pair within the interval
+
+        Returns:
+        --------
+        sent: whether an event was posted
+        """
+        slo = self.slos.get(spec.app_type)
+        if not slo or not pod_instances:
+            return False
+        p90_ms = 1000 * sum(pod.get("p90_res_time", 0.0) for pod in pod_instances.values()) / len(pod_instances)
+        if p90_ms <= slo:
+            return False
+        with self.lock:
+            now = time.monotonic()
+            if now - self.sent.get(spec.app, float("-inf")) < self.interval:
+                return False
+            self.sent[spec.app] = now
+        event = {"node": spec.node, "app": spec.app_type, "reason": f"p90 {p90_ms:.0f} ms over SLO {slo} ms"}
+        threading.Thread(target=self.__send, args=(event,), name="slo-event", daemon=True).start()
+        return True
+
+    def __send(self, event):
+        try:
+            response = self.http.post(self.url, data=json.dumps(event), timeout=EVENT_TIMEOUT)
+            if response.status_code != 202:
+                logging.warning("Scaling event for %s in %s answered %s.", event["app"], event["node"], response.status_code)
+        except OSError as exc:
+            logging.warning("Could not send the scaling event for %s in %s: %s", event["app"], event["node"], exc)
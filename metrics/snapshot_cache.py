@@ -0,0 +1,97 @@
+"""
+This module caches collected metric snapshots per key for a short time and
+coalesces concurrent collections of the same key into a single one
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class Call:
+    """
+    A collection in flight that other requests of the same key wait for
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.timestamp = None
+
+
+class SnapshotCache:
+    """
+    Bounded LRU cache of snapshots that expire after ttl seconds
+    """
+
+    def __init__(self, ttl=1.0, max_size=256):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.in_flight = {}
+
+    def peek(self, key):
+        """
+        Return the fresh snapshot of the key and its age, or None if there is none
+        """
+        with self.lock:
+            return self.__fresh(key, time.monotonic())
+
+    def put(self, key, value, timestamp=None):
+        """
+        Store the snapshot of the key collected at the given monotonic timestamp
+        """
+        with self.lock:
+            self.__store(key, value, time.monotonic() if timestamp is None else timestamp)
+
+    def get(self, key, collect):
+        """
+        Return the snapshot of the key and its age in seconds. If there is no fresh snapshot,
+        it is collected by calling collect() once, however many requests ask for it meanwhile.
+        """
+        with self.lock:
+            fresh = self.__fresh(key, time.monotonic())
+            if fresh is not None:
+                return fresh
+            call = self.in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self.in_flight[key] = Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, time.monotonic() - call.timestamp
+
+        call.timestamp = time.monotonic()
+        try:
+            call.value = collect()
+        except Exception as exc:
+            call.error = exc
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+                if call.error is None:
+                    self.__store(key, call.value, call.timestamp)
+            call.done.set()
+        return call.value, time.monotonic() - call.timestamp
+
+    def __fresh(self, key, now):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        timestamp, value = entry
+        if now - timestamp >= self.ttl:
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value, now - timestamp
+
+    def __store(self, key, value, timestamp):
+        self.entries[key] = (timestamp, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
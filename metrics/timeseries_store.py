@@ -0,0 +1,334 @@
+"""
+This module keeps the history of the collected samples in an append-only columnar store on disk.
+
+Time is split into segments of segment_duration seconds. A segment is a directory holding one
+memory-mapped NumPy matrix per field, with a row per series and a column per interval, plus a
+matrix of the exact sample timestamps (0 where there is no sample). The samples of a series
+within a segment are therefore contiguous, and a range query returns views of the mapped files
+without copying them. The files are created sparse and only the pages in use are held in memory;
+segments older than the retention are deleted when the store rotates to a new one.
+
+The store expects a single writing process, such as the metric collector under one gunicorn worker.
+Series that come and go, such as the pods of an app, should be keyed by a SeriesSlots slot rather
+than by their own name, so that the rows of a segment are reused instead of running out. The name
+of the member holding a slot is then passed along with its samples; the segment index records
+when it changes, so the samples of a replaced member can be told apart from those of the new one.
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+HISTORY_PATH = os.environ.get("HISTORY_PATH", "history")
+# Seconds between two samples of a series; later samples of the same interval replace earlier ones
+HISTORY_INTERVAL = float(os.environ.get("HISTORY_INTERVAL", 15))
+HISTORY_SEGMENT = float(os.environ.get("HISTORY_SEGMENT", 24 * 3600))
+HISTORY_RETENTION = float(os.environ.get("HISTORY_RETENTION", 28 * 24 * 3600))
+HISTORY_MAX_SERIES = int(os.environ.get("HISTORY_MAX_SERIES", 1024))
+# Segments kept mapped at once, the one being written included
+HISTORY_OPEN_SEGMENTS = int(os.environ.get("HISTORY_OPEN_SEGMENTS", 4))
+
+Window = namedtuple("Window", ["timestamps", "values"])
+
+
+class SeriesSlots:
+    """
+    Stable series keys "<group>/<slot>" for the members of groups that come and go, such as the
+    pods of an app. A new member takes the lowest slot left by a member that is gone, so the
+    number of series of a group is bounded by its largest size rather than by every member ever seen.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.slots = {}
+
+    def keys(self, group, members):
+        """
+        Assign slots to the current members of the group, freeing the slots of the others
+
+        Returns:
+        --------
+        keys: dict mapping the members to their series keys
+        """
+        with self.lock:
+            current = self.slots.get(group, {})
+            slots = {member: current[member] for member in members if member in current}
+            taken = set(slots.values())
+            free = (slot for slot in range(len(members) + len(taken)) if slot not in taken)
+            for member in sorted(members):
+                if member not in slots:
+                    slots[member] = next(free)
+            self.slots[group] = slots
+        return {member: f"{group}/{slot}" for member, slot in slots.items()}
+
+
+class Segment:
+    """
+    Memory-mapped columns of all series within [start, start + duration)
+    """
+
+    def __init__(self, path, start, fields, interval, duration, max_series):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        index_file = os.path.join(path, "index.json")
+        if os.path.exists(index_file):
+            # The layout of an existing segment wins over the current settings
+            with open(index_file) as f:
+                index = json.load(f)
+            interval, duration, max_series = index["interval"], index["duration"], index["max_series"]
+            self.series = index["series"]
+            self.members = index.get("members", {})
+        else:
+            self.series = {}
+            self.members = {}
+        self.start = start
+        self.interval = interval
+        self.duration = duration
+        self.max_series = max_series
+        self.columns = int(round(duration / interval))
+        self.dirty = not os.path.exists(index_file)
+
+        self.timestamps = self.__map("timestamps", np.float64)
+        self.values = {field: self.__map(field, np.float32) for field in fields}
+
+    def __map(self, name, dtype):
+        file = os.path.join(self.path, f"{name}.bin")
+        mode = "r+" if os.path.exists(file) else "w+"
+        return np.memmap(file, dtype=dtype, mode=mode, shape=(self.max_series, self.columns))
+
+    def column(self, timestamp):
+        return int((timestamp - self.start) // self.interval)
+
+    def append(self, key, sample, timestamp, member=None):
+        """
+        Write the fields of a sample in the column of its timestamp, and record the member
+        holding the series from the timestamp on if it changed
+
+        Returns:
+        --------
+        stored: whether the sample was stored, False if the segment has no room for a new series
+        """
+        row = self.series.get(key)
+        if row is None:
+            if len(self.series) >= self.max_series:
+                return False
+            row = self.series[key] = len(self.series)
+            self.dirty = True
+        column = self.column(timestamp)
+        self.timestamps[row, column] = timestamp
+        for field, values in self.values.items():
+            value = sample.get(field)
+            values[row, column] = np.nan if value is None else value
+        if member is not None:
+            changes = self.members.setdefault(key, [])
+            if not changes or changes[-1][1] != member:
+                changes.append([timestamp, member])
+                self.dirty = True
+        return True
+
+    def member_changes(self, key, start, end):
+        """
+        Return the [timestamp, member] changes of a series within [start, end), preceded by the
+        change in effect at start
+        """
+        changes = self.members.get(key, [])
+        earlier = [change for change in changes if change[0] <= start]
+        return earlier[-1:] + [change for change in changes if start < change[0] < end]
+
+    def window(self, key, start, end, fields):
+        """
+        Return the views of the columns of a series overlapping [start, end), or None if there are none
+        """
+        row = self.series.get(key)
+        if row is None:
+            return None
+        first = max(0, self.column(start))
+        last = min(self.columns, self.column(end - 1e-9) + 1)
+        if first >= last:
+            return None
+        return Window(
+            self.timestamps[row, first:last],
+            {field: self.values[field][row, first:last] for field in fields}
+        )
+
+    def flush(self):
+        """
+        Write the changed pages and the series index to disk
+        """
+        self.timestamps.flush()
+        for values in self.values.values():
+            values.flush()
+        self.save_index()
+
+    def save_index(self):
+        """
+        Write the series index if series were added since it was last written
+        """
+        if self.dirty:
+            index_file = os.path.join(self.path, "index.json")
+            with open(index_file + ".tmp", "w") as f:
+                json.dump({
+                    "interval": self.interval, "duration": self.duration,
+                    "max_series": self.max_series, "series": self.series, "members": self.members
+                }, f)
+            os.replace(index_file + ".tmp", index_file)
+            self.dirty = False
+
+
+class TimeSeriesStore:
+    """
+    Append-only store of the samples of many series, each a dict of the given fields
+    """
+
+    def __init__(self, path=HISTORY_PATH, fields=("cpu", "mem"), interval=HISTORY_INTERVAL,
+                 segment_duration=HISTORY_SEGMENT, retention=HISTORY_RETENTION,
+                 max_series=HISTORY_MAX_SERIES, max_open=HISTORY_OPEN_SEGMENTS):
+        self.path = path
+        self.fields = tuple(fields)
+        self.interval = interval
+        self.segment_duration = segment_duration
+        self.retention = retention
+        self.max_series = max_series
+        self.max_open = max(1, max_open)
+
+        self.lock = threading.Lock()
+        self.segments = OrderedDict()
+        self.current = None
+        self.skipped = 0
+        os.makedirs(path, exist_ok=True)
+        self.expire(time.time())
+
+    def segment_start(self, timestamp):
+        return timestamp - timestamp % self.segment_duration
+
+    def append(self, samples, timestamp=None, members=None):
+        """
+        Add one sample per series from a dict mapping series keys to their field values.
+        members optionally maps the series keys to the names of the members holding them, e.g. the pods
+        of SeriesSlots slots. Series beyond max_series in a segment are skipped until the next segment
+        and counted in skipped.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        members = members or {}
+        with self.lock:
+            start = self.segment_start(timestamp)
+            segment = self.__open(start, create=True)
+            if self.current is None or start > self.current:
+                self.__rotate(start)
+            skipped = [
+                key for key, sample in samples.items()
+                if not segment.append(key, sample, timestamp, members.get(key))
+            ]
+            segment.save_index()
+            self.skipped += len(skipped)
+        if skipped:
+            logging.warning("History segment %s is full, skipping %d series", segment.path, len(skipped))
+
+    def query(self, key, start, end, fields=None):
+        """
+        Read the samples of a series between start and end (epoch seconds) without copying them
+
+        Returns:
+        --------
+        windows: list of Window, one per segment holding the series, each with the sample
+        timestamps (0 where no sample was taken) and a dict mapping fields to their values.
+        The arrays are read-only views of the mapped files.
+        """
+        fields = self.fields if fields is None else fields
+        windows = []
+        with self.lock:
+            segment_start = self.segment_start(max(start, self.__oldest()))
+            while segment_start < end:
+                segment = self.__open(segment_start, create=False)
+                window = segment.window(key, start, end, fields) if segment is not None else None
+                if window is not None:
+                    windows.append(window)
+                segment_start += self.segment_duration
+        for window in windows:
+            window.timestamps.flags.writeable = False
+            for values in window.values.values():
+                values.flags.writeable = False
+        return windows
+
+    def members(self, key, start, end):
+        """
+        Read which members held a series between start and end (epoch seconds)
+
+        Returns:
+        --------
+        changes: list of [timestamp, member] pairs in time order, each giving the member holding the
+        series from the timestamp on; the first one is the member at start if it began earlier
+        """
+        changes = []
+        with self.lock:
+            segment_start = self.segment_start(max(start, self.__oldest()))
+            while segment_start < end:
+                segment = self.__open(segment_start, create=False)
+                if segment is not None:
+                    for change in segment.member_changes(key, start, end):
+                        # Every segment records its first member again
+                        if not changes or changes[-1][1] != change[1]:
+                            changes.append(change)
+                segment_start += self.segment_duration
+        return changes
+
+    def series(self, start, end, prefix=""):
+        """
+        Return the sorted keys of the series starting with prefix that have samples between start and end
+        """
+        keys = set()
+        with self.lock:
+            segment_start = self.segment_start(max(start, self.__oldest()))
+            while segment_start < end:
+                segment = self.__open(segment_start, create=False)
+                if segment is not None:
+                    keys.update(key for key in segment.series if key.startswith(prefix))
+                segment_start += self.segment_duration
+        return sorted(keys)
+
+    def expire(self, now):
+        """
+        Delete the segments that ended before the retention period
+        """
+        for name in os.listdir(self.path):
+            if not name.isdigit() or int(name) + self.segment_duration > now - self.retention:
+                continue
+            self.segments.pop(int(name), None)
+            shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+            logging.info("Deleted history segment %s", name)
+
+    def flush(self):
+        with self.lock:
+            for segment in self.segments.values():
+                segment.flush()
+
+    def __oldest(self):
+        return time.time() - self.retention - self.segment_duration
+
+    def __rotate(self, start):
+        if self.current is not None and self.current in self.segments:
+            self.segments[self.current].flush()
+        self.current = start
+        self.expire(start)
+
+    def __open(self, start, create):
+        start = int(start)
+        segment = self.segments.get(start)
+        if segment is not None:
+            self.segments.move_to_end(start)
+            return segment
+        path = os.path.join(self.path, str(start))
+        if not create and not os.path.isdir(path):
+            return None
+        segment = Segment(path, start, self.fields, self.interval, self.segment_duration, self.max_series)
+        self.segments[start] = segment
+        # Close the least recently used segments; views returned by queries keep their files mapped
+        while len(self.segments) > self.max_open:
+            _, closed = self.segments.popitem(last=False)
+            closed.flush()
+        return segment
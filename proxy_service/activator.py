@@ -0,0 +1,116 @@
+"""
+This module buffers the requests of an application that has no ready pod on this node, e.g. one
+scaled to zero in warm standby, until its first pod is Ready. The NodePort of an app refuses
+connections while no pod of it is ready, so a refused probe starts an activation: the auto scaler
+is asked to scale the app up and the requests wait until the NodePort accepts connections or
+their deadline passes. Requests that find the app ready only pay for a probe once per PROXY_ACTIVATOR_TTL.
+"""
+import asyncio
+import logging
+import math
+import os
+import time
+
+from admission import AdmissionRejected
+from proxy_metrics import ACTIVATION_DURATION
+
+# Seconds a successful request or probe vouches for the app before its NodePort is probed again
+ACTIVATOR_TTL = float(os.environ.get("PROXY_ACTIVATOR_TTL", 1))
+# Seconds between the probes of an app being activated
+ACTIVATOR_POLL = float(os.environ.get("PROXY_ACTIVATOR_POLL", 0.2))
+# Seconds after which an activation that found no ready pod gives up
+ACTIVATOR_TIMEOUT = float(os.environ.get("PROXY_ACTIVATOR_TIMEOUT", 120))
+# Requests buffered per app while it is activated
+ACTIVATOR_QUEUE_SIZE = int(os.environ.get("PROXY_ACTIVATOR_QUEUE_SIZE", 256))
+PROBE_TIMEOUT = 1
+# Reason of the scaling events asking the auto scaler to scale an app up from zero
+ACTIVATION = "activation"
+
+
+async def probe(host, port, timeout=PROBE_TIMEOUT):
+    """
+    Check whether the NodePort accepts connections, that is whether the app has a ready pod
+    """
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    return True
+
+
+class Activator:
+    """
+    Activations in progress per application type and the requests waiting for them
+    """
+
+    def __init__(self, ttl=ACTIVATOR_TTL, poll_interval=ACTIVATOR_POLL, timeout=ACTIVATOR_TIMEOUT,
+                 queue_size=ACTIVATOR_QUEUE_SIZE):
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.queue_size = queue_size
+        self.ready_until = {}
+        self.activations = {}
+        self.waiting = {}
+
+    def mark_ready(self, app_type):
+        self.ready_until[app_type] = time.monotonic() + self.ttl
+
+    def mark_cold(self, app_type):
+        self.ready_until.pop(app_type, None)
+
+    async def ensure_ready(self, host, port, app_type, deadline, notify):
+        """
+        Return once the app has a ready pod, activating it if it has none. notify(reason)
+        asks the auto scaler to scale the app up. Raises AdmissionRejected if too many requests
+        are waiting or the app does not get ready before the deadline.
+        """
+        if time.monotonic() < self.ready_until.get(app_type, 0):
+            return
+        if app_type not in self.activations:
+            if await probe(host, port):
+                self.mark_ready(app_type)
+                return
+            # Another request may have started the activation during the probe
+            if app_type not in self.activations:
+                self.activations[app_type] = asyncio.ensure_future(self.__activate(host, port, app_type, notify))
+        activation = self.activations[app_type]
+
+        retry_after = max(1, math.ceil(self.poll_interval))
+        if self.waiting.get(app_type, 0) >= self.queue_size:
+            raise AdmissionRejected(503, retry_after, f"Too many requests wait for {app_type} to scale from zero")
+        self.waiting[app_type] = self.waiting.get(app_type, 0) + 1
+        try:
+            ready = await asyncio.wait_for(asyncio.shield(activation), max(0, deadline - time.time()))
+        except asyncio.TimeoutError:
+            ready = False
+        finally:
+            self.waiting[app_type] -= 1
+        if not ready:
+            raise AdmissionRejected(503, retry_after, f"{app_type} is still scaling from zero")
+
+    async def __activate(self, host, port, app_type, notify):
+        """
+        Ask for the app to be scaled up and probe it until it has a ready pod
+
+        Returns:
+        --------
+        ready: whether a pod got ready within the timeout
+        """
+        logging.info("Activate %s, its requests are buffered until a pod is ready.", app_type)
+        started = time.monotonic()
+        try:
+            while time.monotonic() - started < self.timeout:
+                # The notifier drops the repeated events within its own interval
+                notify(ACTIVATION)
+                if await probe(host, port):
+                    self.mark_ready(app_type)
+                    ACTIVATION_DURATION.labels(app_type).observe(time.monotonic() - started)
+                    logging.info("Activated %s in %.2f s.", app_type, time.monotonic() - started)
+                    return True
+                await asyncio.sleep(self.poll_interval)
+            logging.error("No pod of %s got ready within %s s.", app_type, self.timeout)
+            return False
+        finally:
+            self.activations.pop(app_type, None)
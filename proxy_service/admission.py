@@ -0,0 +1,158 @@
+"""
+This module holds the admission control of the proxy. The local executions of every
+application type are limited to an adaptive number of concurrent requests with a bounded
+wait queue, and requests that cannot be served before their deadline are rejected early,
+so the admitted requests keep a bounded latency under overload.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import deque
+
+# Seconds after request_start within which a request has to be served, unless it carries a deadline
+REQUEST_DEADLINE = float(os.environ.get("PROXY_REQUEST_DEADLINE", 10))
+INITIAL_LIMIT = float(os.environ.get("PROXY_CONCURRENCY", 8))
+MIN_LIMIT = float(os.environ.get("PROXY_MIN_CONCURRENCY", 1))
+MAX_LIMIT = float(os.environ.get("PROXY_MAX_CONCURRENCY", 64))
+QUEUE_SIZE = int(os.environ.get("PROXY_QUEUE_SIZE", 32))
+# Latency above this multiple of the lowest observed latency counts as congestion
+LATENCY_TOLERANCE = float(os.environ.get("PROXY_LATENCY_TOLERANCE", 2))
+DECREASE_FACTOR = 0.9
+LATENCY_DECAY = 0.1
+# The lowest observed latency slowly drifts up, so it follows the changes of the service time
+MIN_LATENCY_DRIFT = 1.01
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request is not admitted, with the HTTP status and the Retry-After hint in seconds
+    """
+
+    def __init__(self, status, retry_after, reason):
+        super().__init__(reason)
+        self.status = status
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class AdmissionController:
+    """
+    Concurrency limit with a bounded FIFO wait queue. The limit grows by one per limit
+    requests completed within the latency tolerance and shrinks multiplicatively on
+    congestion or errors (AIMD). It shrinks at most once per round trip: the requests that
+    were already in flight when it shrank report the same congestion and do not shrink it again.
+    """
+
+    def __init__(self, limit=INITIAL_LIMIT, min_limit=MIN_LIMIT, max_limit=MAX_LIMIT, queue_size=QUEUE_SIZE):
+        self.limit = limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.queue_size = queue_size
+        self.in_flight = 0
+        self.queue = deque()
+        self.latency = None
+        self.min_latency = None
+        self.last_decrease = None
+        self.clock = time.monotonic
+
+    def expected_wait(self, position):
+        """
+        Return the seconds a request at the position of the queue is expected to wait
+        """
+        if self.latency is None:
+            return 0.0
+        return (position + 1) * self.latency / max(self.limit, 1)
+
+    def retry_after(self):
+        return max(1, math.ceil(self.expected_wait(len(self.queue))))
+
+    async def acquire(self, deadline):
+        """
+        Wait for a free slot, or raise AdmissionRejected if the queue is full or the
+        request cannot be served before the deadline (a time.time() timestamp)
+        """
+        service_time = self.latency or 0.0
+        if not self.queue and self.in_flight < self.limit:
+            if time.time() + service_time > deadline:
+                raise AdmissionRejected(429, self.retry_after(), "deadline cannot be met")
+            self.in_flight += 1
+            return
+
+        if len(self.queue) >= self.queue_size:
+            raise AdmissionRejected(503, self.retry_after(), "queue is full")
+        timeout = deadline - time.time() - service_time
+        if self.expected_wait(len(self.queue)) > timeout:
+            raise AdmissionRejected(429, self.retry_after(), "deadline cannot be met")
+
+        waiter = asyncio.get_event_loop().create_future()
+        self.queue.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            raise AdmissionRejected(429, self.retry_after(), "deadline passed in the queue")
+        except asyncio.CancelledError:
+            # The client went away after being handed a slot it will not use
+            if waiter.done() and not waiter.cancelled():
+                self.in_flight -= 1
+                self.__wake()
+            raise
+        finally:
+            if waiter in self.queue:
+                self.queue.remove(waiter)
+
+    def release(self, latency, ok=True):
+        """
+        Free the slot of a finished request and adapt the limit to its latency
+
+        Returns:
+        --------
+        congested: whether the request was slow or failed, even if the limit was decreased
+        already by a request of the same round trip
+        """
+        now = self.clock()
+        self.in_flight -= 1
+        if ok:
+            self.latency = latency if self.latency is None else self.latency + LATENCY_DECAY * (latency - self.latency)
+            self.min_latency = latency if self.min_latency is None else min(latency, self.min_latency * MIN_LATENCY_DRIFT)
+
+        congested = not ok or latency > LATENCY_TOLERANCE * self.min_latency
+        if congested:
+            # Only a request started after the last decrease tells whether the decreased limit is still too high
+            if self.last_decrease is None or now - latency >= self.last_decrease:
+                self.limit = max(self.min_limit, self.limit * DECREASE_FACTOR)
+                self.last_decrease = now
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        self.__wake()
+        return congested
+
+    def __wake(self):
+        while self.queue and self.in_flight < self.limit:
+            waiter = self.queue.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+
+class Admission:
+    """
+    One admission controller per application type
+    """
+
+    def __init__(self):
+        self.controllers = {}
+
+    def controller(self, app_type):
+        if app_type not in self.controllers:
+            self.controllers[app_type] = AdmissionController()
+        return self.controllers[app_type]
+
+    @staticmethod
+    def deadline(msg):
+        """
+        Return the deadline of a request message as a time.time() timestamp
+        """
+        if "deadline" in msg:
+            return float(msg["deadline"])
+        return float(msg["request_start"]) + REQUEST_DEADLINE
@@ -0,0 +1,126 @@
+"""
+This module keeps a cached view of the load of every node/app pair for the load-aware
+routing of the proxy. The view is refreshed in the background from the batch endpoint of
+the metric collector, asking for the catalog pairs so that their fresh cached snapshots are
+served instead of being collected again, and a request is sent to the best-scoring node within the hop budget
+of the node it asked for instead of queuing behind a saturated one.
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+
+from aiohttp import ClientError
+
+# "static" always serves the requested node, "p2c" picks the better of two random
+# candidates and "least_latency" picks the candidate with the lowest score
+ROUTING_MODE = os.environ.get("PROXY_ROUTING", "static")
+ROUTING_MODES = ("static", "p2c", "least_latency")
+REFRESH_INTERVAL = float(os.environ.get("PROXY_LOAD_REFRESH", 2))
+# A view older than this is not trusted and the requested node is served
+MAX_AGE = float(os.environ.get("PROXY_LOAD_MAX_AGE", 10))
+# Hops away from the requested node a request may be moved
+HOP_BUDGET = int(os.environ.get("PROXY_HOP_BUDGET", 1))
+# Milliseconds added to the score per unit of link cost on the path to a node
+HOP_PENALTY_MS = float(os.environ.get("PROXY_HOP_PENALTY_MS", 20))
+# Utilization of its CPU request above which a pod counts as saturated
+SATURATION = float(os.environ.get("PROXY_SATURATION", 0.9))
+
+
+class LoadView:
+    """
+    Latency and utilization per node/app pair, as seen by the metric collector
+    """
+
+    def __init__(self, topology, mode=ROUTING_MODE, collector_url=None):
+        if mode not in ROUTING_MODES:
+            raise ValueError(f"Unknown routing mode {mode}")
+        if mode != "static" and collector_url is None:
+            logging.warning("No metric collector to read the load from, falling back to static routing")
+            mode = "static"
+        self.topology = topology
+        self.mode = mode
+        self.collector_url = collector_url
+        self.pairs = {}
+        self.updated_at = None
+        self.request = json.dumps({"pairs": [
+            {"node": node, "app": app_type}
+            for node in topology.catalog.nodes for app_type in topology.catalog.app_types
+        ]})
+
+    def update(self, batch):
+        """
+        Replace the view with the pairs of a batch metrics response of the metric collector
+        """
+        pairs = {}
+        for label, metrics in batch.get("pairs", {}).items():
+            spec = self.topology.catalog.by_label(label)
+            if spec is None:
+                continue
+            node, app_type = spec.node, spec.app_type
+            pods = list(metrics.get("pod_instances", {}).values())
+            if not pods:
+                pairs[(node, app_type)] = {"pods": 0, "latency_ms": None, "utilization": None}
+                continue
+            latency_ms = 1000 * sum(pod["res_time"] for pod in pods) / len(pods)
+            utilization = sum(pod.get("cpu", 0) for pod in pods) / len(pods) / spec.cpu_request
+            pairs[(node, app_type)] = {
+                "pods": len(pods),
+                "latency_ms": latency_ms,
+                "utilization": utilization
+            }
+        self.pairs = pairs
+        self.updated_at = time.monotonic()
+
+    def is_fresh(self):
+        return self.updated_at is not None and time.monotonic() - self.updated_at <= MAX_AGE
+
+    def score(self, source, node, app_type):
+        """
+        Return the expected latency in ms of serving the app on the node from the source,
+        or None if the node has no unsaturated replica of it
+        """
+        load = self.pairs.get((node, app_type))
+        if load is None or not load["pods"] or load["utilization"] >= SATURATION:
+            return None
+        return load["latency_ms"] * (1 + load["utilization"]) + HOP_PENALTY_MS * self.topology.cost(source, node)
+
+    def select(self, source, requested, app_type):
+        """
+        Return the node that should serve the request of the app arriving at the source
+        """
+        if self.mode == "static" or not self.is_fresh():
+            return requested
+
+        scores = {}
+        for node in self.topology.nodes:
+            hops = self.topology.hops(requested, node)
+            if hops is None or hops > HOP_BUDGET or self.topology.cost(source, node) is None:
+                continue
+            score = self.score(source, node, app_type)
+            if score is not None:
+                scores[node] = score
+        if not scores:
+            return requested
+
+        candidates = list(scores)
+        if self.mode == "p2c" and len(candidates) > 2:
+            candidates = random.sample(candidates, 2)
+        return min(candidates, key=scores.get)
+
+    async def refresh(self, session):
+        """
+        Keep refreshing the view from the metric collector until cancelled
+        """
+        while True:
+            try:
+                async with session.post(self.collector_url, data=self.request) as res:
+                    if res.status == 200:
+                        self.update(await res.json(content_type=None))
+                    else:
+                        logging.warning("Metric collector answered %d to the load view refresh", res.status)
+            except (ClientError, asyncio.TimeoutError, ValueError) as exc:
+                logging.warning("Error while refreshing the load view: %s", exc)
+            await asyncio.sleep(REFRESH_INTERVAL)
@@ -1,18 +1,23 @@
+import asyncio
 import json
 import logging
 import os
 import socket
 import sys
+import time
 
-import requests
+from aiohttp import ClientConnectorError, ClientError, ClientSession, ClientTimeout, TCPConnector, web
 from dotenv import load_dotenv
-from flask import Flask, Response, request
-from kubernetes import client, config
 
-load_dotenv()
+from activator import Activator
+from admission import Admission, AdmissionRejected
+from load_view import LoadView
+from proxy_metrics import (ERRORS, FORWARD_LATENCY, HOP_TIMING_HEADER, IN_FLIGHT, LOCAL_LATENCY, hop_stamp,
+                           message_stamp, render)
+from scaling_events import ScalingEvents
+from topology import Topology
 
-# Initialize the Flask application
-app = Flask(__name__)
+load_dotenv()
 
 logging.basicConfig(
         level=logging.INFO,
@@ -23,74 +28,222 @@ logging.basicConfig(
         ]
     )
 
-config.load_kube_config()
-api = client.CustomObjectsApi()
-core_v1 = client.CoreV1Api()
 proxy_service_port = 8280
-services = {}
-
-edge_ips = {
-    "edge1": os.environ["EDGE-1"],
-    "edge2": os.environ["EDGE-2"],
-    "edge3": os.environ["EDGE-3"]
-}
-
-next_hops = {
-    "edge1" : "edge2",
-    "edge2" : ["edge1", "edge3"],
-    "edge3" : "edge2"
-}
-
-def find_service_ports(hostname):
-    node_number = int(hostname[-1])
-    services["mobilenet"] = 30100 + node_number
-    services["squeezenet"] = 30200 + node_number
-    services["shufflenet"] = 30300 + node_number
-    services["binaryalert"] = 30400 + node_number
-
-@app.route("/proxy", methods=["POST"])
-def forward_request():
+
+# Timeouts in seconds of the connections to the neighbor proxies and the local NodePorts
+CONNECT_TIMEOUT = float(os.environ.get("PROXY_CONNECT_TIMEOUT", 2))
+READ_TIMEOUT = float(os.environ.get("PROXY_READ_TIMEOUT", 30))
+REQUEST_TIMEOUT = float(os.environ.get("PROXY_REQUEST_TIMEOUT", 60))
+# Connections kept alive per destination and how long idle ones are kept
+POOL_SIZE = int(os.environ.get("PROXY_POOL_SIZE", 64))
+KEEPALIVE_TIMEOUT = float(os.environ.get("PROXY_KEEPALIVE_TIMEOUT", 60))
+CHUNK_SIZE = 64 * 1024
+# Client session shared by the requests of the application
+SESSION = web.AppKey("session", ClientSession)
+
+topology = Topology()
+collector_url = f"http://{os.environ['MASTER']}:8180/metrics/batch" if os.environ.get("MASTER") else None
+load_view = LoadView(topology, collector_url=collector_url)
+admission = Admission()
+scaling_events = ScalingEvents(os.environ.get("MASTER"))
+activator = Activator()
+
+async def client_session(app):
+    """
+    Keep one client session for the lifetime of the server, so the connections to every
+    destination are pooled and kept alive between requests
+    """
+    connector = TCPConnector(limit=0, limit_per_host=POOL_SIZE, keepalive_timeout=KEEPALIVE_TIMEOUT)
+    timeout = ClientTimeout(total=REQUEST_TIMEOUT, sock_connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT)
+    app[SESSION] = ClientSession(connector=connector, timeout=timeout)
+    yield
+    await app[SESSION].close()
+
+async def load_view_refresh(app):
+    """
+    Refresh the load view in the background while the load-aware routing is enabled
+    """
+    task = None
+    if load_view.mode != "static":
+        task = asyncio.ensure_future(load_view.refresh(app[SESSION]))
+    yield
+    if task is not None:
+        task.cancel()
+
+def upstream_response(upstream, stamp):
+    """
+    Build the response passing the status and content type of the downstream response on,
+    with the timing stamp of this hop in front of the ones of the downstream hops
+
+    Returns:
+    --------
+    response: aiohttp StreamResponse, not prepared yet
+    """
+    response = web.StreamResponse(status=upstream.status)
+    if "Content-Type" in upstream.headers:
+        response.headers["Content-Type"] = upstream.headers["Content-Type"]
+    if HOP_TIMING_HEADER in upstream.headers:
+        stamp = f"{stamp}, {upstream.headers[HOP_TIMING_HEADER]}"
+    response.headers[HOP_TIMING_HEADER] = stamp
+    return response
+
+async def stream_response(request, upstream, response):
+    """
+    Send the status and headers of the response, then pass the body of the downstream response
+    through chunk by chunk instead of buffering it
     """
-    Flas server listening metric requests on port 8280 and forwarding app request to demanding node 
-    
-    Returns: 
-    --------  
-    response: Flask Responses
+    await response.prepare(request)
+    async for chunk in upstream.content.iter_chunked(CHUNK_SIZE):
+        await response.write(chunk)
+    await response.write_eof()
+
+def abort(request, response):
+    """
+    Cut the connection of a response whose status and headers are sent already, as a 502 can
+    no longer be sent in its place. The client learns that the body is truncated from the
+    connection closing before its end.
+
+    Returns:
+    --------
+    response: the prepared aiohttp StreamResponse
+    """
+    if request.transport is not None:
+        request.transport.close()
+    return response
+
+async def forward_request(request):
+    """
+    Async server listening offloading requests on port 8280 and forwarding them to the demanding node
+
+    Returns:
+    --------
+    response: aiohttp StreamResponse
     """
-    request_json = request.data.decode()
-    msg = json.loads(request_json)
+    received = time.time()
+    arrived = time.monotonic()
+    msg = json.loads(await request.read())
     node = msg["node"]
     app_type = msg["app"]
     request_start = float(msg["request_start"])
-    
+    deadline = admission.deadline(msg)
+
     hostname = socket.gethostname()
-    host_ip = edge_ips[hostname]
+    session = request.app[SESSION]
+    topology.maybe_reload()
+
+    # Only the first proxy on the path picks the serving node, the others follow its choice
+    if not msg.get("routed"):
+        selected = load_view.select(hostname, node, app_type)
+        if selected != node:
+            logging.info("Route the request of %s to %s instead of %s.", app_type, selected, node)
+            node = selected
 
     if node == hostname:
-        find_service_ports(hostname)
-        port = services[app_type]
+        host_ip = topology.ip(hostname)
+        port = topology.node_port(hostname, app_type)
+        controller = admission.controller(app_type)
+        try:
+            # Requests of an app without ready pods wait here until it is scaled up from zero
+            await activator.ensure_ready(
+                host_ip, port, app_type, deadline,
+                lambda reason: scaling_events.notify(session, node, app_type, reason)
+            )
+            await controller.acquire(deadline)
+        except AdmissionRejected as exc:
+            logging.warning("Reject the request of %s in %s: %s.", app_type, node, exc.reason)
+            ERRORS.labels("local", f"rejected_{exc.status}").inc()
+            scaling_events.notify(session, node, app_type, f"admission rejected: {exc.reason}")
+            return web.Response(status=exc.status, headers={"Retry-After": str(exc.retry_after)}, text=exc.reason)
+
+        started = time.monotonic()
+        ok = False
+        response = None
         try:
-            req = json.dumps({"request_start": request_start})
-            res_init = requests.post(f"http://{host_ip}:{port}/init", data=req)
-            res = requests.post(f"http://{host_ip}:{port}/run")
-            logging.info("Local execution of %s in %s.", app_type, node)
-        except client.ApiException as exc:
-            logging.error("Error while locally executing %s in %s", app_type, node)
-            raise exc
+            with IN_FLIGHT.labels("local").track_inprogress():
+                req = json.dumps({"request_start": request_start})
+                async with session.post(f"http://{host_ip}:{port}/init", data=req) as res_init:
+                    await res_init.read()
+                init_done = time.monotonic()
+                LOCAL_LATENCY.labels(app_type, "init").observe(init_done - started)
+                async with session.post(f"http://{host_ip}:{port}/run") as res:
+                    logging.info("Local execution of %s in %s.", app_type, node)
+                    ok = res.status < 500
+                    if ok:
+                        activator.mark_ready(app_type)
+                    else:
+                        ERRORS.labels("local", f"status_{res.status}").inc()
+                    stamp = hop_stamp(
+                        hostname, received, queue=started - arrived,
+                        init=init_done - started, run=time.monotonic() - init_done
+                    )
+                    response = upstream_response(res, stamp)
+                    await stream_response(request, res, response)
+                finished = time.monotonic()
+                LOCAL_LATENCY.labels(app_type, "run").observe(finished - init_done)
+                LOCAL_LATENCY.labels(app_type, "total").observe(finished - started)
+                return response
+        except (ClientError, asyncio.TimeoutError) as exc:
+            logging.error("Error while locally executing %s in %s: %s", app_type, node, exc)
+            ERRORS.labels("local", type(exc).__name__).inc()
+            if isinstance(exc, ClientConnectorError):
+                activator.mark_cold(app_type)
+            if response is not None and response.prepared:
+                ok = False
+                logging.error("Abort the response of %s after its headers were sent.", app_type)
+                return abort(request, response)
+            return web.Response(status=502, text=f"Local execution of {app_type} failed")
+        finally:
+            if controller.release(time.monotonic() - started, ok):
+                scaling_events.notify(session, node, app_type, "congestion")
     else:
-        if hostname == "edge2":
-            next_hop_ip = edge_ips[node]
-        else:
-            next_hop_ip = edge_ips[next_hops[hostname]]
+        next_hop = topology.next_hop(hostname, node)
+        if next_hop is None:
+            logging.error("No route from %s to %s for the request of %s", hostname, node, app_type)
+            ERRORS.labels("forward", "no_route").inc()
+            return web.Response(status=404, text=f"No route to {node}")
+        next_hop_ip = topology.ip(next_hop)
+        started = time.monotonic()
+        response = None
         try:
-            req = json.dumps({"node": node, "app": app_type, "request_start": request_start})
-            res = requests.post(f"http://{next_hop_ip}:{proxy_service_port}/proxy", data=req)
-            logging.info("Forward the request of %s to %s.", app_type, node)
-        except client.ApiException as exc:
-            logging.error("Error while forwarding th request of %s to %s", app_type, node)
-            raise exc
-        
-    return Response(response=res, status=200)
+            with IN_FLIGHT.labels("forward").track_inprogress():
+                req = json.dumps({
+                    "node": node, "app": app_type, "request_start": request_start, "deadline": deadline,
+                    "routed": True, "hops": msg.get("hops", []) + [message_stamp(hostname, received)]
+                })
+                async with session.post(f"http://{next_hop_ip}:{proxy_service_port}/proxy", data=req) as res:
+                    logging.info("Forward the request of %s to %s via %s.", app_type, node, next_hop)
+                    if res.status >= 500:
+                        ERRORS.labels("forward", f"status_{res.status}").inc()
+                    stamp = hop_stamp(hostname, received, forward=time.monotonic() - started)
+                    response = upstream_response(res, stamp)
+                    await stream_response(request, res, response)
+                FORWARD_LATENCY.labels(node, next_hop).observe(time.monotonic() - started)
+                return response
+        except (ClientError, asyncio.TimeoutError) as exc:
+            logging.error("Error while forwarding the request of %s to %s: %s", app_type, node, exc)
+            ERRORS.labels("forward", type(exc).__name__).inc()
+            if response is not None and response.prepared:
+                logging.error("Abort the response of %s forwarded to %s after its headers were sent.", app_type, node)
+                return abort(request, response)
+            return web.Response(status=502, text=f"Forwarding to {node} failed")
+
+async def metrics(request):
+    """
+    Expose the Prometheus metrics of the proxy
+
+    Returns:
+    --------
+    response: aiohttp Response
+    """
+    body, content_type = render(admission)
+    return web.Response(body=body, headers={"Content-Type": content_type})
+
+# Initialize the aiohttp application, served by gunicorn with the aiohttp worker
+app = web.Application()
+app.cleanup_ctx.append(client_session)
+app.cleanup_ctx.append(load_view_refresh)
+app.router.add_post("/proxy", forward_request)
+app.router.add_get("/metrics", metrics)
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8280)
+    web.run_app(app, host='0.0.0.0', port=proxy_service_port)
@@ -0,0 +1,81 @@
+"""
+This module holds the Prometheus metrics of the proxy and the per-hop timing stamps
+that are appended to the forwarded messages and to the response headers
+"""
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+HOP_TIMING_HEADER = "X-Hop-Timing"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+FORWARD_LATENCY = Histogram(
+    "proxy_forward_latency_seconds",
+    "Seconds from receiving a request to finishing the response of the next hop, per destination node",
+    ["destination", "next_hop"],
+    buckets=LATENCY_BUCKETS
+)
+LOCAL_LATENCY = Histogram(
+    "proxy_local_execution_seconds",
+    "Seconds spent in the /init and /run calls of a local execution and in total, per app",
+    ["app", "stage"],
+    buckets=LATENCY_BUCKETS
+)
+IN_FLIGHT = Gauge(
+    "proxy_in_flight_requests",
+    "Requests being executed locally or forwarded",
+    ["kind"]
+)
+ERRORS = Counter(
+    "proxy_errors_total",
+    "Requests that failed or were rejected, per kind and reason",
+    ["kind", "reason"]
+)
+ADMISSION_LIMIT = Gauge(
+    "proxy_admission_limit",
+    "Current adaptive concurrency limit of the local executions, per app",
+    ["app"]
+)
+ACTIVATION_DURATION = Histogram(
+    "proxy_activation_seconds",
+    "Seconds from the first buffered request of an app without ready pods until its first pod was ready",
+    ["app"],
+    buckets=LATENCY_BUCKETS + (60, 120)
+)
+ADMISSION_QUEUE = Gauge(
+    "proxy_admission_queue_length",
+    "Requests waiting for a local execution slot, per app",
+    ["app"]
+)
+
+
+def hop_stamp(hostname, received, **durations):
+    """
+    Return the timing stamp of this hop for the response header, e.g.
+    "edge2;received=1700000000.123;init=0.004;run=0.250"
+    """
+    fields = [hostname, f"received={received:.3f}"]
+    fields.extend(f"{name}={duration:.4f}" for name, duration in durations.items())
+    return ";".join(fields)
+
+
+def message_stamp(hostname, received):
+    """
+    Return the timing stamp of this hop for the forwarded message
+    """
+    return {"node": hostname, "received": received, "forwarded": time.time()}
+
+
+def render(admission):
+    """
+    Return the exposition of all metrics with the admission gauges refreshed
+
+    Returns:
+    --------
+    body: bytes of the exposition
+    content_type: content type of the exposition
+    """
+    for app_type, controller in admission.controllers.items():
+        ADMISSION_LIMIT.labels(app_type).set(controller.limit)
+        ADMISSION_QUEUE.labels(app_type).set(len(controller.queue))
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,55 @@
+"""
+This module reports breaches seen by the proxy (rejected requests, congestion of an app) to
+the events endpoint of the auto scaler, so it evaluates the affected node/app right away
+instead of waiting for its next tick
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+
+from aiohttp import ClientError, ClientTimeout
+
+EVENTS_PORT = int(os.environ.get("AUTOSCALER_EVENTS_PORT", 8580))
+# Seconds between two events of the same node/app and reason sent by this proxy
+EVENT_INTERVAL = float(os.environ.get("PROXY_EVENT_INTERVAL", 5))
+EVENT_TIMEOUT = ClientTimeout(total=1)
+
+
+class ScalingEvents:
+    """
+    Sends breach events to the auto scaler without delaying the requests that raised them
+    """
+
+    def __init__(self, master=None, interval=EVENT_INTERVAL):
+        self.url = f"http://{master}:{EVENTS_PORT}/events" if master else None
+        self.interval = interval
+        self.sent = {}
+        self.tasks = set()
+
+    def notify(self, session, node, app_type, reason):
+        """
+        Send an event in the background unless one was sent for the node/app with the same reason
+        within the interval. An activation is thus not held back by an earlier congestion event.
+        """
+        if self.url is None:
+            return
+        key = (node, app_type, reason)
+        now = time.monotonic()
+        if now - self.sent.get(key, float("-inf")) < self.interval:
+            return
+        self.sent[key] = now
+        task = asyncio.ensure_future(self.__send(session, node, app_type, reason))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def __send(self, session, node, app_type, reason):
+        body = json.dumps({"node": node, "app": app_type, "reason": reason})
+        try:
+            async with session.post(self.url, data=body, timeout=EVENT_TIMEOUT) as res:
+                await res.read()
+                if res.status != 202:
+                    logging.warning("Scaling event for %s in %s answered %s.", app_type, node, res.status)
+        except (ClientError, asyncio.TimeoutError) as exc:
+            logging.warning("Could not send the scaling event for %s in %s: %s", app_type, node, exc)
@@ -0,0 +1,136 @@
+"""
+This module holds the topology of the edge nodes used by the proxy to forward requests.
+The nodes with their IPs and NodePorts come from the catalog, the link costs are read from
+topology.json, or from the file given by the PROXY_TOPOLOGY environment variable, and the
+next hop between every pair of nodes is precomputed, so forwarding a request only takes a lookup.
+"""
+import heapq
+import json
+import logging
+import os
+import time
+
+from catalog import load_catalog
+
+TOPOLOGY_FILE = os.environ.get(
+    "PROXY_TOPOLOGY", os.path.join(os.path.dirname(__file__), "topology.json")
+)
+# Seconds between the checks of the topology file for changes
+RELOAD_INTERVAL = float(os.environ.get("PROXY_TOPOLOGY_RELOAD", 5))
+
+
+def shortest_paths(nodes, links):
+    """
+    Run Dijkstra from every node over the undirected links
+
+    Returns:
+    --------
+    next_hops: dict mapping each source to a dict mapping each reachable destination to the next hop
+    costs: dict mapping each source to a dict mapping each reachable destination to the path cost
+    hop_counts: dict mapping each source to a dict mapping each reachable destination to the hops on the path
+    """
+    neighbors = {node: [] for node in nodes}
+    for source, target, cost in links:
+        neighbors[source].append((target, cost))
+        neighbors[target].append((source, cost))
+
+    next_hops = {}
+    costs = {}
+    hop_counts = {}
+    for source in nodes:
+        hops = {source: source}
+        distances = {source: 0}
+        counts = {source: 0}
+        queue = [(0, source)]
+        while queue:
+            distance, node = heapq.heappop(queue)
+            if distance > distances[node]:
+                continue
+            for neighbor, cost in neighbors[node]:
+                candidate = distance + cost
+                if candidate < distances.get(neighbor, float("inf")):
+                    distances[neighbor] = candidate
+                    hops[neighbor] = neighbor if node == source else hops[node]
+                    counts[neighbor] = counts[node] + 1
+                    heapq.heappush(queue, (candidate, neighbor))
+        next_hops[source] = hops
+        costs[source] = distances
+        hop_counts[source] = counts
+    return next_hops, costs, hop_counts
+
+
+class Topology:
+    """
+    Node graph of the catalog nodes and the all-pairs next hop table.
+    The file is reloaded when it changes; a broken file keeps the previous table in use.
+    """
+
+    def __init__(self, path=TOPOLOGY_FILE, reload_interval=RELOAD_INTERVAL, catalog=None):
+        self.catalog = catalog or load_catalog()
+        self.path = path
+        self.reload_interval = reload_interval
+        self.mtime = None
+        self.last_check = time.monotonic()
+        self.nodes = self.catalog.nodes
+        self.next_hops = {}
+        self.costs = {}
+        self.hop_counts = {}
+        self.load()
+
+    def load(self):
+        """
+        Read the topology file and recompute the next hop table
+        """
+        mtime = os.stat(self.path).st_mtime
+        with open(self.path) as f:
+            topology = json.load(f)
+
+        nodes = self.catalog.nodes
+        links = [(source, target, float(cost)) for source, target, cost in topology["links"]]
+        for source, target, cost in links:
+            if source not in nodes or target not in nodes:
+                raise ValueError(f"Link {source}-{target} refers to an unknown node")
+            if cost < 0:
+                raise ValueError(f"Link {source}-{target} has a negative cost")
+
+        self.next_hops, self.costs, self.hop_counts = shortest_paths(nodes, links)
+        self.mtime = mtime
+        logging.info("Loaded the topology of %d nodes and %d links from %s", len(nodes), len(links), self.path)
+
+    def maybe_reload(self):
+        """
+        Reload the topology if the file changed since it was last read
+        """
+        now = time.monotonic()
+        if now - self.last_check < self.reload_interval:
+            return
+        self.last_check = now
+        try:
+            if os.stat(self.path).st_mtime != self.mtime:
+                self.load()
+        except (OSError, KeyError, TypeError, ValueError) as exc:
+            logging.error("Keeping the previous topology, reloading %s failed: %s", self.path, exc)
+
+    def next_hop(self, source, destination):
+        """
+        Return the neighbor of the source on the cheapest path to the destination, or None if unreachable
+        """
+        return self.next_hops.get(source, {}).get(destination)
+
+    def cost(self, source, destination):
+        """
+        Return the cost of the cheapest path between the nodes, or None if unreachable
+        """
+        return self.costs.get(source, {}).get(destination)
+
+    def hops(self, source, destination):
+        """
+        Return the number of hops on the cheapest path between the nodes, or None if unreachable
+        """
+        return self.hop_counts.get(source, {}).get(destination)
+
+    def ip(self, node):
+        return self.catalog.node_ip(node)
+
+    def node_port(self, node, app_type):
+        return self.catalog.spec(node, app_type).node_port
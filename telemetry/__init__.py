@@ -0,0 +1,147 @@
+"""
+This package receives the resource samples pushed by the resource monitors of the edge
+nodes and keeps the latest snapshot of each node in memory. It is shared by the auto scaler,
+which holds back scale-ups on nodes over the CPU or memory thresholds defined here, and the
+metric collector, which records the node history, and like the catalog it should be placed
+next to them in the modules directory.
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import time
+
+from catalog import load_catalog
+
+TELEMETRY_PORT = 8381
+STALE_AFTER = 5
+# Node CPU utilization (%) above and available memory (%) below which a node is over its thresholds,
+# where the auto scalers add no replicas
+CPU_THRESHOLD = float(os.environ.get("AUTOSCALER_NODE_CPU_THRESHOLD", 90))
+MEM_THRESHOLD = float(os.environ.get("AUTOSCALER_NODE_MEM_THRESHOLD", 30))
+
+# Short keys of the pushed datagrams
+FIELDS = {
+    "c": "cpu_util",
+    "m": "available_mem",
+    "ca": "cpu_util_avg",
+    "cp": "cpu_util_peak",
+    "ma": "available_mem_avg",
+    "mm": "available_mem_min",
+    "l": "load_avg",
+    "k": "cpu_count",
+    "mt": "mem_total"
+}
+
+
+class TelemetryReceiver:
+    """
+    UDP receiver holding the latest resource snapshot of every edge node.
+    on_event(node, reason) is called when a node goes over its thresholds, so its pairs release
+    the replicas they no longer need right away, and when it comes back under them, as the
+    scale-ups held back there can proceed again.
+    Datagrams of nodes that are not in the given nodes (the catalog nodes by default) are dropped;
+    the first one is logged as a warning, as it usually means a resource monitor whose NODE_NAME
+    is not set to the catalog name of its node.
+    """
+
+    def __init__(self, port=TELEMETRY_PORT, stale_after=STALE_AFTER, on_event=None,
+                 cpu_threshold=CPU_THRESHOLD, mem_threshold=MEM_THRESHOLD, nodes=None):
+        self.port = port
+        self.known_nodes = set(load_catalog().nodes if nodes is None else nodes)
+        self.unknown_seen = False
+        self.stale_after = stale_after
+        self.on_event = on_event
+        self.over_thresholds = set()
+        self.cpu_threshold = cpu_threshold
+        self.mem_threshold = mem_threshold
+        self.lock = threading.Lock()
+        self.nodes = {}
+        self.sock = None
+        self.thread = None
+
+    def start(self):
+        """
+        Bind the UDP socket and start receiving in a background thread
+        """
+        if self.thread is None:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sock.bind(("0.0.0.0", self.port))
+            self.thread = threading.Thread(target=self.run, name="telemetry-receiver", daemon=True)
+            self.thread.start()
+            logging.info("Telemetry receiver is listening on port %s.", self.port)
+        return self
+
+    def run(self):
+        """
+        Receive datagrams and keep the newest sample of each node
+        """
+        while True:
+            datagram, _ = self.sock.recvfrom(4096)
+            try:
+                self.update(json.loads(datagram))
+            except (ValueError, KeyError, TypeError) as exc:
+                logging.warning("Malformed telemetry datagram - %s", exc)
+
+    def update(self, message):
+        """
+        Store a decoded datagram unless a newer sample of the node is already stored.
+        Raises ValueError, KeyError or TypeError for malformed datagrams.
+        """
+        node = message["n"]
+        if node not in self.known_nodes:
+            if not self.unknown_seen:
+                self.unknown_seen = True
+                logging.warning(
+                    "Dropping the telemetry of %s, which is not a catalog node (%s); "
+                    "check NODE_NAME of its resource monitor", node, ", ".join(sorted(self.known_nodes))
+                )
+            else:
+                logging.debug("Dropped telemetry of unknown node %s", node)
+            return
+        sample = {field: float(message[key]) for key, field in FIELDS.items() if key in message}
+        sample["timestamp"] = float(message["t"])
+        with self.lock:
+            previous = self.nodes.get(node)
+            if previous is not None and previous[1]["timestamp"] > sample["timestamp"]:
+                return
+            self.nodes[node] = (time.monotonic(), sample)
+
+        over = sample.get("cpu_util", 0.0) >= self.cpu_threshold \
+            or sample.get("available_mem", 100.0) <= self.mem_threshold
+        if over == (node in self.over_thresholds):
+            return
+        if over:
+            self.over_thresholds.add(node)
+            reason = "resources over the thresholds"
+        else:
+            self.over_thresholds.discard(node)
+            reason = "resources back under the thresholds"
+        if self.on_event is not None:
+            self.on_event(node, reason)
+
+    def latest(self, node):
+        """
+        Return the latest snapshot of the node and its age in seconds, or (None, None)
+        if nothing has been received from the node yet
+        """
+        with self.lock:
+            entry = self.nodes.get(node)
+        if entry is None:
+            return None, None
+        received, sample = entry
+        return sample, time.monotonic() - received
+
+    def is_stale(self, node):
+        """
+        Check whether the node has not pushed a sample within stale_after seconds
+        """
+        _, age = self.latest(node)
+        return age is None or age > self.stale_after
+
+    def stale_nodes(self, nodes):
+        """
+        Return the given nodes whose data is stale
+        """
+        return [node for node in nodes if self.is_stale(node)]
@@ -0,0 +1,65 @@
+"""
+The services import their sibling modules by their flat names, as they run from their own
+directories, so the test suite puts those directories on the path the same way
+"""
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+sys.path.insert(0, ROOT)
+for module_dir in ("metrics", "proxy_service"):
+    sys.path.insert(0, os.path.join(ROOT, module_dir))
+
+# IPs of the catalog nodes and of the master, read at import time by the auto scaler and the proxy
+os.environ.setdefault("MASTER", "127.0.0.1")
+for index in (1, 2, 3):
+    os.environ.setdefault(f"EDGE-{index}", f"10.0.0.{index}")
+
+
+@pytest.fixture
+def make_auto_scaler():
+    """
+    Build auto scalers on the fake cluster of the simulator, with a virtual clock
+    """
+    from auto_scaler.auto_scaler import AutoScaler
+    from auto_scaler.simulator import FakeCluster, VirtualClock
+
+    clock = VirtualClock()
+    cluster = FakeCluster(clock, {})
+
+    def make(node="edge1", app="mobilenet", scale=1, **attributes):
+        name = AutoScaler.CATALOG.spec(node, app).name
+        cluster.set_replicas(name, scale)
+        auto_scaler = AutoScaler(node, app, api_clients=(None, cluster, cluster), known_scales={name: scale})
+        auto_scaler.clock = clock
+        for attribute, value in attributes.items():
+            setattr(auto_scaler, attribute, value)
+        return auto_scaler
+
+    make.clock = clock
+    make.cluster = cluster
+    return make
+
+
+@pytest.fixture
+def dashed_catalog(tmp_path):
+    """
+    Catalog whose node and app names contain dashes, like their labels "<app>-<node>"
+    """
+    from catalog import Catalog
+
+    path = tmp_path / "catalog.json"
+    path.write_text(json.dumps({
+        "names": {"label": "{app}-{node}", "deployment": "{app}-deployment-{node}", "service": "{app}-lb-{node}"},
+        "nodes": {"edge-west-1": {"ip": "10.0.1.1", "index": 1}},
+        "apps": {"mobile-net": {
+            "image": "example/mobile-net:v1", "port": 8080, "node_port_base": 30100,
+            "target_cpu": 250, "cpu_request": 200
+        }}
+    }))
+    return Catalog(str(path))
@@ -0,0 +1,115 @@
+import asyncio
+import time
+
+import pytest
+
+import activator
+from activator import ACTIVATION, Activator
+from admission import AdmissionRejected
+
+
+class FakeNodePort:
+    """
+    Stands in for the probe of a NodePort, which accepts connections once the app is ready
+    """
+
+    def __init__(self, ready=False):
+        self.ready = ready
+        self.probes = 0
+
+    async def probe(self, host, port):
+        self.probes += 1
+        return self.ready
+
+
+def no_notify(reason):
+    pass
+
+
+@pytest.fixture
+def node_port(monkeypatch):
+    fake = FakeNodePort()
+    monkeypatch.setattr(activator, "probe", fake.probe)
+    return fake
+
+
+def test_ready_app_is_probed_once_per_ttl(node_port):
+    node_port.ready = True
+    events = []
+    ready = Activator(ttl=60)
+
+    async def run():
+        for _ in range(3):
+            await ready.ensure_ready("10.0.0.1", 30101, "mobilenet", time.time() + 5, events.append)
+
+    asyncio.run(run())
+    assert node_port.probes == 1
+    assert events == []
+
+
+def test_requests_are_buffered_and_released_on_readiness(node_port):
+    events = []
+    ready = Activator(ttl=60, poll_interval=0.01)
+
+    async def run():
+        waiting = [
+            asyncio.ensure_future(ready.ensure_ready("10.0.0.1", 30101, "mobilenet", time.time() + 5, events.append))
+            for _ in range(3)
+        ]
+        await asyncio.sleep(0.05)
+        assert not any(request.done() for request in waiting)
+        assert ready.waiting["mobilenet"] == 3
+        node_port.ready = True
+        await asyncio.wait_for(asyncio.gather(*waiting), 1)
+
+    asyncio.run(run())
+    assert events and set(events) == {ACTIVATION}
+    assert ready.waiting["mobilenet"] == 0
+    assert ready.activations == {}
+
+
+def test_request_past_its_deadline_is_rejected(node_port):
+    ready = Activator(ttl=60, poll_interval=0.01, timeout=60)
+
+    async def run():
+        with pytest.raises(AdmissionRejected) as rejected:
+            await ready.ensure_ready("10.0.0.1", 30101, "mobilenet", time.time() + 0.05, no_notify)
+        assert rejected.value.status == 503
+        # The activation goes on for the requests that come next
+        assert "mobilenet" in ready.activations
+        node_port.ready = True
+        await ready.ensure_ready("10.0.0.1", 30101, "mobilenet", time.time() + 1, no_notify)
+
+    asyncio.run(run())
+    assert ready.waiting["mobilenet"] == 0
+
+
+def test_activation_gives_up_after_its_timeout(node_port):
+    ready = Activator(ttl=60, poll_interval=0.01, timeout=0.05)
+
+    async def run():
+        with pytest.raises(AdmissionRejected):
+            await ready.ensure_ready("10.0.0.1", 30101, "mobilenet", time.time() + 5, no_notify)
+
+    started = time.monotonic()
+    asyncio.run(run())
+    assert time.monotonic() - started < 1
+    assert ready.activations == {}
+
+
+def test_requests_beyond_the_queue_are_rejected(node_port):
+    ready = Activator(ttl=60, poll_interval=0.01, queue_size=2)
+
+    async def run():
+        waiting = [
+            asyncio.ensure_future(ready.ensure_ready("10.0.0.1", 30101, "mobilenet", time.time() + 5, no_notify))
+            for _ in range(2)
+        ]
+        await asyncio.sleep(0.02)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await ready.ensure_ready("10.0.0.1", 30101, "mobilenet", time.time() + 5, no_notify)
+        assert rejected.value.status == 503
+        node_port.ready = True
+        await asyncio.wait_for(asyncio.gather(*waiting), 1)
+
+    asyncio.run(run())
@@ -0,0 +1,79 @@
+import asyncio
+import time
+
+import pytest
+
+from admission import DECREASE_FACTOR, AdmissionController, AdmissionRejected
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def controller(limit=10, **kwargs):
+    controller = AdmissionController(limit=limit, **kwargs)
+    controller.clock = Clock()
+    return controller
+
+
+def complete(controller, latency, ok=True):
+    controller.in_flight += 1
+    return controller.release(latency, ok)
+
+
+def test_limit_grows_by_one_per_limit_fast_requests():
+    admission = controller(limit=10)
+    for _ in range(10):
+        assert not complete(admission, 0.1)
+    assert admission.limit == pytest.approx(11, abs=0.05)
+
+
+def test_burst_of_slow_requests_decreases_the_limit_once():
+    admission = controller(limit=10)
+    complete(admission, 0.1)
+    admission.clock.now += 1
+    # Twenty requests that were in flight together all come back slow
+    congested = [complete(admission, 0.5) for _ in range(20)]
+    assert all(congested)
+    limit = (10 + 1 / 10) * DECREASE_FACTOR
+    assert admission.limit == pytest.approx(limit)
+
+    # A slow request started after the decrease shows the limit is still too high
+    admission.clock.now += 1
+    assert complete(admission, 0.5)
+    assert admission.limit == pytest.approx(limit * DECREASE_FACTOR)
+
+    # One started before that decrease does not cut the limit again
+    admission.clock.now += 0.2
+    assert complete(admission, 0.5)
+    assert admission.limit == pytest.approx(limit * DECREASE_FACTOR)
+
+
+def test_errors_decrease_once_per_round_trip_down_to_the_minimum():
+    admission = controller(limit=4, min_limit=2)
+    for _ in range(10):
+        admission.clock.now += 1
+        assert complete(admission, 0.05, ok=False)
+    assert admission.limit == 2
+    assert admission.latency is None
+
+
+def test_queue_is_woken_when_a_slot_frees():
+    async def run():
+        admission = AdmissionController(limit=1, queue_size=1)
+        deadline = time.time() + 5
+        await admission.acquire(deadline)
+        waiting = asyncio.ensure_future(admission.acquire(deadline))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await admission.acquire(deadline)
+        assert rejected.value.status == 503
+        admission.release(0.01)
+        await asyncio.wait_for(waiting, 1)
+        assert admission.in_flight == 1
+
+    asyncio.run(run())
@@ -0,0 +1,72 @@
+import json
+
+from auto_scaler import auto_scaler as auto_scaler_module
+from auto_scaler.auto_scaler import AutoScaler
+from auto_scaler.instrumentation import INPUT_AGE
+
+
+class FakeResponse:
+    def __init__(self, body):
+        self.text = json.dumps(body)
+
+
+def test_batch_metrics_resolve_dashed_labels_through_the_catalog(monkeypatch, dashed_catalog):
+    monkeypatch.setattr(AutoScaler, "CATALOG", dashed_catalog)
+    pods = {"mobile-net-edge-west-1-0": {"cpu": 10.0}}
+    body = {"pairs": {
+        "mobile-net-edge-west-1": {"pod_instances": pods, "snapshot_age": 0.5},
+        "unknown-label": {"pod_instances": {}}
+    }}
+    monkeypatch.setattr(auto_scaler_module.requests, "post", lambda *args, **kwargs: FakeResponse(body))
+
+    metrics = AutoScaler.get_batch_metrics([])
+    assert metrics["mobile-net-edge-west-1"] == pods
+    assert INPUT_AGE.labels("edge-west-1", "mobile-net", "pod_metrics")._value.get() == 0.5
+
+
+def test_simulator_resolves_dashed_labels_through_the_catalog(monkeypatch, dashed_catalog):
+    from auto_scaler import simulator
+
+    monkeypatch.setattr(AutoScaler, "CATALOG", dashed_catalog)
+    monkeypatch.setattr(simulator, "edge_servers", list(dashed_catalog.nodes))
+    monkeypatch.setattr(simulator, "application_types", list(dashed_catalog.app_types))
+    monkeypatch.setitem(simulator.APP_PROFILES, "mobile-net", simulator.APP_PROFILES["mobilenet"])
+    trace = simulator.synthetic_trace("step", 60, 1.0)
+    assert list(trace) == ["mobile-net-edge-west-1"]
+
+    sim = simulator.Simulator(trace, tick_interval=15)
+    sim.advance(0)
+    assert sim.replica_seconds["mobile-net-edge-west-1"] == 1.0
+    assert sim.node_resource("edge-west-1")["cpu_util"] > 0
+
+
+class TimeoutCheckingCluster:
+    """
+    Wrapper of the fake cluster recording the Kubernetes calls made without a request timeout
+    """
+
+    def __init__(self, cluster):
+        self.cluster = cluster
+        self.without_timeout = []
+
+    def __getattr__(self, name):
+        method = getattr(self.cluster, name)
+
+        def call(*args, **kwargs):
+            if kwargs.get("_request_timeout") is None:
+                self.without_timeout.append(name)
+            return method(*args, **kwargs)
+        return call
+
+
+def test_every_kubernetes_call_has_a_request_timeout():
+    from auto_scaler.simulator import FakeCluster, VirtualClock
+
+    cluster = TimeoutCheckingCluster(FakeCluster(VirtualClock(), {}))
+    auto_scaler = AutoScaler("edge1", "mobilenet", api_clients=(None, cluster, cluster))
+    auto_scaler.create_deployment_and_service(1)
+    auto_scaler.update_deployment(2)
+    auto_scaler.delete_deployment()
+    assert cluster.cluster.calls["read_namespaced_deployment_scale"] == 1
+    assert cluster.cluster.calls["delete_namespaced_service"] == 1
+    assert cluster.without_timeout == []
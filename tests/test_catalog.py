@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+from catalog import MANAGED_LABELS, PREPULL_NAME, Catalog, load_catalog
+
+
+def test_catalog_builds_a_spec_per_pair():
+    catalog = load_catalog()
+    assert catalog.nodes == ("edge1", "edge2", "edge3")
+    assert len(catalog.specs) == len(catalog.nodes) * len(catalog.app_types)
+    spec = catalog.spec("edge2", "squeezenet")
+    assert spec.app == "squeezenet-edge2"
+    assert spec.name == "squeezenet-deployment-edge2"
+    assert spec.service == "squeezenet-lb-edge2"
+    assert spec.node_port == 30202
+    assert spec.node_ip == "10.0.0.2"
+    assert catalog.node_ip("edge3") == "10.0.0.3"
+    assert catalog.by_label("squeezenet-edge2") is spec
+    assert catalog.by_label("squeezenet") is None
+    with pytest.raises(KeyError):
+        catalog.spec("edge9", "squeezenet")
+
+
+def test_load_catalog_reads_a_file_once():
+    assert load_catalog() is load_catalog()
+
+
+def test_node_ports_and_ips_can_be_set_per_node(tmp_path):
+    path = tmp_path / "catalog.json"
+    path.write_text(json.dumps({
+        "names": {"label": "{app}-{node}", "deployment": "{app}-{node}", "service": "{app}-lb-{node}"},
+        "nodes": {"a": {"ip": "192.168.0.1", "index": 1, "node_ports": {"resnet": 31000}}},
+        "apps": {"resnet": {
+            "image": "example/resnet:v1", "port": 8080, "node_port_base": 30100,
+            "target_cpu": 100, "cpu_request": 250
+        }}
+    }))
+    catalog = Catalog(str(path))
+    spec = catalog.spec("a", "resnet")
+    assert spec.node_port == 31000
+    assert catalog.node_ip("a") == "192.168.0.1"
+    assert spec.cpu_request == 250
+
+
+def test_deployment_manifest_is_pinned_to_the_node():
+    catalog = load_catalog()
+    spec = catalog.spec("edge1", "mobilenet")
+    manifest = Catalog.deployment(spec, 3)
+    assert manifest["metadata"] == {"name": spec.name, "labels": MANAGED_LABELS}
+    assert manifest["spec"]["replicas"] == 3
+    assert manifest["spec"]["selector"]["matchLabels"] == {"app": spec.app}
+    pod = manifest["spec"]["template"]
+    assert pod["metadata"]["labels"] == {"app": spec.app}
+    assert pod["spec"]["nodeName"] == "edge1"
+    container = pod["spec"]["containers"][0]
+    assert container["image"] == spec.image
+    assert container["resources"]["requests"]["cpu"] == "200m"
+
+
+def test_manifests_are_copies_of_the_templates():
+    catalog = load_catalog()
+    spec = catalog.spec("edge1", "mobilenet")
+    Catalog.deployment(spec, 5)["metadata"]["labels"]["extra"] = "1"
+    assert spec.deployment_template["spec"]["replicas"] == 1
+    assert spec.deployment_template["metadata"]["labels"] == MANAGED_LABELS
+    Catalog.service(spec)["spec"]["ports"].clear()
+    assert spec.service_template["spec"]["ports"]
+
+
+def test_service_manifest_exposes_the_node_port():
+    spec = load_catalog().spec("edge3", "binaryalert")
+    manifest = Catalog.service(spec)
+    assert manifest["metadata"]["name"] == spec.service
+    assert manifest["spec"]["selector"] == {"app": spec.app}
+    assert manifest["spec"]["ports"] == [{"port": 8080, "targetPort": 8080, "nodePort": 30403}]
+
+
+def test_prepull_pulls_every_image_on_every_node():
+    catalog = load_catalog()
+    manifest = catalog.prepull()
+    assert manifest["kind"] == "DaemonSet"
+    assert manifest["metadata"]["name"] == PREPULL_NAME
+    pod = manifest["spec"]["template"]["spec"]
+    terms = pod["affinity"]["nodeAffinity"]["requiredDuringSchedulingIgnoredDuringExecution"]["nodeSelectorTerms"]
+    assert terms[0]["matchExpressions"][0]["values"] == list(catalog.nodes)
+    images = [container["image"] for container in pod["initContainers"]]
+    assert sorted(images) == sorted({spec.image for spec in catalog.specs.values()})
+    assert "app" not in manifest["spec"]["template"]["metadata"]["labels"]
@@ -0,0 +1,61 @@
+from auto_scaler.coordinator import NodeCoordinator
+
+RESOURCE = {"cpu_util": 50.0, "available_mem": 70.0, "cpu_count": 4, "mem_total": 4000}
+
+
+def demand(target, priority=1.0, cpu_cost=200.0, mem_cost=100.0):
+    return {"target": target, "priority": priority, "cpu_cost": cpu_cost, "mem_cost": mem_cost, "reason": "cpu"}
+
+
+def test_scale_downs_are_always_granted(make_auto_scaler):
+    mobilenet = make_auto_scaler(app="mobilenet", scale=4)
+    coordinator = NodeCoordinator("edge1", [mobilenet])
+    assert coordinator.allocate(None, {mobilenet: demand(2)}) == {mobilenet: 2}
+
+
+def test_no_scale_up_without_resources_or_headroom(make_auto_scaler):
+    mobilenet = make_auto_scaler(app="mobilenet", scale=1)
+    coordinator = NodeCoordinator("edge1", [mobilenet])
+    assert coordinator.allocate(None, {mobilenet: demand(3)}) == {mobilenet: 1}
+    over = dict(RESOURCE, cpu_util=95.0)
+    assert coordinator.allocate(over, {mobilenet: demand(3)}) == {mobilenet: 1}
+
+
+def test_headroom_goes_to_the_highest_priority_per_cost(make_auto_scaler):
+    mobilenet = make_auto_scaler(app="mobilenet", scale=1)
+    squeezenet = make_auto_scaler(app="squeezenet", scale=1)
+    coordinator = NodeCoordinator("edge1", [mobilenet, squeezenet])
+    # 40% of CPU headroom under the 90% threshold; a replica of 400 millicores costs 10% of 4 cores
+    resource = dict(RESOURCE, cpu_util=70.0)
+    targets = coordinator.allocate(resource, {
+        mobilenet: demand(5, priority=3.0, cpu_cost=400.0),
+        squeezenet: demand(5, priority=1.0, cpu_cost=400.0)
+    })
+    assert targets[mobilenet] + targets[squeezenet] == 2 + 2
+    assert targets[mobilenet] > targets[squeezenet] >= 1
+
+
+def test_released_replicas_fund_scale_ups(make_auto_scaler):
+    mobilenet = make_auto_scaler(app="mobilenet", scale=1)
+    squeezenet = make_auto_scaler(app="squeezenet", scale=3)
+    coordinator = NodeCoordinator("edge1", [mobilenet, squeezenet])
+    resource = dict(RESOURCE, cpu_util=85.0)
+    targets = coordinator.allocate(resource, {
+        mobilenet: demand(3, cpu_cost=400.0),
+        squeezenet: demand(1, cpu_cost=400.0)
+    })
+    # 5% headroom plus the 2 x 10% released by squeezenet fit two more mobilenet replicas
+    assert targets == {mobilenet: 3, squeezenet: 1}
+
+
+def test_watch_and_scale_applies_only_selected_apps(make_auto_scaler, monkeypatch):
+    mobilenet = make_auto_scaler(app="mobilenet", scale=1)
+    squeezenet = make_auto_scaler(app="squeezenet", scale=1)
+    coordinator = NodeCoordinator("edge1", [mobilenet, squeezenet])
+    evaluated = []
+    for auto_scaler in (mobilenet, squeezenet):
+        monkeypatch.setattr(auto_scaler, "evaluate", lambda metrics, a=auto_scaler: evaluated.append(a.app_type) or demand(2))
+        monkeypatch.setattr(auto_scaler, "get_node_resource", lambda: RESOURCE)
+    coordinator.watch_and_scale({}, {"squeezenet"})
+    assert evaluated == ["squeezenet"]
+    assert (mobilenet.scale, squeezenet.scale) == (1, 2)
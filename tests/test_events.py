@@ -0,0 +1,28 @@
+from auto_scaler.events import ACTIVATION, AdaptiveInterval, EventTrigger
+
+
+def test_interval_shrinks_on_scale_changes_and_grows_while_steady():
+    interval = AdaptiveInterval(initial=15, minimum=5, maximum=30)
+    assert interval.update(True) == 7.5
+    assert interval.update(True) == 5
+    assert interval.update(False) == 6.25
+
+
+def test_interval_shrinks_when_the_load_moves():
+    interval = AdaptiveInterval(initial=16, minimum=5, maximum=30)
+    assert interval.update(False, {"mobilenet-edge1": 400.0, "squeezenet-edge1": 20.0}) == 20
+    # Within a quarter of the previous load, or of min_load for nearly idle pairs, is steady
+    assert interval.update(False, {"mobilenet-edge1": 480.0, "squeezenet-edge1": 40.0}) == 25
+    assert interval.update(False, {"mobilenet-edge1": 700.0, "squeezenet-edge1": 40.0}) == 12.5
+    # A pair seen for the first time has no change yet
+    assert interval.update(False, {"mobilenet-edge1": 700.0, "shufflenet-edge1": 900.0}) == 15.625
+
+
+def test_trigger_debounces_events_but_not_activations():
+    trigger = EventTrigger(debounce=60)
+    assert trigger.push("edge1", "mobilenet", "congestion")
+    assert not trigger.push("edge1", "mobilenet", "congestion")
+    assert trigger.push("edge1", "mobilenet", ACTIVATION)
+    assert trigger.push("edge1", None, "resources back under the thresholds")
+    assert trigger.wait(0) == {("edge1", "mobilenet"): ACTIVATION, ("edge1", None): "resources back under the thresholds"}
+    assert trigger.wait(0) == {}
@@ -0,0 +1,79 @@
+import os
+
+import pytest
+
+import scraper
+from conftest import DATA
+from exposition import layouts, parse
+
+
+@pytest.fixture
+def exposition_text():
+    # Exposition of an application pod with the application gauges among the runtime metrics
+    with open(os.path.join(DATA, "app_exposition.txt")) as f:
+        return f.read()
+
+
+def test_parse_looks_up_samples_by_name_and_labels(exposition_text):
+    exposition = parse(exposition_text)
+    assert exposition.get("response_time") == 0.412
+    assert exposition.get('python_gc_collections_total{generation="1"}') == 8.0
+    assert exposition.get("missing_metric", -1) == -1
+
+
+def test_counter_found_without_total_suffix(exposition_text):
+    assert parse(exposition_text).get("request_count") == 5821.0
+
+
+def test_labels_are_canonical_regardless_of_order():
+    exposition = parse('latency{quantile="0.9",app="x"} 1.5\n')
+    assert exposition.get('latency{app="x",quantile="0.9"}') == 1.5
+    assert exposition.get('latency{quantile="0.9", app="x"}') == 1.5
+
+
+def test_cached_layout_gives_same_samples(exposition_text):
+    layouts.clear()
+    first = parse(exposition_text, "image:v1")
+    second = parse(exposition_text.replace("0.412", "0.5"), "image:v1")
+    assert "image:v1" in layouts
+    assert first.get("response_time") == 0.412
+    assert second.get("response_time") == 0.5
+
+
+def test_histogram_quantile_interpolates_between_buckets(exposition_text):
+    exposition = parse(exposition_text)
+    # 5821 samples: the median rank 2910.5 falls into the (0.25, 0.5] bucket holding 2000..4400
+    assert exposition.histogram_quantile("response_time_seconds", 0.5) == pytest.approx(0.25 + 0.25 * 910.5 / 2400)
+    assert exposition.histogram_quantile("response_time_seconds", 0.05) == pytest.approx(0.1 * 291.05 / 400)
+
+
+def test_histogram_quantile_in_inf_bucket_returns_highest_bound():
+    text = 'h_bucket{le="1.0"} 1.0\nh_bucket{le="+Inf"} 10.0\n'
+    assert parse(text).histogram_quantile("h", 0.99) == 1.0
+    assert parse("").histogram_quantile("h", 0.5, default=-1) == -1
+
+
+def test_parse_app_metrics_by_name(exposition_text):
+    metrics = scraper.parse_app_metrics(exposition_text, "image:v1")
+    assert metrics == {
+        "req_count": 5821.0, "res_time": 0.412, "p10_res_time": 0.201, "p50_res_time": 0.388,
+        "p90_res_time": 0.647, "p50_all_res_times": 0.395, "p90_all_res_times": 0.702
+    }
+
+
+def test_parse_app_metrics_does_not_read_renamed_metrics_by_position(exposition_text, caplog):
+    renamed = exposition_text.replace("p90_response_time", "latency_p90")
+    assert scraper.parse_app_metrics(renamed, "renamed:v1") is None
+    assert "p90_response_time" in caplog.text
+
+
+def test_parse_app_metrics_image_override(exposition_text, monkeypatch):
+    renamed = exposition_text.replace("p90_response_time", "latency_p90")
+    monkeypatch.setitem(scraper.IMAGE_METRIC_SELECTORS, "override:v1", {"p90_res_time": {"name": "latency_p90"}})
+    assert scraper.parse_app_metrics(renamed, "override:v1")["p90_res_time"] == 0.647
+
+
+def test_parse_app_metrics_missing_field(exposition_text):
+    lines = exposition_text.splitlines()
+    truncated = "\n".join(line for line in lines[:60] if not line.startswith("p90_response_time"))
+    assert scraper.parse_app_metrics(truncated, "truncated:v1") is None
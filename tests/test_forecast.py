@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from auto_scaler.forecast import Forecaster
+
+
+def test_short_history_repeats_the_last_value():
+    forecaster = Forecaster(series=2)
+    assert forecaster.predict().tolist() == [0.0, 0.0]
+    forecaster.update([5.0, 100.0])
+    assert forecaster.predict().tolist() == [5.0, 100.0]
+
+
+def test_linear_trend_is_extrapolated_horizon_ahead():
+    forecaster = Forecaster(series=1, history=20, horizon=3)
+    for step in range(20):
+        forecaster.update([10.0 + 2.0 * step])
+    # The last value is 48; three samples ahead on the same trend is 54
+    assert forecaster.forecast_all()["linear"][0] == pytest.approx(54.0)
+    assert forecaster.predict()[0] == pytest.approx(54.0, rel=0.05)
+
+
+def test_window_is_chronological_after_wrapping():
+    forecaster = Forecaster(series=1, history=4)
+    for value in range(7):
+        forecaster.update([float(value)])
+    assert forecaster.window().tolist() == [[3.0, 4.0, 5.0, 6.0]]
+
+
+def test_best_model_is_chosen_per_series():
+    forecaster = Forecaster(series=2, history=30, horizon=2)
+    rng = np.random.default_rng(1)
+    for step in range(60):
+        # A steady noisy series and a growing one
+        forecaster.update([50.0 + rng.normal(0, 1), 5.0 * step])
+    errors = forecaster.errors()
+    assert errors["linear"]["mae"][1] < errors["ewma"]["mae"][1]
+    assert forecaster.predict()[1] == pytest.approx(5.0 * 61, rel=0.05)
+
+
+def test_forecasts_are_never_negative():
+    forecaster = Forecaster(series=1, history=10, horizon=5)
+    for value in (50.0, 40.0, 30.0, 20.0, 10.0, 0.0):
+        forecaster.update([value])
+    assert all(forecast[0] >= 0 for forecast in forecaster.forecast_all().values())
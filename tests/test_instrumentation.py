@@ -0,0 +1,27 @@
+import os
+import signal
+import time
+
+from auto_scaler.instrumentation import SamplingProfiler
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_sigusr1_toggles_the_profiler_outside_the_handler(tmp_path):
+    path = str(tmp_path / "profile.folded")
+    profiler = SamplingProfiler(interval=0.001, path=path, idle_interval=0.01).start()
+    previous = signal.signal(signal.SIGUSR1, profiler.toggle)
+    try:
+        os.kill(os.getpid(), signal.SIGUSR1)
+        wait_for(lambda: profiler.stacks)
+        assert not os.path.exists(path)
+
+        os.kill(os.getpid(), signal.SIGUSR1)
+        wait_for(lambda: os.path.exists(path) and "test_sigusr1_toggles" in open(path).read())
+    finally:
+        signal.signal(signal.SIGUSR1, previous)
@@ -0,0 +1,50 @@
+import json
+
+from load_view import LoadView
+from topology import Topology
+
+
+def batch(label, *pods):
+    return {"pairs": {label: {"pod_instances": {
+        f"{label}-{index}": {"res_time": res_time, "cpu": cpu} for index, (res_time, cpu) in enumerate(pods)
+    }}}}
+
+
+def test_refresh_asks_for_every_catalog_pair():
+    topology = Topology()
+    view = LoadView(topology, mode="least_latency", collector_url="http://collector/metrics/batch")
+    pairs = json.loads(view.request)["pairs"]
+    assert len(pairs) == len(topology.catalog.specs)
+    assert {(pair["node"], pair["app"]) for pair in pairs} == set(topology.catalog.specs)
+
+
+def test_update_maps_labels_through_the_catalog():
+    topology = Topology()
+    view = LoadView(topology, mode="least_latency", collector_url="http://collector/metrics/batch")
+    label = topology.catalog.spec("edge1", "mobilenet").app
+    view.update(batch(label, (0.1, 100), (0.3, 60)))
+    assert view.pairs[("edge1", "mobilenet")] == {"pods": 2, "latency_ms": 200.0, "utilization": 0.4}
+    assert view.score("edge1", "edge1", "mobilenet") == 280.0
+
+
+def test_saturated_or_empty_pairs_are_not_scored():
+    topology = Topology()
+    view = LoadView(topology, mode="least_latency", collector_url="http://collector/metrics/batch")
+    view.update(batch(topology.catalog.spec("edge1", "mobilenet").app, (0.1, 190)))
+    assert view.score("edge1", "edge1", "mobilenet") is None
+    view.update({"pairs": {topology.catalog.spec("edge2", "mobilenet").app: {"pod_instances": {}}, "unknown": {}}})
+    assert view.pairs == {("edge2", "mobilenet"): {"pods": 0, "latency_ms": None, "utilization": None}}
+    assert view.score("edge1", "edge2", "mobilenet") is None
+
+
+def test_utilization_is_relative_to_the_cpu_request(tmp_path, dashed_catalog):
+    path = tmp_path / "topology.json"
+    path.write_text(json.dumps({"links": []}))
+    topology = Topology(str(path), catalog=dashed_catalog)
+    spec = dashed_catalog.spec("edge-west-1", "mobile-net")
+    spec = spec._replace(cpu_request=400)
+    dashed_catalog.specs[(spec.node, spec.app_type)] = spec
+    dashed_catalog.labels[spec.app] = spec
+    view = LoadView(topology, mode="least_latency", collector_url="http://collector/metrics/batch")
+    view.update(batch(spec.app, (0.1, 100), (0.3, 60)))
+    assert view.pairs[("edge-west-1", "mobile-net")]["utilization"] == 0.2
@@ -0,0 +1,77 @@
+import json
+
+from kubernetes import client
+from kubernetes.watch import Watch
+
+from pod_index import PodIndex
+
+
+def pod(name, app, ready=True, ip="10.244.1.5", resource_version="100"):
+    return client.V1Pod(
+        metadata=client.V1ObjectMeta(name=name, labels={"app": app}, resource_version=resource_version),
+        status=client.V1PodStatus(
+            phase="Running", pod_ip=ip,
+            conditions=[client.V1PodCondition(type="Ready", status="True" if ready else "False")]
+        )
+    )
+
+
+def event(event_type, obj):
+    return {"type": event_type, "object": obj, "raw_object": client.ApiClient().sanitize_for_serialization(obj)}
+
+
+class FakeCoreV1:
+    def __init__(self, pods, resource_version="1"):
+        self.pods = pods
+        self.resource_version = resource_version
+
+    def list_namespaced_pod(self, namespace, label_selector, **kwargs):
+        return client.V1PodList(items=self.pods, metadata=client.V1ListMeta(resource_version=self.resource_version))
+
+
+def test_relist_indexes_ready_pods_only():
+    index = PodIndex(FakeCoreV1([
+        pod("a-1", "mobilenet-edge1", ip="10.0.0.1"), pod("a-2", "mobilenet-edge1", ready=False),
+        pod("b-1", "squeezenet-edge2", ip="10.0.0.3")
+    ], resource_version="42"))
+    index.relist()
+    assert index.all_ready_pods() == {"mobilenet-edge1": {"a-1": "10.0.0.1"}, "squeezenet-edge2": {"b-1": "10.0.0.3"}}
+    assert index.resource_version == "42"
+
+
+def test_events_add_update_and_remove_pods():
+    index = PodIndex(FakeCoreV1([]))
+    index.relist()
+    index.apply(event("ADDED", pod("a-1", "mobilenet-edge1", ip="10.0.0.1", resource_version="101")))
+    index.apply(event("ADDED", pod("a-2", "mobilenet-edge1", ip="10.0.0.2", resource_version="102")))
+    assert index.ready_pods("mobilenet-edge1") == {"a-1": "10.0.0.1", "a-2": "10.0.0.2"}
+
+    index.apply(event("MODIFIED", pod("a-1", "mobilenet-edge1", ready=False, resource_version="103")))
+    index.apply(event("DELETED", pod("a-2", "mobilenet-edge1", resource_version="104")))
+    assert index.all_ready_pods() == {}
+    assert index.resource_version == "104"
+
+
+def test_bookmark_only_advances_the_resource_version():
+    index = PodIndex(FakeCoreV1([pod("a-1", "mobilenet-edge1", ip="10.0.0.1")]))
+    index.relist()
+    # As the watch of the kubernetes client yields it: the object stays a plain dict
+    line = json.dumps({"type": "BOOKMARK", "object": {"kind": "Pod", "apiVersion": "v1", "metadata": {"resourceVersion": "555"}}})
+    bookmark = Watch().unmarshal_event(line, "V1Pod")
+    assert isinstance(bookmark["object"], dict)
+
+    index.apply(bookmark)
+    assert index.resource_version == "555"
+    assert index.ready_pods("mobilenet-edge1") == {"a-1": "10.0.0.1"}
+
+
+def test_follow_survives_bookmarks(monkeypatch):
+    index = PodIndex(FakeCoreV1([]))
+    index.relist()
+    bookmark = {"type": "BOOKMARK", "object": {"metadata": {"resourceVersion": "7"}},
+                "raw_object": {"metadata": {"resourceVersion": "7"}}}
+    events = [bookmark, event("ADDED", pod("a-1", "mobilenet-edge1", ip="10.0.0.1", resource_version="8")), bookmark]
+    monkeypatch.setattr(Watch, "stream", lambda self, func, **kwargs: iter(events))
+    index.follow()
+    assert index.ready_pods("mobilenet-edge1") == {"a-1": "10.0.0.1"}
+    assert index.resource_version == "7"
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from auto_scaler.pod_stats import PodStatsStore
+
+
+def test_ring_buffer_keeps_the_last_window_samples():
+    store = PodStatsStore(fields=("cpu",), max_pods=2, window=3)
+    for step in range(5):
+        store.update({"a": {"cpu": 10.0 * step}}, float(step))
+    # Samples 0 and 10 were overwritten by the wrap
+    assert store.means("cpu") == {"a": pytest.approx(30.0)}
+    assert store.percentiles("cpu", (0, 100))["a"].tolist() == [20.0, 40.0]
+    # 20 -> 40 from t=2 to t=4, across the wrap of the buffer
+    assert store.rates("cpu") == {"a": pytest.approx(10.0)}
+
+
+def test_rate_before_the_buffer_wraps():
+    store = PodStatsStore(fields=("req_count",), window=10)
+    store.update({"a": {"req_count": 100.0}}, 0.0)
+    assert store.rates("req_count") == {"a": 0.0}
+    store.update({"a": {"req_count": 130.0}}, 15.0)
+    assert store.rates("req_count") == {"a": pytest.approx(2.0)}
+
+
+def test_missing_pods_are_evicted_and_their_slot_reused():
+    store = PodStatsStore(fields=("cpu",), max_pods=2, window=4)
+    store.update({"a": {"cpu": 1.0}, "b": {"cpu": 2.0}}, 0.0)
+    store.update({"b": {"cpu": 4.0}, "c": {"cpu": 100.0}}, 1.0)
+    assert len(store) == 2
+    assert set(store.means("cpu")) == {"b", "c"}
+    # c took the slot of a without inheriting its samples
+    assert store.means("cpu")["c"] == 100.0
+    assert store.means("cpu")["b"] == pytest.approx(3.0)
+
+
+def test_pods_beyond_the_capacity_are_skipped():
+    store = PodStatsStore(fields=("cpu",), max_pods=1, window=2)
+    store.update({"a": {"cpu": 1.0}, "b": {"cpu": 2.0}}, 0.0)
+    assert len(store) == 1
+    store.update({}, 1.0)
+    assert len(store) == 0 and store.means("cpu") == {}
+
+
+def test_missing_fields_are_nan():
+    store = PodStatsStore(fields=("cpu", "mem"), window=2)
+    store.update({"a": {"cpu": 1.0}}, 0.0)
+    assert np.isnan(store.means("mem")["a"])
+    assert np.isnan(store.percentiles("mem", (90,))["a"][0])
+
+
+def test_evaluate_costs_a_replica_at_the_p90_usage_of_the_window(make_auto_scaler):
+    auto_scaler = make_auto_scaler(scale=2)
+    metrics = {"p90_res_time": 0.2, "res_time": 0.1, "p10_res_time": 0.05, "p50_res_time": 0.1}
+    for cpu in (100.0, 300.0, 200.0):
+        demand = auto_scaler.evaluate({
+            "pod-a": dict(metrics, cpu=cpu, mem=50.0), "pod-b": dict(metrics, cpu=cpu, mem=70.0)
+        })
+        make_auto_scaler.clock.now += 15
+    assert len(auto_scaler.pod_stats) == 2
+    assert demand["cpu_cost"] == pytest.approx(np.percentile([100.0, 300.0, 200.0], 90))
+    assert demand["mem_cost"] == pytest.approx(60.0)
@@ -0,0 +1,84 @@
+import pytest
+
+from auto_scaler.auto_scaler import AutoScaler
+from auto_scaler.policies import (CpuTargetPolicy, HybridPolicy, LatencySloPolicy, LegacyPolicy, build_policy,
+                                  load_policy_config)
+
+
+def test_policy_config_holds_no_cpu_target_or_slo():
+    for app_config in load_policy_config().values():
+        assert "target_cpu" not in app_config
+        assert "slo_p90_ms" not in app_config
+
+
+def test_cpu_target_comes_from_the_catalog(make_auto_scaler):
+    auto_scaler = make_auto_scaler(app="binaryalert")
+    assert auto_scaler.desired_cpu_avg == auto_scaler.spec.target_cpu
+    assert auto_scaler.policy.target_cpu == auto_scaler.spec.target_cpu
+
+
+def test_slo_comes_from_the_catalog(make_auto_scaler, monkeypatch):
+    monkeypatch.setattr(AutoScaler, "POLICY_CONFIG", {"binaryalert": {"policy": "latency"}})
+    auto_scaler = make_auto_scaler(app="binaryalert")
+    assert auto_scaler.slo_p90_ms == auto_scaler.spec.slo_p90_ms == 100
+    assert auto_scaler.policy.slo_p90_ms == 100
+
+
+def test_build_policy_keeps_the_configured_tuning():
+    policy = build_policy("mobilenet", {"mobilenet": {"policy": "hybrid", "tolerance": 0.2}}, 250, 400)
+    assert isinstance(policy, HybridPolicy)
+    assert policy.cpu.target_cpu == 250
+    assert policy.cpu.tolerance == 0.2
+    assert policy.latency.slo_p90_ms == 400
+
+
+def test_unconfigured_app_falls_back_to_legacy():
+    policy = build_policy("mobilenet", {}, 250)
+    assert isinstance(policy, LegacyPolicy)
+    assert policy.target_cpu == 250
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        build_policy("mobilenet", {"mobilenet": {"policy": "magic"}}, 250)
+
+
+def snapshot(pod_num=2, cpu=100.0, res_time=0.2, p10=0.1, p90=0.3):
+    return {
+        "pod_num": pod_num, "cpu": cpu, "mem": 50.0, "res_time": res_time,
+        "p10_res_time": p10, "p50_res_time": (p10 + p90) / 2, "p90_res_time": p90
+    }
+
+
+def test_cpu_policy_scales_in_proportion_to_the_target():
+    policy = CpuTargetPolicy(target_cpu=100, tolerance=0.1)
+    assert policy.recommend(snapshot(pod_num=2, cpu=250.0), 2) == (5, "cpu")
+    assert policy.recommend(snapshot(pod_num=4, cpu=40.0), 4) == (2, "cpu")
+    assert policy.recommend(snapshot(pod_num=2, cpu=108.0), 2) == (2, "steady")
+
+
+def test_latency_policy_scales_up_with_the_slo_violation_and_down_one_by_one():
+    policy = LatencySloPolicy(slo_p90_ms=200, low_ratio=0.75)
+    assert policy.recommend(snapshot(p90=0.25), 2) == (3, "latency")
+    assert policy.recommend(snapshot(p90=0.5), 4) == (10, "latency")
+    assert policy.recommend(snapshot(p90=0.1), 4) == (3, "latency")
+    assert policy.recommend(snapshot(p90=0.18), 4) == (4, "steady")
+
+
+def test_hybrid_policy_takes_the_larger_recommendation():
+    policy = HybridPolicy(target_cpu=100, slo_p90_ms=200)
+    # The CPU asks for 3 replicas and the latency for 6
+    assert policy.recommend(snapshot(pod_num=2, cpu=150.0, p90=0.6), 2) == (6, "latency")
+    # The CPU asks for 4 replicas while the latency is steady
+    assert policy.recommend(snapshot(pod_num=2, cpu=200.0, p90=0.18), 2) == (4, "cpu")
+    # Scaling down needs both: a low CPU alone keeps the scale under the latency SLO recommendation
+    assert policy.recommend(snapshot(pod_num=4, cpu=20.0, p90=0.18), 4) == (4, "steady")
+    assert policy.recommend(snapshot(pod_num=4, cpu=20.0, p90=0.05), 4) == (3, "latency")
+
+
+def test_legacy_policy_steps_up_on_latency_and_down_on_low_cpu():
+    policy = LegacyPolicy(target_cpu=100)
+    assert policy.recommend(snapshot(pod_num=2, cpu=100.0, res_time=0.4, p90=0.3), 2) == (3, "latency")
+    assert policy.recommend(snapshot(pod_num=2, cpu=300.0), 2) == (6, "cpu")
+    assert policy.recommend(snapshot(pod_num=4, cpu=20.0), 4) == (1, "cpu")
+    assert policy.recommend(snapshot(pod_num=2, cpu=100.0), 2) == (2, "steady")
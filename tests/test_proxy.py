@@ -0,0 +1,101 @@
+import asyncio
+import json
+import socket
+import time
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+import proxy
+
+TIMEOUT = aiohttp.ClientTimeout(total=5)
+
+
+class LocalTopology:
+    """
+    Topology in which this host serves every app on the port of the fake upstream
+    """
+
+    def __init__(self, port):
+        self.port = port
+
+    def maybe_reload(self):
+        pass
+
+    def ip(self, node):
+        return "127.0.0.1"
+
+    def node_port(self, node, app_type):
+        return self.port
+
+
+async def init(request):
+    return web.Response(text="ok")
+
+
+async def cut_after_headers(request):
+    response = web.StreamResponse()
+    await response.prepare(request)
+    await response.write(b"partial")
+    request.transport.close()
+    return response
+
+
+async def cut_before_headers(request):
+    request.transport.close()
+    return web.Response()
+
+
+async def serve_local(monkeypatch, run_handler):
+    upstream = web.Application()
+    upstream.router.add_post("/init", init)
+    upstream.router.add_post("/run", run_handler)
+    upstream_server = TestServer(upstream)
+    await upstream_server.start_server()
+
+    async def ready(*args):
+        pass
+
+    monkeypatch.setattr(proxy, "topology", LocalTopology(upstream_server.port))
+    monkeypatch.setattr(proxy.load_view, "select", lambda source, requested, app_type: requested)
+    monkeypatch.setattr(proxy.activator, "ensure_ready", ready)
+
+    app = web.Application()
+    app.cleanup_ctx.append(proxy.client_session)
+    app.router.add_post("/proxy", proxy.forward_request)
+    client = TestClient(TestServer(app))
+    await client.start_server()
+    body = json.dumps({"node": socket.gethostname(), "app": "mobilenet", "request_start": time.time()})
+    return client, upstream_server, body
+
+
+def test_failure_after_headers_cuts_the_connection(monkeypatch):
+    async def run():
+        client, upstream_server, body = await serve_local(monkeypatch, cut_after_headers)
+        try:
+            res = await client.post("/proxy", data=body, timeout=TIMEOUT)
+            # The status was sent before the failure, so the client sees a truncated body, not a 502
+            assert res.status == 200
+            with pytest.raises(aiohttp.ClientPayloadError):
+                await res.read()
+        finally:
+            await client.close()
+            await upstream_server.close()
+
+    asyncio.run(run())
+
+
+def test_failure_before_headers_answers_502(monkeypatch):
+    async def run():
+        client, upstream_server, body = await serve_local(monkeypatch, cut_before_headers)
+        try:
+            res = await client.post("/proxy", data=body, timeout=TIMEOUT)
+            assert res.status == 502
+            assert "failed" in await res.text()
+        finally:
+            await client.close()
+            await upstream_server.close()
+
+    asyncio.run(run())
@@ -0,0 +1,66 @@
+from collections import namedtuple
+
+import pytest
+
+import resource_monitor
+from resource_monitor import ResourceSampler
+
+VirtualMemory = namedtuple("VirtualMemory", ["available", "total"])
+MIB = 1024 * 1024
+
+
+class FakePsutil:
+    """
+    Hands out the given CPU utilizations and available memory in turn
+    """
+
+    def __init__(self, cpu, available_mib, total_mib=4096):
+        self.cpu = list(cpu)
+        self.available = list(available_mib)
+        self.total = total_mib
+
+    def cpu_percent(self, interval=None):
+        return self.cpu.pop(0)
+
+    def virtual_memory(self):
+        return VirtualMemory(self.available.pop(0) * MIB, self.total * MIB)
+
+    def cpu_count(self):
+        return 4
+
+
+def sampler(monkeypatch, cpu, available_mib, interval=1, window=3):
+    monkeypatch.setattr(resource_monitor, "psutil", FakePsutil(cpu, available_mib))
+    resource_sampler = ResourceSampler(interval=interval, window=window)
+    for _ in cpu:
+        resource_sampler.sample()
+    return resource_sampler
+
+
+def test_snapshot_holds_the_latest_sample_and_the_window_statistics(monkeypatch):
+    snapshot = sampler(monkeypatch, [10.0, 50.0, 30.0], [2048, 1024, 3072]).snapshot()
+    assert snapshot["cpu_util"] == 30.0
+    assert snapshot["available_mem"] == 75.0
+    assert snapshot["cpu_util_avg"] == pytest.approx(30.0)
+    assert snapshot["cpu_util_peak"] == 50.0
+    assert snapshot["available_mem_avg"] == pytest.approx(50.0)
+    assert snapshot["available_mem_min"] == 25.0
+    assert snapshot["cpu_count"] == 4 and snapshot["mem_total"] == 4096
+    assert snapshot["window"] == 3
+
+
+def test_samples_older_than_the_window_are_dropped(monkeypatch):
+    snapshot = sampler(monkeypatch, [90.0, 10.0, 20.0, 30.0], [512, 2048, 2048, 2048], interval=0.5, window=1.5).snapshot()
+    # Three samples fit the window, so the peak of 90% and the minimum of 12.5% have left it
+    assert snapshot["cpu_util_peak"] == 30.0
+    assert snapshot["cpu_util_avg"] == pytest.approx(20.0)
+    assert snapshot["available_mem_min"] == 50.0
+    assert snapshot["window"] == 1.5
+
+
+def test_pusher_only_pushes_under_a_catalog_node_name(monkeypatch):
+    resource_sampler = sampler(monkeypatch, [10.0], [2048])
+    with pytest.raises(ValueError, match="NODE_NAME"):
+        resource_monitor.TelemetryPusher(resource_sampler, "127.0.0.1", node="edge1.cluster.local")
+    pusher = resource_monitor.TelemetryPusher(resource_sampler, "127.0.0.1", node="edge2")
+    assert pusher.node == "edge2"
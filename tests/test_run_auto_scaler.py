@@ -0,0 +1,70 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from auto_scaler import run_auto_scaler
+from auto_scaler.auto_scaler import AutoScaler
+from auto_scaler.coordinator import NodeCoordinator
+from auto_scaler.events import ACTIVATION, EventTrigger
+
+RESOURCE = {"cpu_util": 50.0, "available_mem": 70.0, "cpu_count": 4, "mem_total": 4000}
+
+
+@pytest.fixture
+def loop(make_auto_scaler, monkeypatch):
+    """
+    One node with one pair that steps up by one replica on every evaluation, and a metric
+    collector raising an SLO breach of the pair whenever its metrics are fetched
+    """
+    auto_scaler = make_auto_scaler(app="mobilenet", scale=2)
+    monkeypatch.setattr(auto_scaler, "get_node_resource", lambda: RESOURCE)
+    monkeypatch.setattr(auto_scaler, "evaluate", lambda metrics: {
+        "target": auto_scaler.scale + 1, "priority": 1.0, "cpu_cost": 100.0, "mem_cost": 10.0, "reason": "latency"
+    })
+    trigger = EventTrigger(debounce=60)
+
+    def get_batch_metrics(auto_scaler_list):
+        trigger.push("edge1", "mobilenet", "p90 over SLO")
+        return {}
+    monkeypatch.setattr(AutoScaler, "get_batch_metrics", staticmethod(get_batch_metrics))
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        yield {
+            "auto_scaler": auto_scaler,
+            "trigger": trigger,
+            "executor": executor,
+            "coordinators": [NodeCoordinator("edge1", [auto_scaler])],
+            "in_flight": {},
+            "auto_scalers": {("edge1", "mobilenet"): auto_scaler}
+        }
+
+
+def handle_events(loop):
+    return run_auto_scaler.handle_events(
+        loop["trigger"], loop["executor"], loop["coordinators"], loop["in_flight"], loop["auto_scalers"], 0
+    )
+
+
+def test_breach_raised_by_a_tick_scales_once(loop):
+    changed, _ = run_auto_scaler.run_tick(
+        loop["executor"], loop["coordinators"], loop["in_flight"], trigger=loop["trigger"]
+    )
+    assert changed
+    assert loop["auto_scaler"].scale == 3
+    assert handle_events(loop) is None
+    assert loop["auto_scaler"].scale == 3
+
+
+def test_breach_between_ticks_is_evaluated_once(loop):
+    loop["trigger"].push("edge1", "mobilenet", "congestion")
+    assert handle_events(loop)
+    assert loop["auto_scaler"].scale == 3
+    assert handle_events(loop) is None
+    assert loop["auto_scaler"].scale == 3
+
+
+def test_activation_is_not_dropped_after_a_tick(loop):
+    run_auto_scaler.run_tick(loop["executor"], loop["coordinators"], loop["in_flight"], trigger=loop["trigger"])
+    loop["trigger"].push("edge1", "mobilenet", ACTIVATION)
+    assert handle_events(loop)
+    assert loop["auto_scaler"].scale == 4
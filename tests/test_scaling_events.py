@@ -0,0 +1,42 @@
+import asyncio
+
+from scaling_events import ScalingEvents
+
+
+class FakeResponse:
+    status = 202
+
+    async def read(self):
+        return b""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+
+class FakeSession:
+    def __init__(self):
+        self.bodies = []
+
+    def post(self, url, data, timeout):
+        self.bodies.append(data)
+        return FakeResponse()
+
+
+def test_events_are_deduplicated_per_reason():
+    async def run():
+        session = FakeSession()
+        events = ScalingEvents("127.0.0.1", interval=60)
+        events.notify(session, "edge1", "mobilenet", "congestion")
+        events.notify(session, "edge1", "mobilenet", "congestion")
+        # An activation right after a congestion event is not held back
+        events.notify(session, "edge1", "mobilenet", "activation")
+        events.notify(session, "edge1", "mobilenet", "activation")
+        await asyncio.gather(*events.tasks)
+        return session.bodies
+
+    bodies = asyncio.run(run())
+    assert len(bodies) == 2
+    assert '"reason": "activation"' in bodies[1]
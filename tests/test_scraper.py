@@ -0,0 +1,66 @@
+import threading
+import time
+
+import requests
+
+import scraper
+
+
+class FakeResponse:
+    def __init__(self, status, text):
+        self.status_code = status
+        self.text = text
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error")
+
+
+class FakeSession:
+    """
+    Answers every address as configured: a delay before a text, an HTTP status or an exception
+    """
+
+    def __init__(self, answers, delay=0.0):
+        self.answers = answers
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.timeouts = []
+
+    def get(self, url, timeout):
+        with self.lock:
+            self.timeouts.append(timeout)
+        time.sleep(self.delay)
+        answer = self.answers[url.split("/")[2]]
+        if isinstance(answer, Exception):
+            raise answer
+        if isinstance(answer, int):
+            return FakeResponse(answer, "")
+        return FakeResponse(200, answer)
+
+
+def test_failing_pods_are_left_out(monkeypatch):
+    monkeypatch.setattr(scraper, "session", FakeSession({
+        "10.0.0.1:8080": "metrics of a",
+        "10.0.0.2:8080": requests.Timeout("read timed out"),
+        "10.0.0.3:8080": requests.ConnectionError("refused"),
+        "10.0.0.4:8080": 500,
+        "10.0.0.5:8080": "metrics of e"
+    }))
+    addresses = {name: f"10.0.0.{index}:8080" for index, name in enumerate("abcde", 1)}
+    assert scraper.scrape_pods(addresses, timeout=0.5) == {"a": "metrics of a", "e": "metrics of e"}
+    assert scraper.session.timeouts == [0.5] * 5
+
+
+def test_pods_are_scraped_in_parallel(monkeypatch):
+    addresses = {f"pod-{index}": f"10.0.1.{index}:8080" for index in range(8)}
+    monkeypatch.setattr(scraper, "session", FakeSession({address: "ok" for address in addresses.values()}, delay=0.2))
+    started = time.monotonic()
+    scraped = scraper.scrape_pods(addresses)
+    assert len(scraped) == 8
+    # One after another the eight pods would take 1.6 s
+    assert time.monotonic() - started < 0.8
+
+
+def test_no_pods_scrape_nothing():
+    assert scraper.scrape_pods({}) == {}
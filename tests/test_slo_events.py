@@ -0,0 +1,46 @@
+import json
+import threading
+
+from catalog import load_catalog
+from slo_events import SloEvents
+
+
+class FakeResponse:
+    status_code = 202
+
+
+class FakeHttp:
+    def __init__(self):
+        self.events = []
+        self.posted = threading.Event()
+
+    def post(self, url, data, timeout):
+        self.events.append(json.loads(data))
+        self.posted.set()
+        return FakeResponse()
+
+
+def pods(*p90s):
+    return {f"pod-{index}": {"p90_res_time": p90} for index, p90 in enumerate(p90s)}
+
+
+def test_p90_over_the_slo_posts_one_event_per_interval():
+    http = FakeHttp()
+    slo_events = SloEvents({"mobilenet": 400}, url="http://autoscaler/events", interval=60, http=http)
+    spec = load_catalog().spec("edge1", "mobilenet")
+    assert not slo_events.check(spec, pods(0.3, 0.45))
+    assert slo_events.check(spec, pods(0.5, 0.4))
+    assert not slo_events.check(spec, pods(0.9))
+    assert http.posted.wait(5)
+    assert http.events == [{"node": "edge1", "app": "mobilenet", "reason": "p90 450 ms over SLO 400 ms"}]
+
+
+def test_apps_without_slo_or_pods_are_skipped():
+    slo_events = SloEvents({"mobilenet": 400}, url="http://autoscaler/events", http=FakeHttp())
+    catalog = load_catalog()
+    assert not slo_events.check(catalog.spec("edge1", "squeezenet"), pods(5.0))
+    assert not slo_events.check(catalog.spec("edge1", "mobilenet"), {})
+
+
+def test_slos_are_read_from_the_catalog():
+    assert SloEvents(http=FakeHttp()).slos["mobilenet"] == 400
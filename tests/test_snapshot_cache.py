@@ -0,0 +1,83 @@
+import threading
+import time
+
+import pytest
+
+from snapshot_cache import SnapshotCache
+
+
+def test_fresh_snapshot_is_reused_until_ttl():
+    cache = SnapshotCache(ttl=0.2)
+    calls = []
+    collect = lambda: calls.append(1) or len(calls)
+    assert cache.get("a", collect)[0] == 1
+    value, age = cache.get("a", collect)
+    assert value == 1 and 0 <= age < 0.2
+    time.sleep(0.25)
+    assert cache.get("a", collect)[0] == 2
+    assert cache.peek("b") is None
+
+
+def test_concurrent_requests_share_one_collection():
+    cache = SnapshotCache(ttl=5)
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def collect():
+        calls.append(1)
+        started.set()
+        release.wait(2)
+        return "snapshot"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("a", collect)[0])) for _ in range(8)]
+    threads[0].start()
+    started.wait(2)
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(2)
+    assert len(calls) == 1
+    assert results == ["snapshot"] * 8
+
+
+def test_error_is_raised_to_all_waiters_and_not_cached():
+    cache = SnapshotCache(ttl=5)
+    release = threading.Event()
+
+    def failing():
+        release.wait(2)
+        raise RuntimeError("collection failed")
+
+    errors = []
+
+    def request():
+        try:
+            cache.get("a", failing)
+        except RuntimeError as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=request) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(2)
+    assert len(errors) == 3
+    assert cache.peek("a") is None
+    assert cache.get("a", lambda: "ok")[0] == "ok"
+
+
+def test_put_with_timestamp_and_lru_bound():
+    cache = SnapshotCache(ttl=10, max_size=2)
+    cache.put("a", 1, time.monotonic() - 4)
+    assert cache.peek("a")[1] == pytest.approx(4, abs=0.1)
+    cache.put("b", 2)
+    cache.peek("a")
+    cache.put("c", 3)
+    assert cache.peek("b") is None
+    assert cache.peek("a")[0] == 1 and cache.peek("c")[0] == 3
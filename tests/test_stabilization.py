@@ -0,0 +1,49 @@
+def apply_target(auto_scaler, recommendation):
+    target = auto_scaler.stabilize(recommendation)
+    if target != auto_scaler.scale:
+        auto_scaler.apply(target, "test")
+    return target
+
+
+def test_scale_up_is_bounded_by_the_rate_policies(make_auto_scaler):
+    # At most 4 pods or 100% of the scale per 15 s, whichever allows more
+    auto_scaler = make_auto_scaler(scale=2)
+    assert apply_target(auto_scaler, 20) == 6
+    make_auto_scaler.clock.now += 5
+    assert apply_target(auto_scaler, 20) == 6
+    make_auto_scaler.clock.now += 11
+    assert apply_target(auto_scaler, 20) == 12
+
+
+def test_scale_down_waits_for_the_stabilization_window(make_auto_scaler):
+    auto_scaler = make_auto_scaler(scale=8)
+    clock = make_auto_scaler.clock
+    assert apply_target(auto_scaler, 8) == 8
+    for _ in range(8):
+        clock.now += 15
+        # The highest recommendation of the last 120 s holds the scale
+        assert apply_target(auto_scaler, 2) == 8
+    clock.now += 15
+    # Beyond the window only the low recommendations remain, limited to 50% per 60 s
+    assert apply_target(auto_scaler, 2) == 4
+    clock.now += 15
+    assert apply_target(auto_scaler, 2) == 4
+    clock.now += 60
+    assert apply_target(auto_scaler, 2) == 2
+
+
+def test_short_dip_does_not_flap(make_auto_scaler):
+    auto_scaler = make_auto_scaler(scale=5)
+    clock = make_auto_scaler.clock
+    for recommendation in (5, 5, 1, 5, 5):
+        assert apply_target(auto_scaler, recommendation) == 5
+        clock.now += 15
+
+
+def test_single_step_moves_one_replica_per_tick(make_auto_scaler):
+    auto_scaler = make_auto_scaler(scale=2, scale_mode="single_step")
+    auto_scaler.apply(6, "cpu")
+    assert auto_scaler.scale == 3
+    auto_scaler.apply(1, "cpu")
+    assert auto_scaler.scale == 2
+    assert make_auto_scaler.cluster.calls["patch_namespaced_deployment_scale"] == 2
@@ -0,0 +1,89 @@
+import json
+import logging
+
+import pytest
+
+from telemetry import TelemetryReceiver
+
+
+class StopReceiving(Exception):
+    pass
+
+
+class FakeSocket:
+    def __init__(self, datagrams):
+        self.datagrams = list(datagrams)
+
+    def recvfrom(self, size):
+        if not self.datagrams:
+            raise StopReceiving()
+        return self.datagrams.pop(0), ("10.0.0.1", 40000)
+
+
+def datagram(**fields):
+    message = {"n": "edge1", "t": 100.0, "c": 42.0, "m": 60.0, "k": 4, "mt": 3900}
+    message.update(fields)
+    return json.dumps(message).encode()
+
+
+def test_malformed_datagrams_do_not_stop_the_receiver():
+    receiver = TelemetryReceiver(nodes=["edge1", "edge2"])
+    receiver.sock = FakeSocket([
+        b"not json", b"[1, 2]", datagram(c=None), datagram(n=["edge1"]), datagram(t="x"),
+        json.dumps({"n": "edge1"}).encode(), datagram(t=101.0, c=55.5)
+    ])
+    with pytest.raises(StopReceiving):
+        receiver.run()
+    sample, age = receiver.latest("edge1")
+    assert sample["cpu_util"] == 55.5 and sample["timestamp"] == 101.0
+    assert age < 1
+
+
+def test_unknown_nodes_are_dropped():
+    receiver = TelemetryReceiver(nodes=["edge1"])
+    for index in range(100):
+        receiver.update(json.loads(datagram(n=f"intruder{index}")))
+    assert receiver.nodes == {}
+    assert receiver.stale_nodes(["edge1"]) == ["edge1"]
+
+
+def test_only_the_first_unknown_node_is_a_warning(caplog):
+    receiver = TelemetryReceiver(nodes=["edge1"])
+    with caplog.at_level(logging.WARNING):
+        receiver.update(json.loads(datagram(n="edge1.cluster.local")))
+        receiver.update(json.loads(datagram(n="edge2.cluster.local")))
+    warnings = [record for record in caplog.records if record.levelno == logging.WARNING]
+    assert len(warnings) == 1
+    assert "edge1.cluster.local" in warnings[0].getMessage()
+
+
+def test_older_samples_do_not_replace_newer_ones():
+    receiver = TelemetryReceiver(nodes=["edge1"])
+    receiver.update(json.loads(datagram(t=200.0, c=10.0)))
+    receiver.update(json.loads(datagram(t=150.0, c=99.0)))
+    assert receiver.latest("edge1")[0]["cpu_util"] == 10.0
+
+
+def test_catalog_nodes_are_known_by_default():
+    receiver = TelemetryReceiver()
+    receiver.update(json.loads(datagram(n="edge3")))
+    assert receiver.latest("edge3")[0] is not None
+
+
+def test_crossing_the_thresholds_raises_one_event_per_edge():
+    events = []
+    receiver = TelemetryReceiver(nodes=["edge1"], on_event=lambda node, reason: events.append(reason))
+    receiver.update(json.loads(datagram(t=1.0, c=50.0)))
+    assert events == []
+    receiver.update(json.loads(datagram(t=2.0, c=95.0)))
+    receiver.update(json.loads(datagram(t=3.0, c=97.0, m=20.0)))
+    assert events == ["resources over the thresholds"]
+    receiver.update(json.loads(datagram(t=4.0, c=60.0)))
+    receiver.update(json.loads(datagram(t=5.0, c=61.0)))
+    assert events == ["resources over the thresholds", "resources back under the thresholds"]
+
+
+def test_auto_scalers_use_the_thresholds_of_the_receiver(make_auto_scaler):
+    auto_scaler = make_auto_scaler()
+    receiver = TelemetryReceiver(nodes=["edge1"])
+    assert (auto_scaler.node_cpu_thres, auto_scaler.node_mem_thres) == (receiver.cpu_threshold, receiver.mem_threshold)
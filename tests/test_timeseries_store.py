@@ -0,0 +1,123 @@
+import os
+
+import numpy as np
+import pytest
+
+from timeseries_store import SeriesSlots, TimeSeriesStore
+
+DAY = 24 * 3600
+# A segment start well within the retention of the stores below
+START = 1_700_006_400
+
+
+def store(path, **kwargs):
+    settings = dict(fields=("cpu", "mem"), interval=15, segment_duration=DAY, retention=1e12, max_series=4)
+    settings.update(kwargs)
+    return TimeSeriesStore(str(path), **settings)
+
+
+def present(windows, field):
+    return np.concatenate([window.values[field][window.timestamps > 0] for window in windows]).tolist()
+
+
+def test_query_returns_the_samples_of_a_series_in_order(tmp_path):
+    history = store(tmp_path)
+    for step in range(4):
+        history.append({"a/0": {"cpu": 100 + step, "mem": 50}, "a/1": {"cpu": 7}}, START + 15 * step)
+    windows = history.query("a/0", START, START + 60)
+    assert len(windows) == 1
+    assert present(windows, "cpu") == [100, 101, 102, 103]
+    assert windows[0].timestamps[:4].tolist() == [START + 15 * step for step in range(4)]
+    assert np.isnan(history.query("a/1", START, START + 60)[0].values["mem"][0])
+    assert history.query("missing", START, START + 60) == []
+    assert history.series(START, START + 60, prefix="a/") == ["a/0", "a/1"]
+
+
+def test_views_are_read_only(tmp_path):
+    history = store(tmp_path)
+    history.append({"a/0": {"cpu": 1}}, START)
+    window = history.query("a/0", START, START + 15)[0]
+    with pytest.raises(ValueError):
+        window.values["cpu"][0] = 2
+
+
+def test_later_sample_of_an_interval_replaces_the_earlier(tmp_path):
+    history = store(tmp_path)
+    history.append({"a/0": {"cpu": 1}}, START + 1)
+    history.append({"a/0": {"cpu": 2}}, START + 14)
+    assert present(history.query("a/0", START, START + 15), "cpu") == [2]
+
+
+def test_query_spans_segments_and_survives_reopening(tmp_path):
+    history = store(tmp_path, max_open=1)
+    history.append({"a/0": {"cpu": 1}}, START + DAY - 15)
+    history.append({"a/0": {"cpu": 2}}, START + DAY)
+    history.flush()
+    assert present(history.query("a/0", START, START + 2 * DAY), "cpu") == [1, 2]
+
+    reopened = store(tmp_path)
+    assert present(reopened.query("a/0", START, START + 2 * DAY), "cpu") == [1, 2]
+
+
+def test_rotation_deletes_segments_past_the_retention(tmp_path):
+    history = store(tmp_path, retention=DAY)
+    history.append({"a/0": {"cpu": 1}}, START)
+    history.append({"a/0": {"cpu": 2}}, START + DAY)
+    assert sorted(os.listdir(tmp_path)) == [str(START), str(START + DAY)]
+    # Rotating two segments on leaves the first one entirely out of the retention
+    history.append({"a/0": {"cpu": 3}}, START + 2 * DAY)
+    assert sorted(os.listdir(tmp_path)) == [str(START + DAY), str(START + 2 * DAY)]
+
+
+def test_series_beyond_the_segment_capacity_are_counted(tmp_path):
+    history = store(tmp_path, max_series=2)
+    history.append({"a/0": {"cpu": 1}, "a/1": {"cpu": 1}, "a/2": {"cpu": 1}}, START)
+    assert history.skipped == 1
+    history.append({"a/0": {"cpu": 1}, "a/1": {"cpu": 1}}, START + 15)
+    assert history.skipped == 1
+
+
+def test_pod_churn_reuses_the_slots_of_gone_pods(tmp_path):
+    slots = SeriesSlots()
+    history = store(tmp_path, max_series=3)
+    pods = ["pod-a", "pod-b"]
+    for step in range(20):
+        keys = slots.keys("mobilenet-edge1", pods)
+        history.append({keys[pod]: {"cpu": step} for pod in pods}, START + 15 * step)
+        # Every step one pod is replaced by a new one
+        pods = [pods[1], f"pod-{step}"]
+    assert history.skipped == 0
+    assert history.series(START, START + DAY) == ["mobilenet-edge1/0", "mobilenet-edge1/1"]
+
+
+def test_slots_are_stable_for_pods_that_stay():
+    slots = SeriesSlots()
+    assert slots.keys("app", ["b", "a"]) == {"a": "app/0", "b": "app/1"}
+    assert slots.keys("app", ["b", "c", "d"]) == {"b": "app/1", "c": "app/0", "d": "app/2"}
+    assert slots.keys("other", ["b"]) == {"b": "other/0"}
+
+
+def test_members_tell_the_pods_of_a_slot_apart(tmp_path):
+    slots = SeriesSlots()
+    history = store(tmp_path)
+    for step, pods in enumerate((["pod-a"], ["pod-a"], ["pod-b"], ["pod-b"])):
+        keys = slots.keys("app", pods)
+        history.append({keys[pod]: {"cpu": step} for pod in pods}, START + 15 * step, {keys[pod]: pod for pod in pods})
+    changes = [[START, "pod-a"], [START + 30, "pod-b"]]
+    assert history.members("app/0", START, START + 60) == changes
+    assert history.members("app/0", START + 15, START + 60) == changes
+    assert history.members("app/0", START + 45, START + 60) == changes[1:]
+    assert history.members("app/1", START, START + 60) == []
+    # The changes are kept in the index of the segment
+    history.flush()
+    assert store(tmp_path).members("app/0", START, START + 60) == changes
+
+
+def test_members_continue_across_segments(tmp_path):
+    history = store(tmp_path)
+    history.append({"app/0": {"cpu": 1}}, START + DAY - 15, {"app/0": "pod-a"})
+    history.append({"app/0": {"cpu": 1}}, START + DAY, {"app/0": "pod-a"})
+    history.append({"app/0": {"cpu": 1}}, START + DAY + 15, {"app/0": "pod-b"})
+    assert history.members("app/0", START, START + 2 * DAY) == [
+        [START + DAY - 15, "pod-a"], [START + DAY + 15, "pod-b"]
+    ]
@@ -0,0 +1,92 @@
+import json
+import os
+
+import pytest
+
+from topology import Topology, shortest_paths
+
+
+def write_links(path, links, mtime=None):
+    path.write_text(json.dumps({"links": links}))
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def test_shortest_paths_prefer_the_cheaper_route():
+    nodes = ("a", "b", "c", "d")
+    links = [("a", "b", 1.0), ("b", "c", 1.0), ("a", "c", 5.0), ("c", "d", 1.0)]
+    next_hops, costs, hop_counts = shortest_paths(nodes, links)
+    assert next_hops["a"]["c"] == "b"
+    assert next_hops["a"]["d"] == "b"
+    assert next_hops["d"]["a"] == "c"
+    assert costs["a"]["d"] == 3.0
+    assert hop_counts["a"]["d"] == 3
+    assert next_hops["a"]["a"] == "a"
+    assert costs["a"]["a"] == 0
+
+
+def test_shortest_paths_leave_out_unreachable_nodes():
+    next_hops, costs, hop_counts = shortest_paths(("a", "b", "c"), [("a", "b", 2.0)])
+    assert "c" not in next_hops["a"]
+    assert "c" not in costs["a"]
+    assert next_hops["c"] == {"c": "c"}
+
+
+def test_next_hop_follows_the_topology_file(tmp_path):
+    path = tmp_path / "topology.json"
+    write_links(path, [["edge1", "edge2", 1], ["edge2", "edge3", 1]])
+    topology = Topology(str(path), reload_interval=0)
+    assert topology.next_hop("edge1", "edge3") == "edge2"
+    assert topology.cost("edge1", "edge3") == 2.0
+    assert topology.hops("edge1", "edge3") == 2
+    assert topology.next_hop("edge3", "edge1") == "edge2"
+
+
+def test_unreachable_and_unknown_nodes_have_no_route(tmp_path):
+    path = tmp_path / "topology.json"
+    write_links(path, [["edge1", "edge2", 1]])
+    topology = Topology(str(path), reload_interval=0)
+    assert topology.next_hop("edge1", "edge3") is None
+    assert topology.cost("edge1", "edge3") is None
+    assert topology.hops("edge3", "edge1") is None
+    assert topology.next_hop("unknown", "edge1") is None
+
+
+@pytest.mark.parametrize("links", [[["edge1", "edge9", 1]], [["edge1", "edge2", -1]]])
+def test_invalid_links_are_rejected(tmp_path, links):
+    path = tmp_path / "topology.json"
+    write_links(path, links)
+    with pytest.raises(ValueError):
+        Topology(str(path), reload_interval=0)
+
+
+def test_reload_picks_up_a_changed_file(tmp_path):
+    path = tmp_path / "topology.json"
+    write_links(path, [["edge1", "edge2", 1], ["edge2", "edge3", 1]], mtime=1000)
+    topology = Topology(str(path), reload_interval=0)
+    write_links(path, [["edge1", "edge3", 1], ["edge1", "edge2", 1]], mtime=2000)
+    topology.maybe_reload()
+    assert topology.next_hop("edge2", "edge3") == "edge1"
+    assert topology.hops("edge1", "edge3") == 1
+
+
+def test_broken_reload_keeps_the_previous_table(tmp_path):
+    path = tmp_path / "topology.json"
+    write_links(path, [["edge1", "edge2", 1], ["edge2", "edge3", 1]], mtime=1000)
+    topology = Topology(str(path), reload_interval=0)
+    write_links(path, [["edge1", "edge9", 1]], mtime=2000)
+    topology.maybe_reload()
+    assert topology.next_hop("edge1", "edge3") == "edge2"
+    path.write_text("{not json")
+    os.utime(path, (3000, 3000))
+    topology.maybe_reload()
+    assert topology.next_hop("edge1", "edge3") == "edge2"
+
+
+def test_reload_waits_for_the_interval(tmp_path):
+    path = tmp_path / "topology.json"
+    write_links(path, [["edge1", "edge2", 1], ["edge2", "edge3", 1]], mtime=1000)
+    topology = Topology(str(path), reload_interval=3600)
+    write_links(path, [["edge1", "edge3", 1]], mtime=2000)
+    topology.maybe_reload()
+    assert topology.next_hop("edge1", "edge3") == "edge2"